@@ -1,5 +1,21 @@
+from .clients import *
 from .db_handler import *
 from .data_schema import *
 from .prompts import *
 from .reasoning import *
-from .api_data_schema import *
\ No newline at end of file
+from .api_data_schema import *
+from .cache import *
+from .streaming import *
+from .structured_stream import *
+from .vector_search import *
+from .ann_index import *
+from .embedding_index import *
+from .embedding_pipeline import *
+from .candidate_pipeline import *
+from .single_flight import *
+from .context_builder import *
+from .course_summary import *
+from .quiz_analytics import *
+from .context_cache import *
+from .resilience import *
+from .metrics import *
@@ -0,0 +1,224 @@
+import numpy as np
+
+class IVFIndex:
+
+    """
+
+    Inverted file (IVF) approximate nearest neighbour index implemented with NumPy only.
+
+    Vectors are clustered with k-means into n_lists cells and their rows are stored grouped by cell. A query is compared
+    with the cell centroids first, and then exactly against the vectors of the n_probe closest cells only, so the work per query
+    is roughly n_probe / n_lists of a brute force scan.
+
+    The cosine metric normalizes vectors on insert and scores by inner product. Scores are similarities (higher is closer)
+    for cosine and negative squared distances for euclidean, so both sort the same way.
+
+    """
+
+    def __init__(self, metric: str = 'cosine', n_lists: int | None = None, n_probe: int = 8, seed: int = 0, copy_vectors: bool = True):
+
+        if metric not in ('cosine', 'euclidean'):
+            raise ValueError(f"Unsupported metric {metric}")
+
+        self.metric = metric
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.seed = seed
+
+        # With copy_vectors=False the index keeps a reference to the caller's matrix (e.g. a memory-mapped store) and only
+        # holds centroids and row numbers itself. Probed rows are read from the source at query time.
+        self.copy_vectors = copy_vectors
+
+        self.centroids = None
+        self._source = None
+        self._rows = None
+        self._ids = None
+        self._offsets = None
+        self._assignments = None
+
+    def __len__(self) -> int:
+        return 0 if self._ids is None else len(self._ids)
+
+    def _prepare(self, vectors) -> np.ndarray:
+
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+
+        if self.metric == 'cosine':
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms > 0, norms, 1)
+
+        return vectors
+
+    def _read(self, rows: np.ndarray) -> np.ndarray:
+
+        # Copied vectors were already prepared on insert.
+        return self._source[rows] if self.copy_vectors else self._prepare(self._source[rows])
+
+    def _scores(self, queries: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+
+        dot_products = queries @ vectors.T
+
+        if self.metric == 'cosine':
+            return dot_products
+
+        # -||q - v||^2 without the ||q||^2 term, which is constant per query and does not change the ranking.
+        return 2 * dot_products - np.einsum('ij,ij->i', vectors, vectors)[np.newaxis, :]
+
+    def _assign(self, rows: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+
+        assignments = np.empty(len(rows), dtype=np.int64)
+        centroid_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+        for start in range(0, len(rows), batch_size):
+            batch = self._read(rows[start:start + batch_size])
+            assignments[start:start + batch_size] = np.argmax(2 * batch @ self.centroids.T - centroid_norms[np.newaxis, :], axis=1)
+
+        return assignments
+
+    def _train(self, rows: np.ndarray, n_lists: int, iterations: int, sample_size: int):
+
+        rng = np.random.default_rng(self.seed)
+
+        if len(rows) > sample_size:
+            rows = np.sort(rng.choice(rows, sample_size, replace=False))
+
+        vectors = self._read(rows)
+
+        self.centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+
+            centroid_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+            assignments = np.argmax(2 * vectors @ self.centroids.T - centroid_norms[np.newaxis, :], axis=1)
+
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignments, vectors)
+            counts = np.bincount(assignments, minlength=n_lists)
+
+            # Empty cells keep their previous centroid.
+            filled = counts > 0
+            self.centroids[filled] = sums[filled] / counts[filled, np.newaxis]
+
+            if self.metric == 'cosine':
+                self.centroids = self._prepare(self.centroids)
+
+    def _store(self, rows: np.ndarray, ids: np.ndarray, assignments: np.ndarray):
+
+        order = np.argsort(assignments, kind='stable')
+
+        self._rows = rows[order]
+        self._ids = ids[order]
+        self._assignments = assignments[order]
+
+        if self.copy_vectors:
+            # Keep each cell contiguous in memory so probing a cell is a sequential read.
+            self._source = self._source[self._rows]
+            self._rows = np.arange(len(self._rows), dtype=np.int64)
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=len(self.centroids)))])
+
+    def _attach(self, vectors, rows) -> np.ndarray:
+
+        """ Points the index at the vectors to add and returns their rows in self._source. """
+
+        if not self.copy_vectors:
+            self._source = vectors
+            return np.arange(len(vectors), dtype=np.int64) if rows is None else np.asarray(rows, dtype=np.int64)
+
+        vectors = self._prepare(vectors if rows is None else vectors[np.asarray(rows)])
+        first_row = 0 if self._source is None else len(self._source)
+
+        self._source = vectors if self._source is None else np.concatenate([self._source, vectors])
+
+        return np.arange(first_row, first_row + len(vectors), dtype=np.int64)
+
+    def build(self, vectors, ids=None, rows=None, iterations: int = 10, sample_size: int = 65536):
+
+        """
+
+        Trains the cells and indexes the vectors (or only the given rows of them). ids are integers (e.g. a row in a metadata
+        table) and default to the row number of each vector.
+
+        The number of cells defaults to about 4 * sqrt(n), which keeps both the centroid scan and the probed cells small.
+
+        """
+
+        self._source = None
+        rows = self._attach(vectors, rows)
+        ids = np.arange(len(rows)) if ids is None else np.asarray(ids, dtype=np.int64)
+
+        if len(rows) == 0:
+            raise ValueError("Cannot build an index without vectors")
+
+        n_lists = self.n_lists or int(4 * np.sqrt(len(rows)))
+        n_lists = max(1, min(n_lists, len(rows)))
+
+        self._train(rows, n_lists, iterations, sample_size)
+        self._store(rows, ids, self._assign(rows))
+
+        return self
+
+    def add(self, vectors, ids, rows=None):
+
+        """
+
+        Adds vectors to the existing cells without retraining. Rebuild once the data drifts far from the trained centroids.
+
+        With copy_vectors=False, vectors is the (possibly grown) source matrix and rows are the rows of it to add.
+
+        """
+
+        if self.centroids is None:
+            return self.build(vectors, ids, rows=rows)
+
+        rows = self._attach(vectors, rows)
+
+        self._store(
+            np.concatenate([self._rows, rows]),
+            np.concatenate([self._ids, np.asarray(ids, dtype=np.int64)]),
+            np.concatenate([self._assignments, self._assign(rows)])
+        )
+
+        return self
+
+    def search(self, queries, k: int, n_probe: int | None = None) -> tuple:
+
+        """
+
+        Returns (ids, scores) arrays of shape (queries, k), best match first. Rows with fewer than k candidates are padded
+        with id -1 and score -inf.
+
+        """
+
+        queries = self._prepare(queries)
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+
+        centroid_scores = self._scores(queries, self.centroids)
+        probes = np.argpartition(-centroid_scores, n_probe - 1, axis=1)[:, :n_probe] if n_probe < len(self.centroids) else np.broadcast_to(np.arange(len(self.centroids)), (len(queries), len(self.centroids)))
+
+        for row, (query, cells) in enumerate(zip(queries, probes)):
+
+            positions = np.concatenate([np.arange(self._offsets[cell], self._offsets[cell + 1]) for cell in cells])
+
+            if len(positions) == 0:
+                continue
+
+            if self.copy_vectors:
+                candidates = np.concatenate([self._source[self._offsets[cell]:self._offsets[cell + 1]] for cell in cells])
+            else:
+                candidates = self._read(self._rows[positions])
+
+            candidate_scores = self._scores(query[np.newaxis, :], candidates)[0]
+
+            top = min(k, len(positions))
+            best = np.argpartition(-candidate_scores, top - 1)[:top] if top < len(positions) else np.arange(len(positions))
+            best = best[np.argsort(-candidate_scores[best], kind='stable')]
+
+            ids[row, :top] = self._ids[positions[best]]
+            scores[row, :top] = candidate_scores[best] if self.metric == 'cosine' else candidate_scores[best] - query @ query
+
+        return ids, scores
+
+__all__ = ['IVFIndex']
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+import json
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
 
@@ -12,6 +13,13 @@ class VideoIdRequestSingleProvider(BaseModel):
     video_id: str
     provider: str
 
+class GenerateAllRequest(BaseModel):
+    twelve_labs_video_id: str
+    gemini_file_id: str | None = None
+    s3_key: str | None = None
+    providers: list[str]
+    artifacts: list[str] | None = None
+
 class FetchVideoIdsResponse(BaseModel):
     status: str = 'success'
     message: str = 'Video uploaded successfully'
@@ -85,6 +93,48 @@ async def get_video_id_from_request_single_provider(request: Request, body: Vide
     
     return VideoIdRequestSingleProvider(video_id=video_id, provider=provider)
 
+async def get_generate_all_request(request: Request):
+
+    """
+    Safely extracts the video IDs, providers and artifacts for the generate all endpoint from the query parameters.
+
+    Providers and artifacts are comma separated lists. When artifacts is omitted every artifact supported by each provider is generated.
+
+    """
+
+    if request.method != 'GET':
+        raise HTTPException(status_code=405, detail="Method not allowed")
+
+    video_id = request.query_params.get('video_id')
+    providers = request.query_params.get('providers', 'twelvelabs,google,aws')
+    artifacts = request.query_params.get('artifacts')
+
+    if not video_id:
+        raise HTTPException(status_code=400, detail="video_id is required")
+
+    return GenerateAllRequest(
+        twelve_labs_video_id=video_id,
+        gemini_file_id=request.query_params.get('gemini_file_id'),
+        s3_key=request.query_params.get('s3_key'),
+        providers=[provider.strip() for provider in providers.split(',') if provider.strip()],
+        artifacts=[artifact.strip() for artifact in artifacts.split(',') if artifact.strip()] if artifacts else None
+    )
+
+def sse_event(data: dict) -> str:
+
+    """
+    Formats a dictionary as a single server-sent event message.
+    """
+
+    return f"data: {json.dumps(data, default=str)}\n\n"
+
+def ndjson_event(data: dict) -> str:
+
+    """
+    Formats a dictionary as a single newline delimited JSON line.
+    """
+
+    return f"{json.dumps(data, default=str)}\n"
 
 def success_response(data: dict, duration: float, message: str, provider: str, type: str) -> JSONResponse:
 
@@ -113,4 +163,4 @@ def default_response(status: str, message: str, status_code: int) -> JSONRespons
         'message': message
     }, status_code=status_code)
 
-__all__ = ['VideoIdRequest', 'VideoIdRequestSingleProvider', 'FetchVideoIdsResponse', 'get_video_id_from_request', 'get_video_id_from_request_single_provider', 'SuccessResponse', 'DefaultResponse']
\ No newline at end of file
+__all__ = ['VideoIdRequest', 'VideoIdRequestSingleProvider', 'FetchVideoIdsResponse', 'get_video_id_from_request', 'get_video_id_from_request_single_provider', 'SuccessResponse', 'DefaultResponse', 'GenerateAllRequest', 'get_generate_all_request', 'sse_event', 'ndjson_event']
\ No newline at end of file
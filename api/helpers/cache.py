@@ -0,0 +1,337 @@
+import os
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from boto3.dynamodb.conditions import Key
+from dotenv import load_dotenv
+
+from .clients import clients
+from .metrics import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class FileCacheStore:
+
+    """
+
+    Persistent cache tier backed by JSON files on local disk.
+
+    Entries are grouped in one directory per video so a whole lecture can be invalidated at once.
+
+    """
+
+    def __init__(self, directory: str):
+
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _video_directory(self, video_id: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(video_id.encode()).hexdigest()[:32])
+
+    def get(self, video_id: str, key: str):
+
+        path = os.path.join(self._video_directory(video_id), key + '.json')
+
+        try:
+            with open(path, 'r') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def set(self, video_id: str, key: str, entry: dict):
+
+        video_directory = self._video_directory(video_id)
+        os.makedirs(video_directory, exist_ok=True)
+
+        # Write then rename so concurrent readers never see a half written file.
+        temporary_path = os.path.join(video_directory, f'{key}.{threading.get_ident()}.tmp')
+        with open(temporary_path, 'w') as file:
+            json.dump(entry, file)
+        os.replace(temporary_path, os.path.join(video_directory, key + '.json'))
+
+    def invalidate(self, video_id: str, provider: str | None = None, artifact: str | None = None) -> int:
+
+        video_directory = self._video_directory(video_id)
+
+        if not os.path.isdir(video_directory):
+            return 0
+
+        removed = 0
+
+        for file_name in os.listdir(video_directory):
+
+            path = os.path.join(video_directory, file_name)
+
+            if provider or artifact:
+                try:
+                    with open(path, 'r') as file:
+                        entry = json.load(file)
+                except (OSError, json.JSONDecodeError):
+                    entry = {}
+                if provider and entry.get('provider') != provider:
+                    continue
+                if artifact and entry.get('artifact') != artifact:
+                    continue
+
+            os.remove(path)
+            removed += 1
+
+        if not provider and not artifact:
+            shutil.rmtree(video_directory, ignore_errors=True)
+
+        return removed
+
+class DynamoDBCacheStore:
+
+    """
+
+    Persistent cache tier backed by a DynamoDB table with video_id as the hash key and cache_key as the range key.
+
+    Values are stored as JSON strings to avoid float/Decimal conversion. The expires_at attribute can be used as the table TTL attribute.
+
+    """
+
+    def __init__(self, table_name: str):
+
+        self.table_name = table_name
+
+    @property
+    def table(self):
+        return clients.dynamodb.Table(self.table_name)
+
+    def get(self, video_id: str, key: str):
+
+        item = self.table.get_item(Key={'video_id': video_id, 'cache_key': key}).get('Item')
+
+        if not item:
+            return None
+
+        return json.loads(item['entry'])
+
+    def set(self, video_id: str, key: str, entry: dict):
+
+        self.table.put_item(Item={
+            'video_id': video_id,
+            'cache_key': key,
+            'provider': entry['provider'],
+            'artifact': entry['artifact'],
+            'expires_at': int(entry['expires_at']),
+            'entry': json.dumps(entry)
+        })
+
+    def invalidate(self, video_id: str, provider: str | None = None, artifact: str | None = None) -> int:
+
+        removed = 0
+        query_kwargs = {
+            'KeyConditionExpression': Key('video_id').eq(video_id),
+            'ProjectionExpression': 'video_id, cache_key, provider, artifact'
+        }
+
+        with self.table.batch_writer() as batch:
+
+            while True:
+
+                response = self.table.query(**query_kwargs)
+
+                for item in response.get('Items', []):
+                    if provider and item.get('provider') != provider:
+                        continue
+                    if artifact and item.get('artifact') != artifact:
+                        continue
+                    batch.delete_item(Key={'video_id': item['video_id'], 'cache_key': item['cache_key']})
+                    removed += 1
+
+                if 'LastEvaluatedKey' not in response:
+                    break
+
+                query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        return removed
+
+class GenerationCache:
+
+    """
+
+    Two-tier cache for provider generations.
+
+    1. In-process LRU with TTL for repeated reads inside one worker.
+    2. Persistent tier (local files or DynamoDB) shared across restarts and workers.
+
+    Entries are keyed on (provider, video_id, artifact, prompt hash, model id) so a prompt or model change never serves a stale result.
+
+    """
+
+    def __init__(self, store=None, max_entries: int = 512, ttl_seconds: int = 86400):
+
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+
+        """ Builds the cache from environment variables. DynamoDB is used as the persistent tier if DYNAMODB_CACHE_TABLE_NAME is set. """
+
+        table_name = os.getenv('DYNAMODB_CACHE_TABLE_NAME')
+
+        try:
+            if table_name:
+                store = DynamoDBCacheStore(table_name)
+            else:
+                store = FileCacheStore(os.getenv('GENERATION_CACHE_DIR', '.generation_cache'))
+        except Exception as e:
+            logger.error(f"Error creating persistent generation cache, using in-process cache only: {str(e)}")
+            store = None
+
+        return cls(
+            store=store,
+            max_entries=int(os.getenv('GENERATION_CACHE_MAX_ENTRIES', '512')),
+            ttl_seconds=int(os.getenv('GENERATION_CACHE_TTL_SECONDS', '86400'))
+        )
+
+    @staticmethod
+    def make_key(provider: str, video_id: str, artifact: str, prompt: str, model_id: str) -> str:
+
+        prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()
+        raw_key = json.dumps([provider, video_id, artifact, prompt_hash, model_id])
+
+        return hashlib.sha256(raw_key.encode()).hexdigest()
+
+    def _get_memory(self, key: str):
+
+        with self._lock:
+
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return None
+
+            if entry['expires_at'] < time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return entry
+
+    def _set_memory(self, key: str, entry: dict):
+
+        with self._lock:
+
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get(self, provider: str, video_id: str, artifact: str, prompt: str, model_id: str):
+
+        """ Returns the cached value or None. Persistent hits are promoted into the in-process tier. """
+
+        key = self.make_key(provider, video_id, artifact, prompt, model_id)
+
+        entry = self._get_memory(key)
+
+        if entry is not None:
+            self.hits += 1
+            return entry['value']
+
+        if self.store is not None:
+
+            try:
+                entry = await asyncio.to_thread(self.store.get, video_id, key)
+            except Exception as e:
+                logger.error(f"Error reading persistent generation cache: {str(e)}")
+                entry = None
+
+            if entry is not None and entry['expires_at'] >= time.time():
+                self._set_memory(key, entry)
+                self.hits += 1
+                self.persistent_hits += 1
+                return entry['value']
+
+        self.misses += 1
+        return None
+
+    async def set(self, provider: str, video_id: str, artifact: str, prompt: str, model_id: str, value):
+
+        key = self.make_key(provider, video_id, artifact, prompt, model_id)
+
+        entry = {
+            'provider': provider,
+            'video_id': video_id,
+            'artifact': artifact,
+            'model_id': model_id,
+            'expires_at': time.time() + self.ttl_seconds,
+            'value': value
+        }
+
+        self._set_memory(key, entry)
+
+        if self.store is not None:
+            try:
+                await asyncio.to_thread(self.store.set, video_id, key, entry)
+            except Exception as e:
+                logger.error(f"Error writing persistent generation cache: {str(e)}")
+
+    async def invalidate(self, video_id: str, provider: str | None = None, artifact: str | None = None) -> int:
+
+        """ Removes every cached generation for a video, optionally narrowed to one provider and/or artifact. Returns the number of entries removed. """
+
+        removed = 0
+
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry['video_id'] != video_id:
+                    continue
+                if provider and entry['provider'] != provider:
+                    continue
+                if artifact and entry['artifact'] != artifact:
+                    continue
+                del self._entries[key]
+                removed += 1
+
+        if self.store is not None:
+            removed = max(removed, await asyncio.to_thread(self.store.invalidate, video_id, provider, artifact))
+
+        return removed
+
+    def stats(self) -> dict:
+
+        lookups = self.hits + self.misses
+
+        return {
+            'hits': self.hits,
+            'persistent_hits': self.persistent_hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds
+        }
+
+generation_cache = GenerationCache.from_env()
+
+metrics.counter('generation_cache_lookups_total', 'Generation cache lookups by result.', ('result',), callback=lambda: {
+    ('memory_hit',): generation_cache.hits - generation_cache.persistent_hits,
+    ('persistent_hit',): generation_cache.persistent_hits,
+    ('miss',): generation_cache.misses
+})
+metrics.gauge('generation_cache_hit_ratio', 'Share of generation cache lookups served from the cache.', callback=lambda: generation_cache.stats()['hit_ratio'])
+metrics.gauge('generation_cache_entries', 'Entries held in the in-memory generation cache.', callback=lambda: generation_cache.stats()['entries'])
+
+__all__ = ['GenerationCache', 'FileCacheStore', 'DynamoDBCacheStore', 'generation_cache']
@@ -0,0 +1,166 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from .cache import generation_cache
+from .prompts import youtube_query_prompt
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+
+    """ Small thread-safe LRU cache whose entries expire after ttl_seconds. """
+
+    def __init__(self, ttl_seconds: int, max_entries: int = 1024):
+
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+
+        with self._lock:
+
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return None
+
+            if entry['expires_at'] < time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return entry['value']
+
+    def set(self, key, value):
+
+        with self._lock:
+
+            self._entries[key] = {'expires_at': time.time() + self.ttl_seconds, 'value': value}
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class StaticSearch:
+
+    """ Local stand-in for YouTube search, e.g. for tests. Returns the URLs configured for a query, or the default list. """
+
+    def __init__(self, results: dict | None = None, default: list | None = None):
+        self.results = results or {}
+        self.default = default or []
+
+    def __call__(self, query: str) -> list:
+        return list(self.results.get(query, self.default))
+
+class YouTubeCandidatePipeline:
+
+    """
+
+    Finds and embeds external (YouTube) candidates for related video search.
+
+    1. A search query is generated once per video with Pegasus and kept in the generation cache.
+    2. Search results are cached per query for search_ttl_seconds.
+    3. Candidate embeddings are cached per URL for embedding_ttl_seconds, and the rest are embedded concurrently.
+
+    Every stage runs off the event loop, so the pipeline overlaps with the S3 lecture search in fetch_related_videos.
+    search_function(query) -> [url] is injectable, so pytube can be swapped for StaticSearch or any other backend.
+
+    """
+
+    def __init__(self, generate_query, search_function, embedder, max_results: int = 5, search_ttl_seconds: int = 3600, embedding_ttl_seconds: int = 86400, deadline_seconds: float = 120):
+
+        self.generate_query_function = generate_query
+        self.search_function = search_function
+        self.embedder = embedder
+
+        self.max_results = max_results
+        self.deadline_seconds = deadline_seconds
+
+        self.search_cache = TTLCache(search_ttl_seconds)
+        self.embedding_cache = TTLCache(embedding_ttl_seconds)
+
+    @classmethod
+    def from_env(cls, generate_query, search_function, embedder):
+
+        return cls(
+            generate_query=generate_query,
+            search_function=search_function,
+            embedder=embedder,
+            max_results=int(os.getenv('YOUTUBE_MAX_CANDIDATES', '5')),
+            search_ttl_seconds=int(os.getenv('YOUTUBE_SEARCH_TTL_SECONDS', '3600')),
+            embedding_ttl_seconds=int(os.getenv('YOUTUBE_EMBEDDING_TTL_SECONDS', '86400')),
+            deadline_seconds=float(os.getenv('EMBEDDING_BATCH_DEADLINE_SECONDS', '120'))
+        )
+
+    async def generate_query(self, video_id: str) -> str:
+
+        cached = await generation_cache.get('twelvelabs', video_id, 'youtube_query', youtube_query_prompt, 'pegasus1.2')
+
+        if cached is not None:
+            return cached['query']
+
+        query = await asyncio.to_thread(self.generate_query_function, video_id)
+        await generation_cache.set('twelvelabs', video_id, 'youtube_query', youtube_query_prompt, 'pegasus1.2', {'query': query})
+
+        return query
+
+    async def search(self, query: str) -> list:
+
+        urls = self.search_cache.get(query)
+
+        if urls is None:
+            urls = await asyncio.to_thread(self.search_function, query)
+            self.search_cache.set(query, urls)
+
+        return urls[:self.max_results]
+
+    async def embed(self, video_urls: list) -> dict:
+
+        """ Returns {url: segments} for every URL that is cached or finished embedding before the deadline. """
+
+        embeddings = {}
+        to_embed = []
+
+        for video_url in video_urls:
+
+            segments = self.embedding_cache.get(video_url)
+
+            if segments is None:
+                to_embed.append(video_url)
+            else:
+                embeddings[video_url] = segments
+
+        if to_embed:
+
+            batch = await self.embedder.embed_videos(to_embed, deadline_seconds=self.deadline_seconds)
+
+            for video_url, segments in batch['results'].items():
+                self.embedding_cache.set(video_url, segments)
+                embeddings[video_url] = segments
+
+            for video_url, error in batch['failed'].items():
+                logger.error(f"Error embedding candidate {video_url}: {error}")
+
+        return embeddings
+
+    async def fetch_candidates(self, video_id: str) -> dict:
+
+        """ Returns {url: segments} for the external candidates of a video. """
+
+        query = await self.generate_query(video_id)
+        video_urls = await self.search(query)
+
+        return await self.embed(video_urls)
+
+__all__ = ['TTLCache', 'StaticSearch', 'YouTubeCandidatePipeline']
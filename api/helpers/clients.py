@@ -0,0 +1,178 @@
+import os
+import logging
+import threading
+
+import boto3
+import httpx
+import instructor
+from botocore.config import Config
+from google import genai
+from google.genai import types
+from twelvelabs import TwelveLabs
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class ClientPool:
+
+    """
+
+    Process-wide pool of SDK clients shared by every request.
+
+    Clients are created once (eagerly from the FastAPI lifespan hook, or lazily on first use) with pooled keep-alive
+    connections so per-request setup cost and TLS handshakes stay off the hot path.
+
+    boto3 clients are thread-safe and shared globally. boto3 resources are not, so DynamoDB and S3 resources are
+    created once per worker thread instead of once per request.
+
+    """
+
+    def __init__(self):
+
+        self.aws_max_connections = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', '50'))
+        self.twelve_labs_max_connections = int(os.getenv('TWELVE_LABS_MAX_CONNECTIONS', '50'))
+        self.google_max_connections = int(os.getenv('GOOGLE_MAX_CONNECTIONS', '50'))
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self._session = None
+        self._twelve_labs = None
+        self._genai = None
+        self._boto_clients = {}
+        self._instructor_clients = {}
+
+    def _aws_config(self) -> Config:
+        return Config(max_pool_connections=self.aws_max_connections, tcp_keepalive=True)
+
+    def boto_client(self, service_name: str, region_name: str | None = None):
+
+        """ Returns the shared boto3 client for a service and region. """
+
+        key = (service_name, region_name)
+
+        with self._lock:
+            if key not in self._boto_clients:
+                if self._session is None:
+                    self._session = boto3.session.Session()
+                self._boto_clients[key] = self._session.client(service_name, region_name=region_name, config=self._aws_config())
+            return self._boto_clients[key]
+
+    def bedrock_runtime(self, region_name: str | None = None):
+        return self.boto_client('bedrock-runtime', region_name=region_name)
+
+    def instructor(self, region_name: str | None = None):
+
+        """ Returns the shared instructor wrapper around the Bedrock runtime client. """
+
+        with self._lock:
+            client = self._instructor_clients.get(region_name)
+
+        if client is None:
+            client = instructor.from_bedrock(self.bedrock_runtime(region_name))
+            with self._lock:
+                client = self._instructor_clients.setdefault(region_name, client)
+
+        return client
+
+    @property
+    def s3_client(self):
+        return self.boto_client('s3')
+
+    def _thread_resource(self, service_name: str):
+
+        resource = getattr(self._local, service_name, None)
+
+        if resource is None:
+            resource = boto3.session.Session().resource(service_name, config=self._aws_config())
+            setattr(self._local, service_name, resource)
+
+        return resource
+
+    @property
+    def dynamodb(self):
+        return self._thread_resource('dynamodb')
+
+    @property
+    def s3(self):
+        return self._thread_resource('s3')
+
+    @property
+    def twelve_labs(self) -> TwelveLabs:
+
+        with self._lock:
+
+            if self._twelve_labs is None:
+
+                client = TwelveLabs(api_key=os.getenv('TWELVE_LABS_API_KEY'))
+
+                # The SDK does not expose pool limits, so swap in an equivalent httpx client with explicit limits.
+                default_client = client._client
+                client._client = httpx.Client(
+                    base_url=default_client.base_url,
+                    headers=default_client.headers,
+                    timeout=default_client.timeout,
+                    limits=httpx.Limits(max_connections=self.twelve_labs_max_connections, max_keepalive_connections=self.twelve_labs_max_connections)
+                )
+                default_client.close()
+
+                self._twelve_labs = client
+
+            return self._twelve_labs
+
+    @property
+    def genai(self) -> genai.Client:
+
+        with self._lock:
+
+            if self._genai is None:
+
+                limits = httpx.Limits(max_connections=self.google_max_connections, max_keepalive_connections=self.google_max_connections)
+
+                self._genai = genai.Client(
+                    api_key=os.getenv('GOOGLE_API_KEY'),
+                    http_options=types.HttpOptions(client_args={'limits': limits}, async_client_args={'limits': limits})
+                )
+
+            return self._genai
+
+    def initialize(self):
+
+        """ Eagerly creates every client. Failures are logged rather than raised so one missing credential does not stop the API from starting. """
+
+        initializers = {
+            'twelvelabs': lambda: self.twelve_labs,
+            'google': lambda: self.genai,
+            'bedrock': lambda: self.instructor(),
+            'bedrock-us-east-1': lambda: self.bedrock_runtime('us-east-1'),
+            's3': lambda: self.s3_client,
+        }
+
+        for name, initializer in initializers.items():
+            try:
+                initializer()
+            except Exception as e:
+                logger.error(f"Error creating {name} client: {str(e)}")
+
+    def close(self):
+
+        """ Closes pooled HTTP connections. Clients are recreated lazily if used again. """
+
+        with self._lock:
+
+            if self._twelve_labs is not None:
+                self._twelve_labs._client.close()
+
+            for client in self._boto_clients.values():
+                client.close()
+
+            self._twelve_labs = None
+            self._genai = None
+            self._boto_clients = {}
+            self._instructor_clients = {}
+
+clients = ClientPool()
+
+__all__ = ['ClientPool', 'clients']
@@ -0,0 +1,229 @@
+import os
+import re
+import json
+import logging
+
+from dotenv import load_dotenv
+
+from .metrics import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Matches [1:02:03], (02:03) or a bare 12:34 in a transcript.
+TIMESTAMP_PATTERN = re.compile(r'[\[\(]?\b(?:(\d{1,2}):)?(\d{1,2}):(\d{2})\b[\]\)]?')
+
+evaluation_context_tokens = metrics.histogram(
+    'evaluation_context_tokens',
+    'Estimated prompt context tokens sent per evaluation generation, by context part.',
+    ('part',),
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+)
+
+def _as_int(value):
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _as_float(value, default: float = 0.0) -> float:
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+class ChapterContextBuilder:
+
+    """
+
+    Builds the evaluation prompt context from the chapters a student actually got wrong, instead of the whole lecture.
+
+    1. Every wrong answer is mapped to a chapter_id (its chapterId, the quiz question it answers, or its timestamp).
+    2. The transcript is sliced to those chapters' time ranges. Inline timestamps are used when the transcript has them,
+       otherwise the slice is proportional to the chapter's position in the video.
+    3. Chapter summaries, quiz questions and wrong answers are kept for the affected chapters only. Other chapters are
+       listed by id and title so recommendations can still reference them.
+    4. Transcript slices share whatever is left of token_budget, weighted by the number of mistakes per chapter.
+
+    Tokens are estimated at chars_per_token characters per token, which is close enough for budgeting.
+
+    """
+
+    def __init__(self, token_budget: int = 4000, chars_per_token: float = 4.0):
+
+        self.token_budget = token_budget
+        self.chars_per_token = chars_per_token
+
+    @classmethod
+    def from_env(cls):
+
+        return cls(
+            token_budget=int(os.getenv('EVALUATION_CONTEXT_TOKEN_BUDGET', '4000')),
+            chars_per_token=float(os.getenv('EVALUATION_CONTEXT_CHARS_PER_TOKEN', '4'))
+        )
+
+    def estimate_tokens(self, value) -> int:
+
+        text = value if isinstance(value, str) else json.dumps(value, default=str)
+        return int(len(text) / self.chars_per_token) + 1 if text else 0
+
+    @staticmethod
+    def _chapter_for_time(chapters: list, seconds: float):
+
+        for chapter in chapters:
+            if _as_float(chapter.get('start_time')) <= seconds < _as_float(chapter.get('end_time')):
+                return _as_int(chapter.get('chapter_id'))
+
+        return None
+
+    def chapter_mistakes(self, chapters: list, quiz_questions: list, wrong_answers: list) -> dict:
+
+        """ Returns {chapter_id: number of wrong answers} for every wrong answer that can be mapped to a chapter. """
+
+        chapter_by_question = {question.get('question'): _as_int(question.get('chapter_id')) for question in quiz_questions}
+        mistakes = {}
+
+        for wrong_answer in wrong_answers:
+
+            chapter_id = _as_int(wrong_answer.get('chapterId', wrong_answer.get('chapter_id')))
+
+            if chapter_id is None:
+                chapter_id = chapter_by_question.get(wrong_answer.get('question'))
+
+            if chapter_id is None and wrong_answer.get('timestamp') is not None:
+                chapter_id = self._chapter_for_time(chapters, _as_float(wrong_answer.get('timestamp'), -1))
+
+            if chapter_id is None:
+                logger.warning(f"Could not map wrong answer to a chapter: {wrong_answer.get('question')}")
+                continue
+
+            mistakes[chapter_id] = mistakes.get(chapter_id, 0) + 1
+
+        return mistakes
+
+    @staticmethod
+    def _timestamps(transcript: str) -> list:
+
+        """ Returns [(seconds, character offset)] for every inline timestamp, in transcript order. """
+
+        timestamps = []
+
+        for match in TIMESTAMP_PATTERN.finditer(transcript):
+            hours, minutes, seconds = match.groups()
+            timestamps.append((int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds), match.start()))
+
+        return timestamps
+
+    def slice_transcript(self, transcript: str, start_time: float, end_time: float, duration: float, timestamps: list | None = None) -> str:
+
+        """ Returns the part of the transcript between start_time and end_time (in seconds). """
+
+        if not transcript or end_time <= start_time:
+            return ''
+
+        timestamps = self._timestamps(transcript) if timestamps is None else timestamps
+
+        if len(timestamps) >= 2:
+
+            # From the last timestamp at or before the start to the first timestamp at or after the end.
+            start = max([offset for seconds, offset in timestamps if seconds <= start_time], default=0)
+            end = min([offset for seconds, offset in timestamps if seconds >= end_time], default=len(transcript))
+
+        else:
+
+            if duration <= 0:
+                return transcript
+
+            start = int(len(transcript) * max(start_time, 0) / duration)
+            end = int(len(transcript) * min(end_time, duration) / duration)
+
+            # Widen to whole words.
+            while start > 0 and not transcript[start - 1].isspace():
+                start -= 1
+            while end < len(transcript) and not transcript[end].isspace():
+                end += 1
+
+        return transcript[start:end].strip()
+
+    def _truncate(self, text: str, tokens: int) -> str:
+
+        max_chars = int(tokens * self.chars_per_token)
+
+        if len(text) <= max_chars:
+            return text
+
+        if max_chars <= 0:
+            return ''
+
+        return text[:max_chars].rsplit(' ', 1)[0] + ' ...'
+
+    def build(self, video_metadata: dict, wrong_answers: list) -> dict:
+
+        """ Returns the transcript, chapters, quiz_questions and wrong_answers prompt arguments, scoped to the student's mistakes. """
+
+        chapters = video_metadata.get('chapters') or []
+        quiz_questions = video_metadata.get('quiz_questions') or []
+        transcript = video_metadata.get('transcript') or ''
+
+        if isinstance(transcript, dict):
+            transcript = transcript.get('transcript', '')
+
+        mistakes = self.chapter_mistakes(chapters, quiz_questions, wrong_answers)
+
+        relevant_chapters = [chapter for chapter in chapters if _as_int(chapter.get('chapter_id')) in mistakes]
+        other_chapters = [
+            {'chapter_id': _as_int(chapter.get('chapter_id')), 'title': chapter.get('title')}
+            for chapter in chapters if _as_int(chapter.get('chapter_id')) not in mistakes
+        ]
+
+        context = {
+            'chapters': {'relevant_chapters': relevant_chapters, 'other_chapters': other_chapters},
+            'quiz_questions': [question for question in quiz_questions if _as_int(question.get('chapter_id')) in mistakes],
+            'wrong_answers': wrong_answers
+        }
+
+        fixed_tokens = sum(self.estimate_tokens(value) for value in context.values())
+        remaining_tokens = self.token_budget - fixed_tokens
+
+        if remaining_tokens <= 0 and relevant_chapters:
+            logger.warning(f"Evaluation context without transcript already uses {fixed_tokens} tokens, over the budget of {self.token_budget}")
+
+        duration = max([_as_float(chapter.get('end_time')) for chapter in chapters], default=0)
+        timestamps = self._timestamps(transcript)
+
+        # Chapters with the most mistakes get their share first, and budget a short chapter does not use rolls over to the rest.
+        ordered_chapters = sorted(relevant_chapters, key=lambda chapter: -mistakes[_as_int(chapter.get('chapter_id'))])
+        remaining_weight = sum(mistakes.values())
+        slices = {}
+
+        for chapter in ordered_chapters:
+
+            chapter_id = _as_int(chapter.get('chapter_id'))
+            weight = mistakes[chapter_id]
+
+            start_time, end_time = _as_float(chapter.get('start_time')), _as_float(chapter.get('end_time'))
+            header = f"[Chapter {chapter_id}: {chapter.get('title')} ({start_time:.0f}s - {end_time:.0f}s)]"
+
+            share = max(remaining_tokens, 0) * weight // max(remaining_weight, 1) - self.estimate_tokens(header)
+            excerpt = self._truncate(self.slice_transcript(transcript, start_time, end_time, duration, timestamps), share)
+
+            if excerpt:
+                slices[chapter_id] = f"{header}\n{excerpt}"
+                remaining_tokens -= self.estimate_tokens(slices[chapter_id])
+
+            remaining_weight -= weight
+
+        # Back in lecture order.
+        context['transcript'] = '\n\n'.join(slices[_as_int(chapter.get('chapter_id'))] for chapter in relevant_chapters if _as_int(chapter.get('chapter_id')) in slices)
+
+        for part, value in context.items():
+            evaluation_context_tokens.observe(self.estimate_tokens(value), part=part)
+
+        return context
+
+chapter_context_builder = ChapterContextBuilder.from_env()
+
+__all__ = ['ChapterContextBuilder', 'chapter_context_builder', 'evaluation_context_tokens']
@@ -0,0 +1,246 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import datetime
+from collections import OrderedDict
+
+from google.genai import types
+from dotenv import load_dotenv
+
+from .clients import clients
+from .metrics import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class LocalCachedContentStore:
+
+    """
+
+    Offline stand-in for client.caches with the same create/update/get/delete calls. It only records handles and their expiry,
+    so the context cache can be exercised in tests without the Gemini API.
+
+    Gemini does not know these handles, so GeminiContextCache.get_handle never hands them out and prompts send the video inline.
+
+    """
+
+    prefix = 'cachedContents/local-'
+
+    def __init__(self):
+
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _expire_time(config) -> datetime.datetime:
+
+        ttl_seconds = float(str(config.ttl).rstrip('s'))
+        return datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=ttl_seconds)
+
+    def create(self, model: str, config: types.CreateCachedContentConfig) -> types.CachedContent:
+
+        cached_content = types.CachedContent(name=f'{self.prefix}{uuid.uuid4().hex}', model=model, display_name=config.display_name, expire_time=self._expire_time(config))
+
+        with self._lock:
+            self.entries[cached_content.name] = cached_content
+
+        return cached_content
+
+    def update(self, name: str, config: types.UpdateCachedContentConfig) -> types.CachedContent:
+
+        with self._lock:
+
+            if name not in self.entries:
+                raise Exception(f"Cached content {name} not found")
+
+            self.entries[name] = self.entries[name].model_copy(update={'expire_time': self._expire_time(config)})
+            return self.entries[name]
+
+    def get(self, name: str) -> types.CachedContent:
+
+        with self._lock:
+
+            if name not in self.entries:
+                raise Exception(f"Cached content {name} not found")
+
+            return self.entries[name]
+
+    def delete(self, name: str):
+
+        with self._lock:
+            self.entries.pop(name, None)
+
+class GeminiContextCache:
+
+    """
+
+    Creates one Gemini cached-content handle per (model, uploaded video) and hands it out to every later prompt on that video,
+    so the video tokens are processed once and billed at the cached rate afterwards.
+
+    Handles are kept until they expire. A handle that is used within refresh_seconds of its expiry gets its TTL extended
+    instead of being recreated. If creating a handle fails (e.g. the model does not support explicit caching), the video is
+    sent inline as before and creation is not retried for failure_backoff_seconds.
+
+    caches is client.caches, or a LocalCachedContentStore for offline testing. Handles of the local store are managed as usual
+    but get_handle returns None for them, since the real generate_content would reject them.
+
+    """
+
+    def __init__(self, caches=None, enabled: bool = True, ttl_seconds: int = 3600, refresh_seconds: int = 300, failure_backoff_seconds: int = 600, max_entries: int = 256):
+
+        self._caches = caches
+
+        self.enabled = enabled
+
+        self.ttl_seconds = ttl_seconds
+        self.refresh_seconds = refresh_seconds
+        self.failure_backoff_seconds = failure_backoff_seconds
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self._failures = {}
+        self._locks = {}
+
+        self.counts = {'hit': 0, 'created': 0, 'refreshed': 0, 'error': 0}
+
+    @classmethod
+    def from_env(cls):
+
+        return cls(
+            caches=LocalCachedContentStore() if os.getenv('GEMINI_CONTEXT_CACHE_LOCAL', 'false').lower() == 'true' else None,
+            enabled=os.getenv('GEMINI_CONTEXT_CACHE', 'true').lower() == 'true',
+            ttl_seconds=int(os.getenv('GEMINI_CONTEXT_CACHE_TTL_SECONDS', '3600')),
+            refresh_seconds=int(os.getenv('GEMINI_CONTEXT_CACHE_REFRESH_SECONDS', '300'))
+        )
+
+    @property
+    def caches(self):
+        return self._caches if self._caches is not None else clients.genai.caches
+
+    @staticmethod
+    def video_contents(gemini_file_id: str) -> list:
+
+        return [
+            types.Content(
+                role='user',
+                parts=[
+                    types.Part.from_uri(
+                        file_uri=gemini_file_id,
+                        mime_type='video/mp4'
+                    )
+                ]
+            )
+        ]
+
+    def _expires_at(self, cached_content) -> float:
+
+        expire_time = getattr(cached_content, 'expire_time', None)
+        return expire_time.timestamp() if expire_time else time.time() + self.ttl_seconds
+
+    def _prune(self, now: float):
+
+        """ Drops elapsed backoffs and the locks of videos without a handle, so neither grows with every video ever prompted. """
+
+        self._failures = {key: until for key, until in self._failures.items() if until > now}
+
+        while len(self._failures) > self.max_entries:
+            del self._failures[next(iter(self._failures))]
+
+        for key in [key for key, lock in self._locks.items() if key not in self._entries and key not in self._failures and not lock.locked()]:
+            del self._locks[key]
+
+    @staticmethod
+    def _usable(name: str) -> str | None:
+        return None if name.startswith(LocalCachedContentStore.prefix) else name
+
+    def _store(self, key: tuple, cached_content):
+
+        self._entries[key] = {'name': cached_content.name, 'expires_at': self._expires_at(cached_content)}
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_handle(self, model: str, gemini_file_id: str) -> str | None:
+
+        """ Returns the cached-content name to prompt this video with, or None to send the video inline. """
+
+        if not self.enabled:
+            return None
+
+        key = (model, gemini_file_id)
+
+        if len(self._locks) > 2 * self.max_entries:
+            self._prune(time.time())
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+
+        # Concurrent prompts on the same video wait for one handle instead of each creating their own.
+        async with lock:
+
+            now = time.time()
+            entry = self._entries.get(key)
+
+            if entry is not None and entry['expires_at'] - now > self.refresh_seconds:
+                self.counts['hit'] += 1
+                self._entries.move_to_end(key)
+                return self._usable(entry['name'])
+
+            if entry is not None and entry['expires_at'] > now:
+
+                try:
+                    cached_content = await asyncio.to_thread(self.caches.update, name=entry['name'], config=types.UpdateCachedContentConfig(ttl=f'{self.ttl_seconds}s'))
+                    self._store(key, cached_content)
+                    self.counts['refreshed'] += 1
+                    return self._usable(entry['name'])
+                except Exception as e:
+                    logger.warning(f"Error refreshing cached content {entry['name']}, creating a new one: {str(e)}")
+
+            self._entries.pop(key, None)
+
+            if self._failures.get(key, 0) > now:
+                return None
+
+            try:
+
+                cached_content = await asyncio.to_thread(
+                    self.caches.create,
+                    model=model,
+                    config=types.CreateCachedContentConfig(
+                        contents=self.video_contents(gemini_file_id),
+                        display_name=gemini_file_id.rsplit('/', 1)[-1],
+                        ttl=f'{self.ttl_seconds}s'
+                    )
+                )
+
+            except Exception as e:
+
+                logger.error(f"Error creating cached content for {gemini_file_id}: {str(e)}")
+                self.counts['error'] += 1
+                self._failures[key] = now + self.failure_backoff_seconds
+                return None
+
+            self._store(key, cached_content)
+            self.counts['created'] += 1
+
+            return self._usable(cached_content.name)
+
+    def invalidate(self, model: str, gemini_file_id: str):
+
+        """ Forgets the handle, e.g. after Gemini rejected it. The next prompt creates a new one. """
+
+        self._entries.pop((model, gemini_file_id), None)
+
+    def stats(self) -> dict:
+        return {**self.counts, 'entries': len(self._entries)}
+
+gemini_context_cache = GeminiContextCache.from_env()
+
+metrics.counter('gemini_context_cache_lookups_total', 'Gemini cached-content lookups by result.', ('result',), callback=lambda: {(result,): count for result, count in gemini_context_cache.counts.items()})
+metrics.gauge('gemini_context_cache_entries', 'Gemini cached-content handles held by this process.', callback=lambda: gemini_context_cache.stats()['entries'])
+
+__all__ = ['GeminiContextCache', 'LocalCachedContentStore', 'gemini_context_cache']
@@ -0,0 +1,224 @@
+import os
+import statistics
+from collections import Counter
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def _as_int(value):
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _as_float(value, default=None):
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+def _clip(text, max_chars: int) -> str:
+
+    text = str(text or '')
+    return text if len(text) <= max_chars else text[:max_chars].rsplit(' ', 1)[0] + ' ...'
+
+def _distribution(values: list, bins: tuple) -> dict:
+
+    """ Count, mean, quartiles and a histogram over [bins[i], bins[i + 1]) of a list of numbers. """
+
+    if not values:
+        return {'count': 0}
+
+    quartiles = statistics.quantiles(values, n=4) if len(values) > 1 else [values[0]] * 3
+    histogram = {}
+
+    for low, high in zip(bins, bins[1:]):
+        last = high == bins[-1]
+        histogram[f'{low}-{high}'] = sum(1 for value in values if low <= value < high or (last and value == high))
+
+    return {
+        'count': len(values),
+        'mean': round(statistics.fmean(values), 3),
+        'p25': round(quartiles[0], 3),
+        'median': round(quartiles[1], 3),
+        'p75': round(quartiles[2], 3),
+        'histogram': histogram
+    }
+
+class CourseSummarizer:
+
+    """
+
+    Deterministic pre-aggregation of a course's stored data for the course analysis prompt.
+
+    Raw student items grow with the class, so instead of sending them to the model this computes, in one pass:
+    1. Per-question and per-chapter miss rates from every student's wrong answers.
+    2. Score and concept mastery distributions from the saved progress reports.
+    3. Engagement summaries from the generated engagement events and the students' reactions.
+
+    Lists that could grow with the class (questions, concepts, reactions) are capped, so the summary has the same size for
+    10 students as for 10,000.
+
+    """
+
+    def __init__(self, max_questions: int = 10, max_concepts: int = 10, max_engagement_moments: int = 5, max_text_chars: int = 200):
+
+        self.max_questions = max_questions
+        self.max_concepts = max_concepts
+        self.max_engagement_moments = max_engagement_moments
+        self.max_text_chars = max_text_chars
+
+    @classmethod
+    def from_env(cls):
+
+        return cls(
+            max_questions=int(os.getenv('COURSE_SUMMARY_MAX_QUESTIONS', '10')),
+            max_concepts=int(os.getenv('COURSE_SUMMARY_MAX_CONCEPTS', '10'))
+        )
+
+    @staticmethod
+    def _chapter_for_time(chapters: list, seconds) -> int | None:
+
+        seconds = _as_float(seconds)
+
+        if seconds is None:
+            return None
+
+        for chapter in chapters:
+            if _as_float(chapter.get('start_time'), 0) <= seconds < _as_float(chapter.get('end_time'), 0):
+                return _as_int(chapter.get('chapter_id'))
+
+        return None
+
+    def _question_summary(self, video_id: str, video_metadata: dict, student_data: list) -> tuple:
+
+        quiz_questions = video_metadata.get('quiz_questions') or []
+        chapter_by_question = {question.get('question'): _as_int(question.get('chapter_id')) for question in quiz_questions}
+
+        attempted = 0
+        missed_by_question = Counter()
+        struggling_by_chapter = Counter()
+        scores = []
+
+        for student in student_data:
+
+            wrong_answers = student.get(f'{video_id}_wrong_answers') or []
+            progress_report = student.get(f'{video_id}_progress_report')
+
+            if not wrong_answers and not progress_report:
+                continue
+
+            attempted += 1
+
+            # A student who retakes the quiz can miss the same question more than once. Count it once per student.
+            missed = {wrong_answer.get('question'): _as_int(wrong_answer.get('chapterId', wrong_answer.get('chapter_id'))) for wrong_answer in wrong_answers}
+            missed_by_question.update(missed.keys())
+            struggling_by_chapter.update({chapter_by_question.get(question, chapter_id) for question, chapter_id in missed.items()} - {None})
+
+            if quiz_questions:
+                scores.append(max(0.0, 1 - len(missed.keys() & chapter_by_question.keys()) / len(quiz_questions)))
+
+        def miss_rate(count: int) -> float:
+            return round(count / attempted, 3) if attempted else 0.0
+
+        most_missed = [
+            {
+                'question': _clip(question, self.max_text_chars),
+                'chapter_id': chapter_by_question.get(question),
+                'students_missed': count,
+                'miss_rate': miss_rate(count)
+            }
+            for question, count in missed_by_question.most_common(self.max_questions)
+        ]
+
+        chapters = []
+
+        for chapter in video_metadata.get('chapters') or []:
+
+            chapter_id = _as_int(chapter.get('chapter_id'))
+            questions = [question for question, question_chapter in chapter_by_question.items() if question_chapter == chapter_id]
+
+            chapters.append({
+                'chapter_id': chapter_id,
+                'title': chapter.get('title'),
+                'start_time': _as_float(chapter.get('start_time')),
+                'end_time': _as_float(chapter.get('end_time')),
+                'summary': _clip(chapter.get('summary'), self.max_text_chars),
+                'questions': len(questions),
+                'students_struggling': struggling_by_chapter[chapter_id],
+                'percentage_of_students_struggling': round(100 * miss_rate(struggling_by_chapter[chapter_id])),
+                'mean_question_miss_rate': round(statistics.fmean([miss_rate(missed_by_question[question]) for question in questions]), 3) if questions else None
+            })
+
+        students = {'students': len(student_data), 'students_with_attempts': attempted, 'score_distribution': _distribution(scores, (0, 0.2, 0.4, 0.6, 0.8, 1.0))}
+
+        return students, chapters, most_missed
+
+    def _mastery_summary(self, video_id: str, student_data: list) -> list:
+
+        levels_by_concept = {}
+        titles = {}
+
+        for student in student_data:
+
+            progress_report = student.get(f'{video_id}_progress_report') or {}
+
+            for concept in progress_report.get('concept_mastery') or []:
+
+                name = str(concept.get('concept') or '').strip()
+                level = _as_float(concept.get('mastery_level'))
+
+                if not name or level is None:
+                    continue
+
+                key = name.lower()
+                titles.setdefault(key, name)
+                levels_by_concept.setdefault(key, []).append(level)
+
+        concepts = sorted(levels_by_concept.items(), key=lambda item: -len(item[1]))[:self.max_concepts]
+
+        return [{'concept': titles[key], 'mastery_level': _distribution(levels, (0, 40, 70, 100))} for key, levels in concepts]
+
+    def _engagement_summary(self, video_metadata: dict, reactions: list) -> dict:
+
+        chapters = video_metadata.get('chapters') or []
+        engagement = [event for event in video_metadata.get('engagement') or [] if _as_float(event.get('engagement_level')) is not None]
+
+        lowest = sorted(engagement, key=lambda event: _as_float(event.get('engagement_level')))[:self.max_engagement_moments]
+
+        reactions_by_chapter = Counter(self._chapter_for_time(chapters, reaction.get('timestamp')) for reaction in reactions)
+
+        return {
+            'engagement_level': _distribution([_as_float(event.get('engagement_level')) for event in engagement], (0, 2, 4, 6, 8, 10)),
+            'emotions': dict(Counter(str(event.get('emotion')) for event in engagement).most_common(self.max_concepts)),
+            'lowest_engagement_moments': [
+                {'timestamp': event.get('timestamp'), 'engagement_level': _as_float(event.get('engagement_level')), 'reason': _clip(event.get('reason'), self.max_text_chars)}
+                for event in lowest
+            ],
+            'reactions': len(reactions),
+            'reactions_by_emoji': dict(Counter(str(reaction.get('emoji')) for reaction in reactions).most_common(self.max_concepts)),
+            'reactions_by_chapter': {chapter_id: count for chapter_id, count in reactions_by_chapter.items() if chapter_id is not None}
+        }
+
+    def summarize(self, video_id: str, video_metadata: dict, student_data: list, reactions: list | None = None) -> dict:
+
+        """ Returns the compact course summary sent to the course analysis prompt in place of the raw data. """
+
+        students, chapters, most_missed = self._question_summary(video_id, video_metadata, student_data)
+
+        return {
+            'title': video_metadata.get('title'),
+            'summary': _clip(video_metadata.get('summary'), 4 * self.max_text_chars),
+            **students,
+            'chapters': chapters,
+            'most_missed_questions': most_missed,
+            'concept_mastery': self._mastery_summary(video_id, student_data),
+            'engagement': self._engagement_summary(video_metadata, reactions or [])
+        }
+
+course_summarizer = CourseSummarizer.from_env()
+
+__all__ = ['CourseSummarizer', 'course_summarizer']
@@ -1,19 +1,99 @@
 import boto3
 import os
+import asyncio
 import logging
+import threading
 import time
+import functools
+import uuid
+import json
+import base64
+import random
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key, Attr
 from dotenv import load_dotenv
 
+from .clients import clients
+from .metrics import metrics, dynamodb_call_duration
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Attributes returned by the course catalog. Everything else (transcripts, quizzes, reactions) is only fetched per course.
+CATALOG_ATTRIBUTES = ['video_id', 'title', 'created_at', 'summary', 'chapter_count', 'quiz_question_count', 'key_takeaway_count']
+CATALOG_PARTITION = 'published'
+
+class CatalogCache:
+
+    """
+
+    Process-local cache of course catalog pages keyed by (limit, cursor).
+
+    Cleared whenever this process publishes a course. Other workers pick up new courses once CATALOG_CACHE_TTL_SECONDS expires.
+
+    """
+
+    def __init__(self, ttl_seconds: int = 60):
+
+        self.ttl_seconds = ttl_seconds
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def get(self, limit: int, cursor: str | None):
+
+        with self._lock:
+
+            page = self._pages.get((limit, cursor))
+
+            if page is None or page['expires_at'] < time.time():
+                return None
+
+            return page['value']
+
+    def set(self, limit: int, cursor: str | None, value: dict):
+
+        with self._lock:
+            self._pages[(limit, cursor)] = {'expires_at': time.time() + self.ttl_seconds, 'value': value}
+
+    def invalidate(self):
+
+        with self._lock:
+            self._pages.clear()
+
+catalog_cache = CatalogCache(ttl_seconds=int(os.getenv('CATALOG_CACHE_TTL_SECONDS', '60')))
+
+def encode_cursor(last_evaluated_key: dict | None) -> str | None:
+
+    """ Encodes a DynamoDB LastEvaluatedKey as an opaque URL-safe cursor. """
+
+    if not last_evaluated_key:
+        return None
+
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key, default=int).encode()).decode()
+
+def decode_cursor(cursor: str | None) -> dict | None:
+
+    """ Decodes a cursor produced by encode_cursor back into an ExclusiveStartKey. """
+
+    if not cursor:
+        return None
+
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise ValueError("Invalid cursor")
+
 class DBHandler:
 
+    # Shared pool for the per-student event queries of a student data page. Separate from AsyncDBHandler's pool, whose threads wait on it.
+    _event_query_executor = None
+    _event_query_executor_lock = threading.Lock()
+
     def __init__(self):
         try:
-            self.dynamodb = boto3.resource('dynamodb')
-            self.s3_client = boto3.resource('s3')
+            self.dynamodb = clients.dynamodb
+            self.s3_client = clients.s3
             logger.info("DynamoDB resource created successfully")
         except Exception as e:
             logger.error(f"Error creating DynamoDB resource: {str(e)}")
@@ -114,11 +194,17 @@ class DBHandler:
                 'key_takeaways': key_takeaways,
                 'pacing_recommendations': pacing_recommendations,
                 'engagement': engagement,
-                'transcript': transcript
+                'transcript': transcript,
+                'catalog_partition': CATALOG_PARTITION,
+                'chapter_count': len(chapters or []),
+                'quiz_question_count': len(quiz_questions or []),
+                'key_takeaway_count': len(key_takeaways or [])
             }
 
             response = table.put_item(Item=item)
 
+            catalog_cache.invalidate()
+
             return response
         
         except Exception as e:
@@ -146,10 +232,14 @@ class DBHandler:
             table = self.dynamodb.Table(table_name)
             logger.info("DynamoDB table reference obtained for getting published courses")
 
-            # Scan the table to get all items
+            # Scan the table to get all items, following LastEvaluatedKey past the 1MB page limit
             response = table.scan()
             items = response.get('Items', [])
 
+            while 'LastEvaluatedKey' in response:
+                response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
+                items.extend(response.get('Items', []))
+
             logger.info(f"Retrieved {len(items)} published courses from DynamoDB")
 
             return items
@@ -157,7 +247,122 @@ class DBHandler:
         except Exception as e:
             logger.error(f"=== Error in get_published_courses: {str(e)} ===")
             raise e
-        
+
+    def list_course_catalog(self, limit: int = 20, cursor: str | None = None):
+
+        """
+
+        Returns one page of the course catalog, newest first, with only the list attributes projected.
+
+        Reads the catalog-index GSI (catalog_partition, created_at) so each page is a single bounded query instead of a full table scan.
+        Returns a dictionary with the courses and the cursor of the next page (None on the last page).
+
+        """
+
+        try:
+
+            cached_page = catalog_cache.get(limit, cursor)
+
+            if cached_page is not None:
+                return cached_page
+
+            table_name = os.getenv('DYNAMODB_CONTENT_TABLE_NAME')
+
+            if not table_name:
+                raise Exception("DYNAMODB_CONTENT_TABLE_NAME environment variable not set")
+
+            table = self.dynamodb.Table(table_name)
+
+            query_kwargs = {
+                'IndexName': os.getenv('DYNAMODB_CATALOG_INDEX_NAME', 'catalog-index'),
+                'KeyConditionExpression': Key('catalog_partition').eq(CATALOG_PARTITION),
+                'ProjectionExpression': ', '.join(f'#{attribute}' for attribute in CATALOG_ATTRIBUTES),
+                'ExpressionAttributeNames': {f'#{attribute}': attribute for attribute in CATALOG_ATTRIBUTES},
+                'ScanIndexForward': False,
+                'Limit': limit
+            }
+
+            exclusive_start_key = decode_cursor(cursor)
+
+            if exclusive_start_key:
+                query_kwargs['ExclusiveStartKey'] = exclusive_start_key
+
+            response = table.query(**query_kwargs)
+
+            page = {
+                'courses': response.get('Items', []),
+                'next_cursor': encode_cursor(response.get('LastEvaluatedKey'))
+            }
+
+            catalog_cache.set(limit, cursor, page)
+
+            return page
+
+        except Exception as e:
+            logger.error(f"=== Error in list_course_catalog: {str(e)} ===")
+            raise e
+
+    def backfill_course_catalog(self):
+
+        """
+
+        One-off migration that adds courses published before the catalog-index existed to it.
+
+        Sets catalog_partition and the count attributes on every course item (items with a title), and created_at on the few that lack it,
+        since the sparse GSI only holds items with both of its keys. Safe to run again. Returns the number of courses updated.
+
+        """
+
+        try:
+
+            table_name = os.getenv('DYNAMODB_CONTENT_TABLE_NAME')
+
+            if not table_name:
+                raise Exception("DYNAMODB_CONTENT_TABLE_NAME environment variable not set")
+
+            table = self.dynamodb.Table(table_name)
+
+            scan_kwargs = {
+                'FilterExpression': Attr('title').exists(),
+                'ProjectionExpression': 'video_id, chapters, quiz_questions, key_takeaways'
+            }
+
+            updated = 0
+
+            while True:
+
+                response = table.scan(**scan_kwargs)
+
+                for item in response.get('Items', []):
+
+                    table.update_item(
+                        Key={'video_id': item['video_id']},
+                        UpdateExpression='SET catalog_partition = :partition, chapter_count = :chapters, quiz_question_count = :quiz_questions, '
+                                         'key_takeaway_count = :key_takeaways, created_at = if_not_exists(created_at, :now)',
+                        ExpressionAttributeValues={
+                            ':partition': CATALOG_PARTITION,
+                            ':chapters': len(item.get('chapters') or []),
+                            ':quiz_questions': len(item.get('quiz_questions') or []),
+                            ':key_takeaways': len(item.get('key_takeaways') or []),
+                            ':now': boto3.dynamodb.types.Decimal(str(int(time.time())))
+                        }
+                    )
+
+                    updated += 1
+
+                if 'LastEvaluatedKey' not in response:
+                    break
+
+                scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+            catalog_cache.invalidate()
+
+            return updated
+
+        except Exception as e:
+            logger.error(f"=== Error in backfill_course_catalog: {str(e)} ===")
+            raise e
+
     def fetch_course_metadata(self, video_id: str):
 
         """
@@ -191,36 +396,97 @@ class DBHandler:
             logger.error(f"=== Error in fetch_course_metadata: {str(e)} ===")
             raise e
         
-    def save_student_reaction(self, video_id: str, reaction: dict):
+    def _events_table(self, dynamodb=None):
+
+        table_name = os.getenv('DYNAMODB_CONTENT_EVENTS_NAME')
+
+        if not table_name:
+            raise Exception("DYNAMODB_CONTENT_EVENTS_NAME environment variable not set")
+
+        return (dynamodb or self.dynamodb).Table(table_name)
+
+    @staticmethod
+    def _event_item(partition_key: str, sort_key_prefix: str, data: dict, **attributes) -> dict:
+
         """
-        Saves a student reaction to DynamoDB.
+        Builds an append-only event item. The sort key is <prefix>#<epoch millis>#<uuid> so events are time ordered and never collide.
         """
-        try:
-            table_name = os.getenv('DYNAMODB_CONTENT_TABLE_NAME')
 
-            if not table_name:
-                raise Exception("DYNAMODB_CONTENT_TABLE_NAME environment variable not set")
+        created_at = int(time.time() * 1000)
 
-            table = self.dynamodb.Table(table_name)
-            
-            # Get existing reactions or initialize empty list
-            response = table.get_item(Key={'video_id': video_id})
-            item = response.get('Item', {})
-            
-            existing_reactions = item.get('student_reactions', [])
-            existing_reactions.append(reaction)
-            
-            # Update the item with new reaction
-            update_response = table.update_item(
-                Key={'video_id': video_id},
-                UpdateExpression='SET student_reactions = :reactions',
-                ExpressionAttributeValues={
-                    ':reactions': existing_reactions
-                }
-            )
+        return {
+            'pk': partition_key,
+            'sk': f"{sort_key_prefix}#{created_at:013d}#{uuid.uuid4().hex}",
+            'created_at': boto3.dynamodb.types.Decimal(created_at),
+            'data': data,
+            **attributes
+        }
+
+    def _append_events(self, items: list):
+
+        """
+        Appends events with a single write each. Multiple events are sent through batch_writer, which groups them into BatchWriteItem calls.
+        """
+
+        table = self._events_table()
+
+        if len(items) == 1:
+            return table.put_item(Item=items[0])
+
+        with table.batch_writer() as batch:
+            for item in items:
+                batch.put_item(Item=item)
+
+    def _query_events(self, partition_key: str, sort_key_prefix: str, dynamodb=None) -> list:
+
+        """
+        Returns the data of every event under a partition key whose sort key starts with the prefix, oldest first.
+        Pass dynamodb when calling from another thread, since boto3 resources are not thread-safe.
+        """
+
+        table = self._events_table(dynamodb)
+
+        query_kwargs = {
+            'KeyConditionExpression': Key('pk').eq(partition_key) & Key('sk').begins_with(sort_key_prefix + '#'),
+        }
+
+        events = []
+
+        while True:
+
+            response = table.query(**query_kwargs)
+            events.extend(response.get('Items', []))
+
+            if 'LastEvaluatedKey' not in response:
+                return events
+
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    @staticmethod
+    def _course_membership_item(video_id: str, student_name: str) -> dict:
+
+        """
+        Builds the per-course student index entry. Writing it again is idempotent, so it is simply re-put alongside every student write for the course.
+        """
+
+        return {
+            'pk': f"course#{video_id}",
+            'sk': f"student#{student_name}",
+            'video_id': video_id,
+            'student_name': student_name
+        }
+
+    def save_student_reaction(self, video_id: str, reaction: dict):
+        """
+        Appends a student reaction event to DynamoDB with a single write.
+        """
+        try:
+            response = self._append_events([
+                self._event_item(f"video#{video_id}", 'reaction', reaction, video_id=video_id, event_type='reaction')
+            ])
 
             logger.info(f"Successfully saved student reaction for video ID: {video_id}")
-            return update_response
+            return response
 
         except Exception as e:
             logger.error(f"=== Error in save_student_reaction: {str(e)} ===")
@@ -229,9 +495,24 @@ class DBHandler:
             logger.error(f"Full traceback: {traceback.format_exc()}")
             raise Exception(f"Error saving student reaction: {str(e)}")
 
+    def save_student_reactions(self, video_id: str, reactions: list):
+        """
+        Appends several student reaction events to DynamoDB in batched writes.
+        """
+        try:
+            return self._append_events([
+                self._event_item(f"video#{video_id}", 'reaction', reaction, video_id=video_id, event_type='reaction')
+                for reaction in reactions
+            ])
+
+        except Exception as e:
+            logger.error(f"=== Error in save_student_reactions: {str(e)} ===")
+            raise Exception(f"Error saving student reactions: {str(e)}")
+
     def get_student_reactions(self, video_id: str):
         """
         Retrieves all student reactions for a given video ID from DynamoDB.
+        Reactions stored on the course item before the event store existed are returned first.
         """
         try:
             table_name = os.getenv('DYNAMODB_CONTENT_TABLE_NAME')
@@ -241,13 +522,14 @@ class DBHandler:
 
             table = self.dynamodb.Table(table_name)
 
-            response = table.get_item(Key={'video_id': video_id})
+            response = table.get_item(Key={'video_id': video_id}, ProjectionExpression='video_id, student_reactions')
             item = response.get('Item', {})
 
             if not item:
                 raise ValueError(f"No course metadata found for video ID: {video_id}")
 
             student_reactions = item.get('student_reactions', [])
+            student_reactions.extend(event['data'] for event in self._query_events(f"video#{video_id}", 'reaction'))
 
             return student_reactions
 
@@ -257,7 +539,41 @@ class DBHandler:
 
     def save_wrong_answer(self, student_name: str, video_id: str, wrong_answer: dict):
         """
-        Saves a student's wrong answer to DynamoDB for analysis.
+        Appends a student's wrong answer event to DynamoDB with a single write.
+        """
+        try:
+            response = self._append_events([
+                self._event_item(f"student#{student_name}", f"wrong_answer#{video_id}", wrong_answer, student_name=student_name, video_id=video_id, event_type='wrong_answer'),
+                self._course_membership_item(video_id, student_name)
+            ])
+
+            logger.info(f"Successfully saved wrong answer for video ID: {video_id}")
+            return response
+
+        except Exception as e:
+            logger.error(f"=== Error in save_wrong_answer: {str(e)} ===")
+            logger.error(f"Exception type: {type(e).__name__}")
+            import traceback
+            logger.error(f"Full traceback: {traceback.format_exc()}")
+            raise Exception(f"Error saving wrong answer: {str(e)}")
+
+    def save_wrong_answers(self, student_name: str, video_id: str, wrong_answers: list):
+        """
+        Appends several wrong answer events for a student in batched writes.
+        """
+        try:
+            return self._append_events([
+                self._event_item(f"student#{student_name}", f"wrong_answer#{video_id}", wrong_answer, student_name=student_name, video_id=video_id, event_type='wrong_answer')
+                for wrong_answer in wrong_answers
+            ] + [self._course_membership_item(video_id, student_name)])
+
+        except Exception as e:
+            logger.error(f"=== Error in save_wrong_answers: {str(e)} ===")
+            raise Exception(f"Error saving wrong answers: {str(e)}")
+
+    def get_wrong_answers(self, student_name: str, video_id: str):
+        """
+        Retrieves a student's wrong answers for one video, including any stored on the user item before the event store existed.
         """
         try:
             table_name = os.getenv('DYNAMODB_CONTENT_USER_NAME')
@@ -266,39 +582,26 @@ class DBHandler:
                 raise Exception("DYNAMODB_CONTENT_USER_NAME environment variable not set")
 
             table = self.dynamodb.Table(table_name)
-            
-            # Get existing wrong answers or initialize empty list
-            response = table.get_item(Key={'student_name': student_name})
-            item = response.get('Item', {})
-            
-            existing_wrong_answers = item.get(video_id + "_wrong_answers", [])
-            existing_wrong_answers.append(wrong_answer)
-            
-            # Update the item with new wrong answer
-            update_response = table.update_item(
+
+            response = table.get_item(
                 Key={'student_name': student_name},
-                UpdateExpression='SET #wrong_answer_id = :wrong_answers',
-                ExpressionAttributeValues={
-                    ':wrong_answers': existing_wrong_answers
-                },
-                ExpressionAttributeNames={
-                    '#wrong_answer_id': video_id + "_wrong_answers"
-                }
+                ProjectionExpression='#wrong_answer_id',
+                ExpressionAttributeNames={'#wrong_answer_id': video_id + "_wrong_answers"}
             )
 
-            logger.info(f"Successfully saved wrong answer for video ID: {video_id}")
-            return update_response
+            wrong_answers = response.get('Item', {}).get(video_id + "_wrong_answers", [])
+            wrong_answers.extend(event['data'] for event in self._query_events(f"student#{student_name}", f"wrong_answer#{video_id}"))
+
+            return wrong_answers
 
         except Exception as e:
-            logger.error(f"=== Error in save_wrong_answer: {str(e)} ===")
-            logger.error(f"Exception type: {type(e).__name__}")
-            import traceback
-            logger.error(f"Full traceback: {traceback.format_exc()}")
-            raise Exception(f"Error saving wrong answer: {str(e)}")
-        
+            logger.error(f"=== Error in get_wrong_answers: {str(e)} ===")
+            raise e
+
     def get_student_profile(self, student_name: str):
         """
         Retrieves a student's profile from DynamoDB.
+        Wrong answer events are merged into the <video_id>_wrong_answers attributes so callers see the same shape as before.
         """
         try:
             table_name = os.getenv('DYNAMODB_CONTENT_USER_NAME')
@@ -311,8 +614,15 @@ class DBHandler:
             response = table.get_item(Key={'student_name': student_name})
             item = response.get('Item', {})
 
-            if not item:
+            wrong_answer_events = self._query_events(f"student#{student_name}", 'wrong_answer')
+
+            if not item and not wrong_answer_events:
                 raise ValueError(f"No student profile found for student name: {student_name}")
+
+            item.setdefault('student_name', student_name)
+
+            for event in wrong_answer_events:
+                item.setdefault(event['video_id'] + "_wrong_answers", []).append(event['data'])
             
             return item
         
@@ -320,7 +630,7 @@ class DBHandler:
             logger.error(f"=== Error in get_student_profile: {str(e)} ===")
             raise e
         
-    async def save_student_progress_report(self, student_name: str, video_id: str, progress_report: dict):
+    def save_student_progress_report(self, student_name: str, video_id: str, progress_report: dict):
         """
         Saves a student's progress report to DynamoDB.
         """
@@ -343,6 +653,8 @@ class DBHandler:
                 }
             )
 
+            self._events_table().put_item(Item=self._course_membership_item(video_id, student_name))
+
             logger.info(f"Successfully saved student progress report for video ID: {video_id}")
             return response
         
@@ -470,15 +782,148 @@ class DBHandler:
         except Exception as e:
             logger.error(f"=== Error in fetch_finished_videos: {str(e)} ===")
             raise e
-        
+
+    @classmethod
+    def _event_queries(cls) -> ThreadPoolExecutor:
+
+        with cls._event_query_executor_lock:
+            if cls._event_query_executor is None:
+                cls._event_query_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv('DYNAMODB_EVENT_QUERY_CONCURRENCY', '8')),
+                    thread_name_prefix='dynamodb-events'
+                )
+
+        return cls._event_query_executor
+
+    def _batch_get_items(self, request_items: dict, max_attempts: int = 8, base_delay: float = 0.05, max_delay: float = 2.0) -> list:
+
+        """
+        Runs a BatchGetItem and retries its UnprocessedKeys with full jitter exponential backoff, as DynamoDB recommends under throttling.
+        Returns the items of the single table in request_items.
+        """
+
+        table_name = next(iter(request_items))
+        items = []
+
+        for attempt in range(max_attempts):
+
+            if attempt:
+                time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+            response = self.dynamodb.batch_get_item(RequestItems=request_items)
+            items.extend(response.get('Responses', {}).get(table_name, []))
+            request_items = response.get('UnprocessedKeys')
+
+            if not request_items:
+                return items
+
+        raise Exception(f"BatchGetItem on {table_name} still had unprocessed keys after {max_attempts} attempts")
+
+    def fetch_student_data_page(self, video_id: str, limit: int = 50, cursor: str | None = None):
+
+        """
+
+        Fetches one page of student data for a single course using the per-course student index.
+
+        Only the course's own attributes are read for each student, so the cost is O(students in the course) rather than a scan of every student on the platform.
+        Returns a dictionary with the students and the cursor of the next page (None on the last page).
+
+        """
+
+        try:
+
+            table_name = os.getenv('DYNAMODB_CONTENT_USER_NAME')
+
+            if not table_name:
+                raise Exception("DYNAMODB_CONTENT_USER_NAME environment variable not set")
+
+            query_kwargs = {
+                'KeyConditionExpression': Key('pk').eq(f"course#{video_id}") & Key('sk').begins_with('student#'),
+                'ProjectionExpression': 'student_name',
+                'Limit': limit
+            }
+
+            exclusive_start_key = decode_cursor(cursor)
+
+            if exclusive_start_key:
+                query_kwargs['ExclusiveStartKey'] = exclusive_start_key
+
+            response = self._events_table().query(**query_kwargs)
+            student_names = [member['student_name'] for member in response.get('Items', [])]
+
+            students = {student_name: {'student_name': student_name} for student_name in student_names}
+
+            # BatchGetItem accepts up to 100 keys per call and may return UnprocessedKeys under throttling.
+            for start in range(0, len(student_names), 100):
+
+                request_items = {
+                    table_name: {
+                        'Keys': [{'student_name': student_name} for student_name in student_names[start:start + 100]],
+                        'ProjectionExpression': '#student_name, #progress_report_id, #wrong_answer_id',
+                        'ExpressionAttributeNames': {
+                            '#student_name': 'student_name',
+                            '#progress_report_id': video_id + "_progress_report",
+                            '#wrong_answer_id': video_id + "_wrong_answers"
+                        }
+                    }
+                }
+
+                for item in self._batch_get_items(request_items):
+                    students[item['student_name']].update(item)
+
+            def query_wrong_answers(student_name: str) -> list:
+                return self._query_events(f"student#{student_name}", f"wrong_answer#{video_id}", dynamodb=clients.dynamodb)
+
+            # One query per student, run concurrently so a page costs about one round trip instead of one per student.
+            for student, events in zip(students.values(), self._event_queries().map(query_wrong_answers, students.keys())):
+                if events:
+                    student.setdefault(video_id + "_wrong_answers", []).extend(event['data'] for event in events)
+
+            return {
+                'students': list(students.values()),
+                'next_cursor': encode_cursor(response.get('LastEvaluatedKey'))
+            }
+
+        except Exception as e:
+            logger.error(f"=== Error in fetch_student_data_page: {str(e)} ===")
+            raise e
+
     def fetch_student_data_from_course(self, video_id: str):
         
         """
         
-        Fetches all student data from a course from DynamoDB.
+        Fetches all student data from a course from DynamoDB by walking every page of the per-course student index.
         
         """
 
+        try:
+
+            students = []
+            cursor = None
+
+            while True:
+
+                page = self.fetch_student_data_page(video_id, cursor=cursor)
+                students.extend(page['students'])
+                cursor = page['next_cursor']
+
+                if not cursor:
+                    return students
+        
+        except Exception as e:
+            logger.error(f"=== Error in fetch_student_data_from_course: {str(e)} ===")
+            raise e
+
+    def backfill_course_index(self):
+
+        """
+
+        One-off migration that scans the user table and writes per-course index entries for students recorded before the index existed.
+
+        Returns the number of index entries written.
+
+        """
+
         try:
 
             table_name = os.getenv('DYNAMODB_CONTENT_USER_NAME')
@@ -488,14 +933,32 @@ class DBHandler:
 
             table = self.dynamodb.Table(table_name)
 
-            response = table.scan()
+            memberships = {}
+            scan_kwargs = {}
 
-            items = response.get('Items', [])
+            while True:
+
+                response = table.scan(**scan_kwargs)
+
+                for item in response.get('Items', []):
+                    for key in item.keys():
+                        for suffix in ('_progress_report', '_wrong_answers'):
+                            if key.endswith(suffix):
+                                video_id = key[:-len(suffix)]
+                                memberships[(video_id, item['student_name'])] = self._course_membership_item(video_id, item['student_name'])
+
+                if 'LastEvaluatedKey' not in response:
+                    break
+
+                scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+            if memberships:
+                self._append_events(list(memberships.values()))
+
+            return len(memberships)
 
-            return items
-        
         except Exception as e:
-            logger.error(f"=== Error in fetch_student_data_from_course: {str(e)} ===")
+            logger.error(f"=== Error in backfill_course_index: {str(e)} ===")
             raise e
         
     def fetch_s3_presigned_urls(self):
@@ -510,8 +973,8 @@ class DBHandler:
 
             presigned_urls = []
 
-            for obj in boto3.client('s3').list_objects(Bucket=os.getenv('S3_BUCKET_NAME'))['Contents']:
-                presigned_url = boto3.client('s3').generate_presigned_url('get_object', Params={'Bucket': os.getenv('S3_BUCKET_NAME'), 'Key': obj['Key']}, ExpiresIn=3600)
+            for obj in clients.s3_client.list_objects(Bucket=os.getenv('S3_BUCKET_NAME'))['Contents']:
+                presigned_url = clients.s3_client.generate_presigned_url('get_object', Params={'Bucket': os.getenv('S3_BUCKET_NAME'), 'Key': obj['Key']}, ExpiresIn=3600)
                 presigned_urls.append(presigned_url)
 
             return presigned_urls
@@ -520,4 +983,127 @@ class DBHandler:
             
             raise Exception(f"Error fetching S3 presigned URLs: {str(e)}")
         
-__all__ = ['DBHandler']
\ No newline at end of file
+class AsyncDBHandler:
+
+    """
+
+    Non-blocking version of DBHandler with the same method surface.
+
+    Each call runs the synchronous boto3 implementation on a shared, bounded thread pool so DynamoDB round trips never block the event loop.
+    The pool size (DYNAMODB_MAX_CONCURRENCY) caps the number of concurrent DynamoDB calls per process.
+
+    """
+
+    _executor = None
+    _executor_lock = threading.Lock()
+    _local = threading.local()
+
+    def __init__(self):
+
+        with AsyncDBHandler._executor_lock:
+            if AsyncDBHandler._executor is None:
+                AsyncDBHandler._executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv('DYNAMODB_MAX_CONCURRENCY', '32')),
+                    thread_name_prefix='dynamodb'
+                )
+
+    @classmethod
+    def _thread_db_handler(cls) -> DBHandler:
+
+        # DBHandler holds boto3 resources, which are not thread-safe, so each worker thread keeps its own.
+        db_handler = getattr(cls._local, 'db_handler', None)
+
+        if db_handler is None:
+            db_handler = DBHandler()
+            cls._local.db_handler = db_handler
+
+        return db_handler
+
+    @classmethod
+    def _call(cls, method_name: str, *args, **kwargs):
+        return getattr(cls._thread_db_handler(), method_name)(*args, **kwargs)
+
+    @classmethod
+    def queue_depth(cls) -> int:
+
+        """ Number of DynamoDB calls waiting for a free worker thread. """
+
+        if cls._executor is None:
+            return 0
+
+        return cls._executor._work_queue.qsize()
+
+    async def _run(self, method_name: str, *args, **kwargs):
+
+        loop = asyncio.get_running_loop()
+        start_time = time.perf_counter()
+        outcome = 'success'
+
+        try:
+            return await loop.run_in_executor(AsyncDBHandler._executor, functools.partial(self._call, method_name, *args, **kwargs))
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            dynamodb_call_duration.observe(time.perf_counter() - start_time, method=method_name, outcome=outcome)
+
+    async def upload_video_ids(self, twelve_labs_video_id: str, s3_key: str, gemini_file_id: str):
+        return await self._run('upload_video_ids', twelve_labs_video_id, s3_key, gemini_file_id)
+
+    async def fetch_video_ids(self, video_id: str):
+        return await self._run('fetch_video_ids', video_id)
+
+    async def upload_course_metadata(self, video_id: str, title: str, chapters: list, quiz_questions: list, key_takeaways: list, pacing_recommendations: list, summary: str, engagement: list, transcript: str, gemini_file_id: str, s3_key: str):
+        return await self._run('upload_course_metadata', video_id, title, chapters, quiz_questions, key_takeaways, pacing_recommendations, summary, engagement, transcript, gemini_file_id, s3_key)
+
+    async def get_published_courses(self):
+        return await self._run('get_published_courses')
+
+    async def list_course_catalog(self, limit: int = 20, cursor: str | None = None):
+        return await self._run('list_course_catalog', limit, cursor)
+
+    async def fetch_course_metadata(self, video_id: str):
+        return await self._run('fetch_course_metadata', video_id)
+
+    async def save_student_reaction(self, video_id: str, reaction: dict):
+        return await self._run('save_student_reaction', video_id, reaction)
+
+    async def get_student_reactions(self, video_id: str):
+        return await self._run('get_student_reactions', video_id)
+
+    async def save_wrong_answer(self, student_name: str, video_id: str, wrong_answer: dict):
+        return await self._run('save_wrong_answer', student_name, video_id, wrong_answer)
+
+    async def save_student_reactions(self, video_id: str, reactions: list):
+        return await self._run('save_student_reactions', video_id, reactions)
+
+    async def save_wrong_answers(self, student_name: str, video_id: str, wrong_answers: list):
+        return await self._run('save_wrong_answers', student_name, video_id, wrong_answers)
+
+    async def get_wrong_answers(self, student_name: str, video_id: str):
+        return await self._run('get_wrong_answers', student_name, video_id)
+
+    async def get_student_profile(self, student_name: str):
+        return await self._run('get_student_profile', student_name)
+
+    async def save_student_progress_report(self, student_name: str, video_id: str, progress_report: dict):
+        return await self._run('save_student_progress_report', student_name, video_id, progress_report)
+
+    async def fetch_student_progress_report(self, student_name: str, video_id: str):
+        return await self._run('fetch_student_progress_report', student_name, video_id)
+
+    async def fetch_finished_videos(self, student_name: str):
+        return await self._run('fetch_finished_videos', student_name)
+
+    async def fetch_student_data_page(self, video_id: str, limit: int = 50, cursor: str | None = None):
+        return await self._run('fetch_student_data_page', video_id, limit, cursor)
+
+    async def fetch_student_data_from_course(self, video_id: str):
+        return await self._run('fetch_student_data_from_course', video_id)
+
+    async def fetch_s3_presigned_urls(self):
+        return await self._run('fetch_s3_presigned_urls')
+
+metrics.gauge('dynamodb_executor_queue_depth', 'DynamoDB calls waiting for a free worker thread.', callback=AsyncDBHandler.queue_depth)
+
+__all__ = ['DBHandler', 'AsyncDBHandler']
\ No newline at end of file
@@ -0,0 +1,673 @@
+import os
+import time
+import logging
+import threading
+from decimal import Decimal
+
+import numpy as np
+from boto3.dynamodb.conditions import Key
+from dotenv import load_dotenv
+
+from .clients import clients
+from .vector_search import VectorSearchEngine
+from .ann_index import IVFIndex
+from .vector_store import MmapVectorStore
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PARTITION = 'manifest'
+
+def _video_partition(s3_key: str) -> str:
+    return f'video#{s3_key}'
+
+def _segment_sort_key(position: int) -> str:
+    return f'segment#{position:05d}'
+
+def score_segment_matches(query_segments: list, segments: list, max_matches: int = 3) -> dict:
+
+    """
+
+    Scores one video against the query segments exactly, the same way EmbeddingIndex.search_segments scores lectures: the mean,
+    over query segments, of the best cosine similarity to any of the video's segments, plus the best matching time ranges.
+
+    """
+
+    if not query_segments or not segments:
+        return {'score': 0.0, 'matches': []}
+
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+    queries = normalize(np.stack([np.asarray(segment['embedding'], dtype=np.float32) for segment in query_segments]))
+    candidates = normalize(np.stack([np.asarray(segment['embedding'], dtype=np.float32) for segment in segments]))
+
+    similarities = queries @ candidates.T
+    best_segments = similarities.argmax(axis=1)
+    best_similarities = similarities[np.arange(len(queries)), best_segments]
+
+    return {
+        'score': float(best_similarities.mean()),
+        'matches': [
+            {
+                'query_start_offset_sec': query_segments[position]['start_offset_sec'],
+                'query_end_offset_sec': query_segments[position]['end_offset_sec'],
+                'start_offset_sec': segments[best_segments[position]]['start_offset_sec'],
+                'end_offset_sec': segments[best_segments[position]]['end_offset_sec'],
+                'similarity': float(best_similarities[position])
+            }
+            for position in np.argsort(-best_similarities, kind='stable')[:max_matches]
+        ]
+    }
+
+class EmbeddingIndex:
+
+    """
+
+    Persistent Marengo embedding index for the lectures in the S3 bucket.
+
+    Every object is embedded once and stored per segment (vector plus start/end offsets) in DynamoDB, keyed by S3 key and ETag.
+    An object is only re-embedded when its ETag changes, so related video lookups read the local index instead of
+    re-embedding the whole bucket on every request.
+
+    Related video search matches segments against segments through an IVF index over every segment in the library, and
+    aggregates the segment hits into one score per video together with the time ranges that matched.
+
+    If a vector store is configured, segment vectors are kept in a shared memory-mapped MmapVectorStore instead of per
+    process arrays, and the ANN index reads them zero-copy in search_dtype (float32, float16 or int8).
+
+    Table layout (pk / sk):
+    - 'manifest' / '<s3_key>': etag, segment_count and indexed_at for each indexed object
+    - 'video#<s3_key>' / 'segment#<position>': etag, start_offset_sec, end_offset_sec and the float32 embedding bytes
+
+    """
+
+    def __init__(self, table_name: str | None = None, bucket_name: str | None = None, sync_interval_seconds: int = 300, ann_min_segments: int = 4096, ann_n_probe: int = 8, vector_store: MmapVectorStore | None = None, search_dtype: str = 'float32'):
+
+        self.table_name = table_name
+        self.bucket_name = bucket_name
+        self.sync_interval_seconds = sync_interval_seconds
+
+        self.vector_store = vector_store
+        self.search_dtype = search_dtype
+
+        # Below ann_min_segments the segment index uses a single cell, i.e. an exact scan.
+        self.ann_min_segments = ann_min_segments
+        self.ann_n_probe = ann_n_probe
+
+        self._videos = {}
+        self._engine = None
+
+        self._segment_index = None
+        self._segment_keys = []
+        self._segment_times = []
+        self._segment_generation = None
+        self._store_generation = vector_store.generation if vector_store is not None else None
+        self._loaded = False
+        self._last_synced = 0.0
+
+        self._lock = threading.RLock()
+
+        # Held for a whole load or sync, so concurrent requests share one bucket listing and one batch of embedding jobs.
+        self._load_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+
+        """ Builds the index from environment variables. Vectors are kept in a memory-mapped store under EMBEDDING_STORE_DIR. """
+
+        try:
+            vector_store = MmapVectorStore(os.getenv('EMBEDDING_STORE_DIR', '.embedding_store'))
+        except Exception as e:
+            logger.error(f"Error opening embedding vector store, keeping vectors in memory: {str(e)}")
+            vector_store = None
+
+        return cls(
+            table_name=os.getenv('DYNAMODB_EMBEDDINGS_TABLE_NAME'),
+            bucket_name=os.getenv('S3_BUCKET_NAME'),
+            sync_interval_seconds=int(os.getenv('EMBEDDING_INDEX_SYNC_SECONDS', '300')),
+            ann_min_segments=int(os.getenv('EMBEDDING_ANN_MIN_SEGMENTS', '4096')),
+            ann_n_probe=int(os.getenv('EMBEDDING_ANN_N_PROBE', '8')),
+            vector_store=vector_store,
+            search_dtype=os.getenv('EMBEDDING_SEARCH_DTYPE', 'float16')
+        )
+
+    @property
+    def table(self):
+        return clients.dynamodb.Table(self.table_name)
+
+    def __len__(self) -> int:
+        return len(self._videos)
+
+    def __contains__(self, s3_key: str) -> bool:
+        return s3_key in self._videos
+
+    @staticmethod
+    def _deserialize_segment(item: dict) -> dict:
+
+        embedding = item['embedding']
+
+        return {
+            'start_offset_sec': float(item['start_offset_sec']),
+            'end_offset_sec': float(item['end_offset_sec']),
+            'embedding': np.frombuffer(getattr(embedding, 'value', embedding), dtype=np.float32)
+        }
+
+    def _query_partition(self, partition: str) -> list:
+
+        items = []
+        query_kwargs = {'KeyConditionExpression': Key('pk').eq(partition)}
+
+        while True:
+
+            response = self.table.query(**query_kwargs)
+            items.extend(response.get('Items', []))
+
+            if 'LastEvaluatedKey' not in response:
+                return items
+
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def load(self):
+
+        """ Loads the whole index into memory with one paginated scan. """
+
+        videos = {}
+        segments = {}
+
+        try:
+
+            scan_kwargs = {}
+
+            while True:
+
+                response = self.table.scan(**scan_kwargs)
+
+                for item in response.get('Items', []):
+                    if item['pk'] == MANIFEST_PARTITION:
+                        videos[item['sk']] = {'etag': item['etag'], 'segments': []}
+                    else:
+                        segments.setdefault(item['pk'], []).append(item)
+
+                if 'LastEvaluatedKey' not in response:
+                    break
+
+                scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        except Exception as e:
+
+            raise Exception(f"Error loading embedding index: {str(e)}")
+
+        for s3_key, video in videos.items():
+            # Skip segments left over from a previous ETag that has not been cleaned up yet.
+            items = sorted((item for item in segments.get(_video_partition(s3_key), []) if item.get('etag') == video['etag']), key=lambda item: item['sk'])
+            video['segments'] = [self._deserialize_segment(item) for item in items]
+
+        for s3_key, video in videos.items():
+            video['segments'] = self._materialize(s3_key, video['etag'], video['segments'])
+
+        with self._lock:
+            self._videos = videos
+            self._engine = None
+            self._segment_index = None
+            self._loaded = True
+
+    def ensure_loaded(self):
+
+        if self._loaded:
+            return
+
+        with self._load_lock:
+            if not self._loaded:
+                self.load()
+
+    def _load_video(self, s3_key: str, etag: str) -> dict | None:
+
+        """ Reads one object's segments from the table if they were indexed for this ETag (e.g. by another worker). """
+
+        manifest = self.table.get_item(Key={'pk': MANIFEST_PARTITION, 'sk': s3_key}).get('Item')
+
+        if manifest is None or manifest['etag'] != etag:
+            return None
+
+        items = [item for item in self._query_partition(_video_partition(s3_key)) if item.get('etag') == etag]
+
+        return {'etag': etag, 'segments': [self._deserialize_segment(item) for item in items]}
+
+    def _store_video(self, s3_key: str, etag: str, segments: list):
+
+        previous = self._query_partition(_video_partition(s3_key))
+
+        with self.table.batch_writer(overwrite_by_pkeys=['pk', 'sk']) as batch:
+
+            for position, segment in enumerate(segments):
+                batch.put_item(Item={
+                    'pk': _video_partition(s3_key),
+                    'sk': _segment_sort_key(position),
+                    'etag': etag,
+                    'start_offset_sec': Decimal(str(segment['start_offset_sec'])),
+                    'end_offset_sec': Decimal(str(segment['end_offset_sec'])),
+                    'embedding': np.asarray(segment['embedding'], dtype=np.float32).tobytes()
+                })
+
+            for item in previous[len(segments):]:
+                batch.delete_item(Key={'pk': item['pk'], 'sk': item['sk']})
+
+        # The manifest is written last so a reader never sees an ETag whose segments are not stored yet.
+        self.table.put_item(Item={
+            'pk': MANIFEST_PARTITION,
+            'sk': s3_key,
+            'etag': etag,
+            'segment_count': len(segments),
+            'indexed_at': int(time.time())
+        })
+
+    def _materialize(self, s3_key: str, etag: str, segments: list) -> list:
+
+        """ Moves segment vectors into the vector store (if configured) and replaces them with zero-copy views of it. """
+
+        if self.vector_store is None:
+            return [dict(segment, embedding=np.asarray(segment['embedding'], dtype=np.float32)) for segment in segments]
+
+        self.vector_store.refresh()
+
+        vector_ids = [f'{s3_key}#{etag}#{position}' for position in range(len(segments))]
+        missing = [(vector_id, segment['embedding']) for vector_id, segment in zip(vector_ids, segments) if vector_id not in self.vector_store]
+
+        # Another worker may already have written these vectors.
+        self.vector_store.append(missing)
+
+        return [dict(segment, vector_id=vector_id, embedding=self.vector_store.get(vector_id)) for vector_id, segment in zip(vector_ids, segments)]
+
+    def _release_vectors(self, video: dict | None):
+
+        if self.vector_store is not None and video is not None:
+            self.vector_store.delete([segment['vector_id'] for segment in video['segments']])
+
+    def _set_video(self, s3_key: str, video: dict):
+
+        segments = self._materialize(s3_key, video['etag'], video['segments'])
+
+        with self._lock:
+
+            self._follow_store()
+
+            is_new = s3_key not in self._videos
+
+            if not is_new and self._videos[s3_key]['etag'] != video['etag']:
+                self._release_vectors(self._videos[s3_key])
+
+            self._videos[s3_key] = {'etag': video['etag'], 'segments': segments}
+            self._engine = None
+
+            # New lectures are appended to the segment index. A changed lecture has stale segments in it, so the index is rebuilt on the next search.
+            if is_new and self._segment_index is not None and self._segment_index.n_lists != 1:
+                self._append_segments(s3_key, segments)
+            else:
+                self._segment_index = None
+
+    def index_object(self, s3_key: str, embed_video, etag: str | None = None) -> bool:
+
+        """
+
+        Embeds one S3 object unless it is already indexed for its current ETag. Returns True if the object was (re-)embedded.
+
+        embed_video(video_url) must return a list of {'start_offset_sec', 'end_offset_sec', 'embedding'} segments.
+
+        """
+
+        try:
+
+            self.ensure_loaded()
+
+            if etag is None:
+                etag = clients.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)['ETag']
+
+            if s3_key in self._videos and self._videos[s3_key]['etag'] == etag:
+                return False
+
+            video = self._load_video(s3_key, etag)
+            embedded = video is None
+
+            if embedded:
+                segments = embed_video(self.presigned_url(s3_key))
+                self._store_video(s3_key, etag, segments)
+                video = {'etag': etag, 'segments': segments}
+
+            self._set_video(s3_key, video)
+
+            return embedded
+
+        except Exception as e:
+
+            raise Exception(f"Error indexing {s3_key}: {str(e)}")
+
+    def remove_object(self, s3_key: str):
+
+        try:
+
+            with self.table.batch_writer() as batch:
+
+                for item in self._query_partition(_video_partition(s3_key)):
+                    batch.delete_item(Key={'pk': item['pk'], 'sk': item['sk']})
+
+                batch.delete_item(Key={'pk': MANIFEST_PARTITION, 'sk': s3_key})
+
+            with self._lock:
+                self._release_vectors(self._videos.pop(s3_key, None))
+                self._engine = None
+                self._segment_index = None
+
+        except Exception as e:
+
+            raise Exception(f"Error removing {s3_key} from embedding index: {str(e)}")
+
+    def list_bucket_objects(self) -> dict:
+
+        """ Returns {s3_key: etag} for every object in the bucket. """
+
+        objects = {}
+
+        for page in clients.s3_client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket_name):
+            for obj in page.get('Contents', []):
+                objects[obj['Key']] = obj['ETag']
+
+        return objects
+
+    def sync(self, embed_videos) -> dict:
+
+        """
+
+        Brings the index in line with the bucket: embeds new or changed objects and drops deleted ones.
+
+        embed_videos(video_urls) embeds the whole batch at once and returns {'results': {url: segments}, 'failed': {...}, 'pending': [...]}
+        (see MarengoBatchEmbedder.embed_videos). Objects that failed or missed the deadline are retried on the next sync.
+
+        """
+
+        self.ensure_loaded()
+
+        objects = self.list_bucket_objects()
+        summary = {'embedded': 0, 'removed': 0, 'failed': 0, 'pending': 0}
+        to_embed = {}
+
+        # Uploads may index objects while the sync runs, so work from a snapshot.
+        with self._lock:
+            indexed = {s3_key: video['etag'] for s3_key, video in self._videos.items()}
+
+        for s3_key, etag in objects.items():
+
+            if indexed.get(s3_key) == etag:
+                continue
+
+            try:
+                video = self._load_video(s3_key, etag)
+            except Exception as e:
+                logger.error(f"Error reading {s3_key} from embedding index: {str(e)}")
+                video = None
+
+            if video is not None:
+                self._set_video(s3_key, video)
+            else:
+                to_embed[self.presigned_url(s3_key)] = (s3_key, etag)
+
+        if to_embed:
+
+            batch = embed_videos(list(to_embed))
+
+            for video_url, segments in batch['results'].items():
+
+                s3_key, etag = to_embed[video_url]
+
+                try:
+                    self._store_video(s3_key, etag, segments)
+                    self._set_video(s3_key, {'etag': etag, 'segments': segments})
+                    summary['embedded'] += 1
+                except Exception as e:
+                    summary['failed'] += 1
+                    logger.error(f"Error indexing {s3_key}: {str(e)}")
+
+            for video_url, error in batch['failed'].items():
+                summary['failed'] += 1
+                logger.error(f"Error embedding {to_embed[video_url][0]}: {error}")
+
+            summary['pending'] = len(batch['pending'])
+
+        for s3_key in set(indexed) - set(objects):
+            self.remove_object(s3_key)
+            summary['removed'] += 1
+
+        # Changed and deleted lectures leave dead rows behind. Rewrite the store once they outnumber the live ones.
+        if self.vector_store is not None and self.vector_store.dead_rows > len(self.vector_store):
+            self.compact_store()
+
+        self._last_synced = time.time()
+
+        return summary
+
+    def compact_store(self):
+
+        """ Drops dead rows from the vector store and re-points every segment at the compacted files. """
+
+        if self.vector_store is None:
+            return
+
+        with self._lock:
+            self.vector_store.compact()
+            self._follow_store()
+
+    def _follow_store(self):
+
+        """
+
+        Re-points segment vectors at the current store files after a compaction, by this or another worker, and drops the
+        segment index, whose rows were renumbered. Must be called with the lock held.
+
+        Segments whose vectors another worker deleted (e.g. it re-indexed the lecture for a new ETag) keep reading the old
+        files and are left out of the segment index until the next sync picks up the new version.
+
+        """
+
+        if self.vector_store is None:
+            return
+
+        self.vector_store.refresh()
+
+        if self.vector_store.generation == self._store_generation:
+            return
+
+        for video in self._videos.values():
+            for segment in video['segments']:
+                if segment['vector_id'] in self.vector_store:
+                    segment['embedding'] = self.vector_store.get(segment['vector_id'])
+
+        self._store_generation = self.vector_store.generation
+        self._engine = None
+        self._segment_index = None
+
+    def sync_if_stale(self, embed_videos) -> dict | None:
+
+        """
+
+        Syncs with the bucket at most once per sync interval. New uploads are indexed as they arrive, this only catches changes made outside the API.
+
+        Only one sync runs at a time. Requests that find one in progress search the current index instead of waiting for it,
+        unless nothing is loaded yet.
+
+        """
+
+        if time.time() - self._last_synced < self.sync_interval_seconds:
+            self.ensure_loaded()
+            return None
+
+        if not self._sync_lock.acquire(blocking=not self._loaded):
+            return None
+
+        try:
+
+            # Another request may have finished a sync while this one waited for the lock.
+            if time.time() - self._last_synced < self.sync_interval_seconds:
+                self.ensure_loaded()
+                return None
+
+            return self.sync(embed_videos)
+
+        finally:
+
+            self._sync_lock.release()
+
+    def presigned_url(self, s3_key: str, expires_in: int = 3600) -> str:
+        return clients.s3_client.generate_presigned_url('get_object', Params={'Bucket': self.bucket_name, 'Key': s3_key}, ExpiresIn=expires_in)
+
+    def video_embedding(self, s3_key: str) -> np.ndarray:
+
+        """ Concatenated segment embeddings for one object, the same shape fetch_related_videos used to build per request. """
+
+        segments = self._videos[s3_key]['segments']
+
+        if not segments:
+            return np.zeros(0, dtype=np.float32)
+
+        return np.concatenate([segment['embedding'] for segment in segments])
+
+    def search(self, query_embedding, k: int, metric: str = 'euclidean') -> list:
+
+        """ Returns the k closest (s3_key, distance) pairs to the query embedding. """
+
+        self.ensure_loaded()
+
+        with self._lock:
+
+            self._follow_store()
+
+            if self._engine is None or self._engine.metric != metric:
+                self._engine = VectorSearchEngine.from_embeddings({s3_key: self.video_embedding(s3_key) for s3_key in self._videos}, metric=metric)
+
+            engine = self._engine
+
+        return engine.search(query_embedding, k)
+
+    def _append_segments(self, s3_key: str, segments: list):
+
+        if not segments:
+            return
+
+        first_id = len(self._segment_keys)
+        ids = np.arange(first_id, first_id + len(segments))
+
+        if self.vector_store is not None:
+
+            view, rows, generation = self.vector_store.lookup([segment['vector_id'] for segment in segments], self.search_dtype)
+
+            # The index holds rows of the generation it was built from. Rebuild on the next search instead of mixing them.
+            if generation != self._segment_generation or (rows < 0).any():
+                self._segment_index = None
+                return
+
+            self._segment_index.add(view, ids, rows=rows)
+
+        else:
+            self._segment_index.add(np.stack([segment['embedding'] for segment in segments]), ids)
+
+        self._segment_keys.extend([s3_key] * len(segments))
+        self._segment_times.extend((segment['start_offset_sec'], segment['end_offset_sec']) for segment in segments)
+
+    def _build_segment_index(self):
+
+        keys, times, segments = [], [], []
+
+        for s3_key, video in self._videos.items():
+            for segment in video['segments']:
+                keys.append(s3_key)
+                times.append((segment['start_offset_sec'], segment['end_offset_sec']))
+                segments.append(segment)
+
+        if self.vector_store is not None:
+
+            view, rows, self._segment_generation = self.vector_store.lookup([segment['vector_id'] for segment in segments], self.search_dtype)
+
+            # Vectors deleted by another worker are skipped (see _follow_store).
+            live = np.flatnonzero(rows >= 0)
+            keys, times, segments, rows = [keys[i] for i in live], [times[i] for i in live], [segments[i] for i in live], rows[live]
+
+        self._segment_keys = keys
+        self._segment_times = times
+
+        if not segments:
+            self._segment_index = None
+            return
+
+        index = IVFIndex(metric='cosine', n_lists=1 if len(segments) < self.ann_min_segments else None, n_probe=self.ann_n_probe, copy_vectors=self.vector_store is None)
+
+        if self.vector_store is not None:
+            self._segment_index = index.build(view, rows=rows)
+        else:
+            self._segment_index = index.build(np.stack([segment['embedding'] for segment in segments]))
+
+    def search_segments(self, query_segments: list, k: int = 5, segments_per_query: int = 20, max_matches: int = 3) -> list:
+
+        """
+
+        Finds the k lectures whose segments best match the query segments.
+
+        Every query segment takes its closest library segments from the ANN index. A lecture scores the mean, over all query
+        segments, of its best cosine similarity to that segment (0 if none of its segments were retrieved). Each result lists
+        the best matching (query time range, lecture time range) pairs.
+
+        """
+
+        self.ensure_loaded()
+
+        with self._lock:
+
+            self._follow_store()
+
+            if self._segment_index is None:
+                self._build_segment_index()
+
+            index, keys, times = self._segment_index, self._segment_keys, self._segment_times
+
+        if index is None or not query_segments:
+            return []
+
+        ids, scores = index.search(np.stack([segment['embedding'] for segment in query_segments]), segments_per_query)
+
+        # {s3_key: {query position: (similarity, segment id)}}, keeping the best hit per query segment.
+        best_hits = {}
+
+        for position, (row_ids, row_scores) in enumerate(zip(ids, scores)):
+            for segment_id, score in zip(row_ids, row_scores):
+                if segment_id < 0:
+                    break
+                best_hits.setdefault(keys[segment_id], {}).setdefault(position, (float(score), int(segment_id)))
+
+        results = []
+
+        for s3_key, hits in best_hits.items():
+
+            score = sum(similarity for similarity, _ in hits.values()) / len(query_segments)
+            matches = sorted(hits.items(), key=lambda hit: -hit[1][0])[:max_matches]
+
+            results.append({
+                's3_key': s3_key,
+                'score': score,
+                'matches': [
+                    {
+                        'query_start_offset_sec': query_segments[position]['start_offset_sec'],
+                        'query_end_offset_sec': query_segments[position]['end_offset_sec'],
+                        'start_offset_sec': times[segment_id][0],
+                        'end_offset_sec': times[segment_id][1],
+                        'similarity': similarity
+                    }
+                    for position, (similarity, segment_id) in matches
+                ]
+            })
+
+        return sorted(results, key=lambda result: -result['score'])[:k]
+
+embedding_index = EmbeddingIndex.from_env()
+
+__all__ = ['EmbeddingIndex', 'embedding_index', 'score_segment_matches']
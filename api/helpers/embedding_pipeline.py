@@ -0,0 +1,131 @@
+import os
+import random
+import asyncio
+import logging
+
+import numpy as np
+from dotenv import load_dotenv
+
+from .clients import clients
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+class MarengoBatchEmbedder:
+
+    """
+
+    Embeds many videos with Marengo concurrently.
+
+    Every video gets its own embedding task. Up to max_in_flight tasks are submitted and polled at the same time with
+    jittered exponential backoff, so a batch takes roughly as long as its slowest task instead of the sum of all of them.
+    Once the deadline passes the batch returns whatever finished; the rest is reported as pending.
+
+    """
+
+    def __init__(self, model_name: str = 'Marengo-retrieval-2.7', max_in_flight: int = 8, initial_poll_interval: float = 1.0, max_poll_interval: float = 10.0, backoff_factor: float = 1.5):
+
+        self.model_name = model_name
+        self.max_in_flight = max_in_flight
+        self.initial_poll_interval = initial_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff_factor = backoff_factor
+
+    @classmethod
+    def from_env(cls):
+
+        return cls(
+            max_in_flight=int(os.getenv('EMBEDDING_MAX_IN_FLIGHT', '8')),
+            max_poll_interval=float(os.getenv('EMBEDDING_MAX_POLL_INTERVAL_SECONDS', '10'))
+        )
+
+    async def _wait_until_done(self, task_id: str):
+
+        client = clients.twelve_labs
+        interval = self.initial_poll_interval
+
+        while True:
+
+            # Full jitter keeps many tasks submitted together from polling in lockstep.
+            await asyncio.sleep(random.uniform(interval / 2, interval))
+
+            try:
+                status = (await asyncio.to_thread(client.embed.task.status, task_id)).status
+            except Exception as e:
+                logger.warning(f"Error fetching status of embedding task {task_id}, retrying: {str(e)}")
+                status = None
+
+            if status == 'ready':
+                return
+
+            if status == 'failed':
+                raise Exception(f"Embedding task {task_id} failed")
+
+            interval = min(interval * self.backoff_factor, self.max_poll_interval)
+
+    async def embed_video(self, video_url: str, start_offset_sec: float = 0, end_offset_sec: float = 20) -> list:
+
+        """ Embeds one video and returns its segments as {'start_offset_sec', 'end_offset_sec', 'embedding'} dicts. """
+
+        client = clients.twelve_labs
+
+        task = await asyncio.to_thread(
+            client.embed.task.create,
+            model_name=self.model_name,
+            video_url=video_url,
+            video_start_offset_sec=start_offset_sec,
+            video_end_offset_sec=end_offset_sec
+        )
+
+        await self._wait_until_done(task.id)
+
+        video_embedding = await asyncio.to_thread(client.embed.task.retrieve, task.id, embedding_option=['visual-text'])
+
+        return [
+            {
+                'start_offset_sec': segment.start_offset_sec,
+                'end_offset_sec': segment.end_offset_sec,
+                'embedding': np.asarray(segment.embeddings_float, dtype=np.float32)
+            }
+            for segment in video_embedding.video_embedding.segments
+        ]
+
+    async def embed_videos(self, video_urls: list, deadline_seconds: float | None = None, **embed_kwargs) -> dict:
+
+        """
+
+        Embeds every URL concurrently, with at most max_in_flight tasks running at once.
+
+        Returns {'results': {url: segments}, 'failed': {url: error message}, 'pending': [urls not finished by the deadline]}.
+        Pending Marengo tasks keep running on the TwelveLabs side, the batch just stops waiting for them.
+
+        """
+
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        async def embed(video_url: str):
+            async with semaphore:
+                return await self.embed_video(video_url, **embed_kwargs)
+
+        tasks = {asyncio.create_task(embed(video_url)): video_url for video_url in dict.fromkeys(video_urls)}
+        batch = {'results': {}, 'failed': {}, 'pending': []}
+
+        if not tasks:
+            return batch
+
+        done, pending = await asyncio.wait(tasks, timeout=deadline_seconds)
+
+        for task in pending:
+            task.cancel()
+            batch['pending'].append(tasks[task])
+
+        for task in done:
+            if task.exception() is not None:
+                batch['failed'][tasks[task]] = str(task.exception())
+            else:
+                batch['results'][tasks[task]] = task.result()
+
+        return batch
+
+__all__ = ['MarengoBatchEmbedder']
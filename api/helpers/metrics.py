@@ -0,0 +1,182 @@
+import bisect
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _format_labels(label_names: tuple, label_values: tuple, extra: dict | None = None) -> str:
+
+    pairs = list(zip(label_names, label_values)) + list((extra or {}).items())
+
+    if not pairs:
+        return ''
+
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value: float) -> str:
+
+    value = float(value)
+
+    if value == float('inf'):
+        return '+Inf'
+
+    return str(int(value)) if value.is_integer() else repr(value)
+
+class _Metric:
+
+    metric_type = None
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = (), callback=None):
+
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+
+        # Optional callback read at render time, for values already tracked elsewhere (e.g. cache counters).
+        # It returns {label values tuple: value}, or a bare number for an unlabelled metric.
+        self.callback = callback
+
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def render(self) -> list:
+
+        if self.callback is not None:
+
+            values = self.callback()
+
+            if not isinstance(values, dict):
+                values = {(): values}
+
+            with self._lock:
+                self._values = {tuple(str(v) for v in key): value for key, value in values.items()}
+
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+
+        with self._lock:
+            items = list(self._values.items())
+
+        for label_values, value in sorted(items):
+            lines.extend(self._render_sample(label_values, value))
+
+        return lines
+
+    def _render_sample(self, label_values: tuple, value) -> list:
+        return [f'{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}']
+
+class Counter(_Metric):
+
+    metric_type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+
+        key = self._key(labels)
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+
+    metric_type = 'gauge'
+
+    def set(self, value: float, **labels):
+
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+
+            series = self._values.get(key)
+
+            if series is None:
+                series = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+
+            if index < len(self.buckets):
+                series['counts'][index] += 1
+
+            series['sum'] += value
+            series['count'] += 1
+
+    def _render_sample(self, label_values: tuple, series: dict) -> list:
+
+        lines = []
+        cumulative = 0
+
+        for bound, count in zip(self.buckets, series['counts']):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{_format_labels(self.label_names, label_values, {"le": _format_value(bound)})} {cumulative}')
+
+        lines.append(f'{self.name}_bucket{_format_labels(self.label_names, label_values, {"le": "+Inf"})} {series["count"]}')
+        lines.append(f'{self.name}_sum{_format_labels(self.label_names, label_values)} {_format_value(series["sum"])}')
+        lines.append(f'{self.name}_count{_format_labels(self.label_names, label_values)} {series["count"]}')
+
+        return lines
+
+class MetricsRegistry:
+
+    """
+
+    Minimal in-process metrics registry rendered in the Prometheus text exposition format.
+
+    Metrics are per process. With several uvicorn workers, scrape each worker or aggregate in Prometheus.
+
+    """
+
+    def __init__(self):
+
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, label_names: tuple = (), callback=None) -> Counter:
+        return self._register(Counter(name, documentation, label_names, callback))
+
+    def gauge(self, name: str, documentation: str, label_names: tuple = (), callback=None) -> Gauge:
+        return self._register(Gauge(name, documentation, label_names, callback))
+
+    def histogram(self, name: str, documentation: str, label_names: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets=buckets))
+
+    def render(self) -> str:
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+
+http_request_duration = metrics.histogram('http_request_duration_seconds', 'HTTP request latency by route template, method and status code.', ('route', 'method', 'status'))
+provider_generation_duration = metrics.histogram('provider_generation_duration_seconds', 'Latency of uncached provider generations by provider and artifact.', ('provider', 'artifact', 'outcome'))
+dynamodb_call_duration = metrics.histogram('dynamodb_call_duration_seconds', 'Latency of DBHandler calls, including time queued for a worker thread.', ('method', 'outcome'))
+schema_validation_failures = metrics.counter('schema_validation_failures_total', 'Provider responses that failed validation against the requested data schema.', ('provider', 'schema'))
+
+__all__ = ['MetricsRegistry', 'Counter', 'Gauge', 'Histogram', 'metrics', 'http_request_duration', 'provider_generation_duration', 'dynamodb_call_duration', 'schema_validation_failures']
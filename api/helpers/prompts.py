@@ -135,8 +135,8 @@ Response must be in JSON format. Do not include any preamble or postamble.
 """
 
 study_recommendations_prompt = """
-Here is a lecture video transcript and chapter deconstructed:
-1. Transcript: {transcript}
+Here is a lecture video transcript and chapter deconstructed, limited to the chapters the student got questions wrong in:
+1. Transcript excerpts: {transcript}
 2. Chapters: {chapters}
 
 Generate study recommendations based on the following questions and the ones student got wrong:
@@ -161,8 +161,8 @@ Response must be in JSON format. Do not include any preamble or postamble.
 """
 
 concept_mastery_prompt = """
-Here is a lecture video transcript and chapter deconstructed:
-1. Transcript: {transcript}
+Here is a lecture video transcript and chapter deconstructed, limited to the chapters the student got questions wrong in:
+1. Transcript excerpts: {transcript}
 2. Chapters: {chapters}
 
 Generate study recommendations based on the following questions and the ones student got wrong:
@@ -194,13 +194,14 @@ Response must be in JSON format. Do not include any preamble or postamble.
 """
 
 course_analysis_prompt = """
-Here is a lecture video metadata and student data:
-1. Video Metadata: {video_metadata}
-2. Student Data: {student_data}
+Here is an aggregated summary of a lecture video and its class's results:
+{course_summary}
 
-Generate a course analysis based on the video metadata and student data.
+The summary contains the lecture's chapters with the share of students who missed at least one question in each, the most missed questions, the distribution of quiz scores and concept mastery levels across students, and the engagement events and student reactions.
 
-Content engagement should be based off engagement events, student data, and the transcript.
+Generate a course analysis based on the summary. Base percentage_of_students_struggling on the chapter statistics.
+
+Content engagement should be based off the engagement summary, the reactions per chapter and the chapter statistics.
 
 Ensure it follows the following data schema:
 
@@ -239,6 +240,21 @@ Ensure it follows the following data schema which is a JSON object:
 Response must be in JSON format. Do not include any preamble or postamble.
 """
 
+youtube_query_prompt = """
+Generate a youtube search query for this video. Focus on the content and subtopics of the video, not the title. The query should be short and concise words to find the most relevant videos.
+"""
+
+combined_artifacts_prompt = """
+Generate several analyses of this video in one response. Each section below, headed by its name, describes one analysis and its data schema.
+
+Return a single JSON object with one key per section, named exactly like the section heading, whose value follows that section's data schema.
+Give every section the same care as if it had been requested on its own.
+
+{sections}
+
+Response must be in JSON format. Do not include any preamble or postamble.
+"""
+
 __all__ = [
     "summary_prompt",
     "key_takeaways_prompt",
@@ -247,4 +263,7 @@ __all__ = [
     "quiz_questions_prompt",
     "engagement_prompt",
     "multimodal_transcript_prompt",
+    "gist_prompt",
+    "youtube_query_prompt",
+    "combined_artifacts_prompt",
 ]
\ No newline at end of file
@@ -0,0 +1,276 @@
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+from .single_flight import single_flight
+
+load_dotenv()
+
+def _as_int(value, default: int = -1) -> int:
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+class QuizAnalytics:
+
+    """
+
+    Class-wide quiz statistics for one course, computed with NumPy over a students x questions matrix of misses.
+
+    Only wrong answers are stored, so a student who attempted the quiz (has a progress report or any wrong answer) is
+    counted as answering every other question correctly.
+
+    The matrix grows in place as students and wrong answers are recorded, and the statistics are recomputed lazily, in
+    one vectorized pass, the next time they are read.
+
+    """
+
+    def __init__(self, quiz_questions: list, chapters: list, initial_capacity: int = 64):
+
+        self.questions = [question.get('question') for question in quiz_questions]
+        self.question_index = {question: column for column, question in enumerate(self.questions)}
+        self.question_chapters = np.array([_as_int(question.get('chapter_id')) for question in quiz_questions], dtype=np.int64)
+
+        self.chapters = [{'chapter_id': _as_int(chapter.get('chapter_id')), 'title': chapter.get('title')} for chapter in chapters]
+        known_chapters = {chapter['chapter_id'] for chapter in self.chapters}
+        self.chapters += [{'chapter_id': int(chapter_id), 'title': None} for chapter_id in np.unique(self.question_chapters) if chapter_id not in known_chapters]
+
+        self.students = {}
+
+        self._missed = np.zeros((initial_capacity, len(self.questions)), dtype=bool)
+        self._attempted = np.zeros(initial_capacity, dtype=bool)
+
+        self._statistics = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_course(cls, video_id: str, video_metadata: dict, student_data: list):
+
+        """ Builds the matrix from the course item and the student items returned by fetch_student_data_from_course. """
+
+        analytics = cls(video_metadata.get('quiz_questions') or [], video_metadata.get('chapters') or [], initial_capacity=max(64, len(student_data)))
+
+        for student in student_data:
+
+            wrong_answers = student.get(f'{video_id}_wrong_answers') or []
+
+            if wrong_answers or student.get(f'{video_id}_progress_report'):
+                analytics.record_attempt(student['student_name'])
+                analytics.record_wrong_answers(student['student_name'], wrong_answers)
+
+        return analytics
+
+    def _row(self, student_name: str) -> int:
+
+        row = self.students.get(student_name)
+
+        if row is None:
+
+            row = self.students[student_name] = len(self.students)
+
+            if row == len(self._attempted):
+                # Double the capacity so appending students is amortized O(questions).
+                self._missed = np.concatenate([self._missed, np.zeros_like(self._missed)])
+                self._attempted = np.concatenate([self._attempted, np.zeros_like(self._attempted)])
+
+        return row
+
+    def record_attempt(self, student_name: str):
+
+        with self._lock:
+            # _row() may grow the arrays, so it has to run before self._attempted is looked up.
+            row = self._row(student_name)
+            self._attempted[row] = True
+            self._statistics = None
+
+    def record_wrong_answers(self, student_name: str, wrong_answers: list) -> int:
+
+        """ Marks questions as missed by a student and returns how many of them are quiz questions of this course. """
+
+        columns = [self.question_index[wrong_answer.get('question')] for wrong_answer in wrong_answers if wrong_answer.get('question') in self.question_index]
+
+        with self._lock:
+
+            row = self._row(student_name)
+
+            self._attempted[row] = True
+            self._missed[row, columns] = True
+            self._statistics = None
+
+        return len(columns)
+
+    def statistics(self) -> dict:
+
+        with self._lock:
+
+            if self._statistics is None:
+                self._statistics = self._compute()
+
+            return self._statistics
+
+    def _compute(self) -> dict:
+
+        count = len(self.students)
+        correct = ~self._missed[:count][self._attempted[:count]]
+        n_students, n_questions = correct.shape
+
+        summary = {'students': count, 'students_with_attempts': n_students, 'questions': [], 'chapters': [], 'score_histogram': {}}
+
+        if n_students == 0 or n_questions == 0:
+            return summary
+
+        correct = correct.astype(np.float32)
+        totals = correct.sum(axis=1)
+        scores = totals / n_questions
+
+        # Difficulty is the classical p-value, the share of students answering correctly.
+        difficulty = correct.mean(axis=0)
+
+        # Upper-lower discrimination index over the top and bottom 27% of students by total score.
+        group_size = max(1, int(round(0.27 * n_students)))
+        order = np.argsort(totals, kind='stable')
+        discrimination = correct[order[-group_size:]].mean(axis=0) - correct[order[:group_size]].mean(axis=0)
+
+        # Point-biserial correlation of each question with the score on the remaining questions.
+        rest = totals[:, np.newaxis] - correct
+        centered_correct = correct - difficulty
+        centered_rest = rest - rest.mean(axis=0)
+        denominator = np.sqrt((centered_correct ** 2).sum(axis=0) * (centered_rest ** 2).sum(axis=0))
+        point_biserial = np.divide((centered_correct * centered_rest).sum(axis=0), denominator, out=np.zeros(n_questions, dtype=np.float32), where=denominator > 0)
+
+        chapter_ids = np.array([chapter['chapter_id'] for chapter in self.chapters], dtype=np.int64)
+        membership = (self.question_chapters[:, np.newaxis] == chapter_ids[np.newaxis, :]).astype(np.float32)
+        questions_per_chapter = membership.sum(axis=0)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            student_chapter_accuracy = (correct @ membership) / questions_per_chapter
+
+        chapter_accuracy = student_chapter_accuracy.mean(axis=0)
+        students_struggling = (student_chapter_accuracy < 1).sum(axis=0)
+
+        for column, question in enumerate(self.questions):
+            summary['questions'].append({
+                'question': question,
+                'chapter_id': int(self.question_chapters[column]),
+                'difficulty': round(float(difficulty[column]), 4),
+                'miss_rate': round(float(1 - difficulty[column]), 4),
+                'discrimination_index': round(float(discrimination[column]), 4),
+                'point_biserial': round(float(point_biserial[column]), 4)
+            })
+
+        for position, chapter in enumerate(self.chapters):
+            has_questions = questions_per_chapter[position] > 0
+            summary['chapters'].append({
+                **chapter,
+                'questions': int(questions_per_chapter[position]),
+                'accuracy': round(float(chapter_accuracy[position]), 4) if has_questions else None,
+                'students_struggling': int(students_struggling[position]) if has_questions else 0,
+                'percentage_of_students_struggling': round(100 * float(students_struggling[position]) / n_students, 1) if has_questions else 0.0
+            })
+
+        # One bin per possible number of correct answers.
+        counts, _ = np.histogram(totals, bins=np.arange(n_questions + 2))
+
+        summary['score_histogram'] = {'correct_answers': list(range(n_questions + 1)), 'students': counts.tolist()}
+        summary['mean_score'] = round(float(scores.mean()), 4)
+        summary['median_score'] = round(float(np.median(scores)), 4)
+
+        return summary
+
+class QuizAnalyticsRegistry:
+
+    """
+
+    Keeps QuizAnalytics of recently viewed courses in memory and applies new answers to them as they are saved.
+
+    A course is loaded from DynamoDB on first use and reloaded after ttl_seconds, which picks up answers saved through other
+    worker processes. Answers recorded while a course is loading are replayed on the loaded copy, so none are lost.
+
+    """
+
+    def __init__(self, ttl_seconds: int = 300, max_courses: int = 256):
+
+        self.ttl_seconds = ttl_seconds
+        self.max_courses = max_courses
+
+        self._courses = OrderedDict()
+        self._loading = {}
+
+    @classmethod
+    def from_env(cls):
+
+        return cls(
+            ttl_seconds=int(os.getenv('QUIZ_ANALYTICS_TTL_SECONDS', '300')),
+            max_courses=int(os.getenv('QUIZ_ANALYTICS_MAX_COURSES', '256'))
+        )
+
+    async def _load(self, video_id: str, db_handler) -> QuizAnalytics:
+
+        self._loading[video_id] = []
+
+        try:
+
+            student_data, video_metadata = await asyncio.gather(
+                db_handler.fetch_student_data_from_course(video_id),
+                db_handler.fetch_course_metadata(video_id)
+            )
+
+            if not video_metadata:
+                raise ValueError(f"No video metadata found for video ID {video_id}")
+
+            analytics = await asyncio.to_thread(QuizAnalytics.from_course, video_id, video_metadata, student_data)
+
+            for update in self._loading[video_id]:
+                update(analytics)
+
+        finally:
+
+            del self._loading[video_id]
+
+        self._courses[video_id] = (time.monotonic(), analytics)
+        self._courses.move_to_end(video_id)
+
+        while len(self._courses) > self.max_courses:
+            self._courses.popitem(last=False)
+
+        return analytics
+
+    async def get(self, video_id: str, db_handler) -> QuizAnalytics:
+
+        entry = self._courses.get(video_id)
+
+        if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+            self._courses.move_to_end(video_id)
+            return entry[1]
+
+        return await single_flight.do(single_flight.make_key('quiz_analytics', None, video_id), lambda: self._load(video_id, db_handler))
+
+    def _apply(self, video_id: str, update):
+
+        if video_id in self._loading:
+            self._loading[video_id].append(update)
+
+        entry = self._courses.get(video_id)
+
+        if entry is not None:
+            update(entry[1])
+
+    def record_wrong_answers(self, video_id: str, student_name: str, wrong_answers: list):
+        self._apply(video_id, lambda analytics: analytics.record_wrong_answers(student_name, wrong_answers))
+
+    def record_attempt(self, video_id: str, student_name: str):
+        self._apply(video_id, lambda analytics: analytics.record_attempt(student_name))
+
+    def invalidate(self, video_id: str):
+        self._courses.pop(video_id, None)
+
+quiz_analytics = QuizAnalyticsRegistry.from_env()
+
+__all__ = ['QuizAnalytics', 'QuizAnalyticsRegistry', 'quiz_analytics']
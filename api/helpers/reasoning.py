@@ -1,28 +1,36 @@
+import json
 import pydantic
-import boto3
-import instructor
 import asyncio
+import threading
+import logging
 
 import numpy as np
-from pytube import YouTube, Search
+from pytube import Search
 
-from twelvelabs import TwelveLabs
 import os
 from dotenv import load_dotenv
 
-from .db_handler import DBHandler
+from .clients import clients
+from .vector_search import VectorSearchEngine
+from .embedding_index import embedding_index, score_segment_matches
+from .embedding_pipeline import MarengoBatchEmbedder
+from .candidate_pipeline import YouTubeCandidatePipeline
+from .context_builder import chapter_context_builder
+from .course_summary import course_summarizer
 
 load_dotenv(override=True)
 
-from .prompts import study_recommendations_prompt, concept_mastery_prompt, course_analysis_prompt
+from .prompts import study_recommendations_prompt, concept_mastery_prompt, course_analysis_prompt, youtube_query_prompt
 from .data_schema import StudyRecommendationsSchema, ConceptMasterySchema, CourseAnalysisSchema
 
+logger = logging.getLogger(__name__)
+
 class LectureBuilderAgent:
 
     def __init__(self):
 
-        self.bedrock_client = boto3.client('bedrock-runtime')
-        self.instructor_client = instructor.from_bedrock(self.bedrock_client)
+        self.bedrock_client = clients.bedrock_runtime()
+        self.instructor_client = clients.instructor()
         self.bedrock_model_id = 'us.anthropic.claude-3-7-sonnet-20250219-v1:0'
 
         self.reformat_count = 0
@@ -63,26 +71,18 @@ class EvaluationAgent:
 
     def __init__(self, video_metadata: dict):
 
-        self.bedrock_client = boto3.client('bedrock-runtime')
-        self.instructor_client = instructor.from_bedrock(self.bedrock_client)
+        self.bedrock_client = clients.bedrock_runtime()
+        self.instructor_client = clients.instructor()
         self.bedrock_model_id = 'us.anthropic.claude-3-7-sonnet-20250219-v1:0'
 
         self.video_metadata = video_metadata
+        self.context_builder = chapter_context_builder
 
     def generate_quiz_study_recommendations(self, wrong_answers: list):
 
         try:
 
-            chapters = self.video_metadata['chapters']
-            transcript = self.video_metadata['transcript']
-            quiz_questions = self.video_metadata['quiz_questions']
-
-            prompt = study_recommendations_prompt.format(
-                transcript=transcript,
-                chapters=chapters,
-                quiz_questions=quiz_questions,
-                wrong_answers=wrong_answers
-            )
+            prompt = study_recommendations_prompt.format(**self.context_builder.build(self.video_metadata, wrong_answers))
 
             response = self.instructor_client.chat.completions.create(
                 model=self.bedrock_model_id,
@@ -106,16 +106,7 @@ class EvaluationAgent:
         
         try:
             
-            chapters = self.video_metadata['chapters']
-            transcript = self.video_metadata['transcript']
-            quiz_questions = self.video_metadata['quiz_questions']
-
-            prompt = concept_mastery_prompt.format(
-                transcript=transcript,
-                chapters=chapters,
-                quiz_questions=quiz_questions,
-                wrong_answers=wrong_answers
-            )
+            prompt = concept_mastery_prompt.format(**self.context_builder.build(self.video_metadata, wrong_answers))
 
             response = self.instructor_client.chat.completions.create(
                 model=self.bedrock_model_id,
@@ -130,6 +121,33 @@ class EvaluationAgent:
             raise Exception(f"Error generating concept mastery: {str(e)}")
 
 
+    def _quiz_statistics(self, wrong_answers: list) -> dict:
+
+        """ The parts of the quiz report that need no LLM call. """
+
+        total_questions = len(self.video_metadata['quiz_questions'])
+
+        question_by_chapters = {}
+
+        for question in self.video_metadata['quiz_questions']:
+            if question['chapter_id'] not in question_by_chapters:
+                question_by_chapters[question['chapter_id']] = []
+            question_by_chapters[question['chapter_id']].append(question) 
+
+        accuracy = len(wrong_answers) / total_questions
+
+        return {
+            'accuracy': accuracy,
+            'total_questions': total_questions,
+            'question_by_chapters': question_by_chapters,
+            'wrong_answers': wrong_answers,
+            'chapters': self.video_metadata['chapters']
+        }
+
+    @staticmethod
+    def _dump(section):
+        return section.model_dump() if hasattr(section, 'model_dump') else section
+
     def calculate_quiz_performance(self, wrong_answers: list):
 
         """
@@ -139,45 +157,100 @@ class EvaluationAgent:
         """
 
         try:
-        
-            total_questions = len(self.video_metadata['quiz_questions'])
 
-            question_by_chapters = {}
+            student_report = self._quiz_statistics(wrong_answers)
+
+            student_report['study_recommendations'] = self._dump(self.generate_quiz_study_recommendations(wrong_answers))
+            student_report['concept_mastery'] = self._dump(self.generate_concept_mastery(wrong_answers))
 
-            for question in self.video_metadata['quiz_questions']:
-                if question['chapter_id'] not in question_by_chapters:
-                    question_by_chapters[question['chapter_id']] = []
-                question_by_chapters[question['chapter_id']].append(question) 
+            return student_report
 
-            accuracy = len(wrong_answers) / total_questions
+        except Exception as e:
 
-            study_recommendations = self.generate_quiz_study_recommendations(wrong_answers)
-            concept_mastery = self.generate_concept_mastery(wrong_answers)
+            raise Exception(f"Error calculating quiz performance: {str(e)}")
 
-            student_report = {
-                'accuracy': accuracy,
-                'total_questions': total_questions,
-                'question_by_chapters': question_by_chapters,
-                'wrong_answers': wrong_answers,
-                'study_recommendations': study_recommendations.model_dump() if hasattr(study_recommendations, 'model_dump') else study_recommendations,
-                'chapters': self.video_metadata['chapters'],
-                'concept_mastery': concept_mastery.model_dump() if hasattr(concept_mastery, 'model_dump') else concept_mastery
-            }
+    def _quiz_section_tasks(self, wrong_answers: list) -> dict:
+
+        # The Bedrock instructor client is synchronous (its async mode still calls converse inline), so each generation runs on a worker thread.
+        return {
+            'study_recommendations': asyncio.create_task(asyncio.to_thread(self.generate_quiz_study_recommendations, wrong_answers)),
+            'concept_mastery': asyncio.create_task(asyncio.to_thread(self.generate_concept_mastery, wrong_answers))
+        }
+
+    async def calculate_quiz_performance_async(self, wrong_answers: list):
+
+        """ Same report as calculate_quiz_performance, with both LLM sections generated concurrently and without blocking the event loop. """
+
+        try:
+
+            student_report = self._quiz_statistics(wrong_answers)
+            tasks = self._quiz_section_tasks(wrong_answers)
+
+            try:
+                sections = await asyncio.gather(*tasks.values())
+            finally:
+                for task in tasks.values():
+                    task.cancel()
+
+            for name, section in zip(tasks, sections):
+                student_report[name] = self._dump(section)
 
             return student_report
 
         except Exception as e:
 
             raise Exception(f"Error calculating quiz performance: {str(e)}")
+
+    async def stream_quiz_performance(self, wrong_answers: list):
+
+        """
+
+        Yields (section, data) pairs as each part of the quiz report is ready: 'statistics' first, then 'study_recommendations' and
+        'concept_mastery' in whichever order they finish, and finally 'report' with the complete report.
+
+        """
+
+        student_report = self._quiz_statistics(wrong_answers)
+        yield 'statistics', student_report.copy()
+
+        tasks = self._quiz_section_tasks(wrong_answers)
+        pending = set(tasks.values())
+
+        try:
+
+            while pending:
+
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for name, task in tasks.items():
+                    if task in done:
+                        student_report[name] = self._dump(task.result())
+                        yield name, student_report[name]
+
+        except Exception as e:
+
+            raise Exception(f"Error calculating quiz performance: {str(e)}")
+
+        finally:
+
+            for task in tasks.values():
+                task.cancel()
+
+        yield 'report', student_report
         
-    def generate_course_analysis(self, student_data: dict):
+    def generate_course_analysis(self, student_data: list, reactions: list | None = None):
 
-        """ Given all student data on a specific course, will generate a detailed analysis of the course according to the student's performance. """
-            
-        prompt = course_analysis_prompt.format(
-            video_metadata=self.video_metadata,
-            student_data=student_data
-        )
+        """
+
+        Given all student data on a specific course, will generate a detailed analysis of the course according to the student's performance.
+
+        The model only sees the aggregated course summary, so the prompt stays the same size however many students took the course.
+
+        """
+
+        course_summary = course_summarizer.summarize(self.video_metadata.get('video_id'), self.video_metadata, student_data, reactions)
+
+        prompt = course_analysis_prompt.format(course_summary=json.dumps(course_summary, default=str))
         
         response = self.instructor_client.chat.completions.create(
             model=self.bedrock_model_id,
@@ -189,8 +262,24 @@ class EvaluationAgent:
         
 class VideoSearchAgent:
 
-    def __init__(self):
-        self.twelvelabs_client = TwelveLabs(api_key=os.getenv('TWELVE_LABS_API_KEY'))
+    # Shared across requests so the query, search and embedding caches outlive a single agent.
+    _youtube_pipeline = None
+    _youtube_pipeline_lock = threading.Lock()
+
+    def __init__(self, search_function=None):
+
+        """ search_function(query) -> [url] replaces the pytube search, e.g. with helpers.StaticSearch in tests. """
+
+        self.twelvelabs_client = clients.twelve_labs
+        self.batch_embedder = MarengoBatchEmbedder.from_env()
+
+        if search_function is not None:
+            self.youtube_pipeline = YouTubeCandidatePipeline.from_env(self.query_generation, search_function, self.batch_embedder)
+        else:
+            with VideoSearchAgent._youtube_pipeline_lock:
+                if VideoSearchAgent._youtube_pipeline is None:
+                    VideoSearchAgent._youtube_pipeline = YouTubeCandidatePipeline.from_env(self.query_generation, self.youtube_api_search, self.batch_embedder)
+            self.youtube_pipeline = VideoSearchAgent._youtube_pipeline
 
     def _euclidean_distance(self, embedding1: list, embedding2: list):
 
@@ -204,21 +293,18 @@ class VideoSearchAgent:
         
         return np.linalg.norm(np.array(embedding1) - np.array(embedding2))
     
-    def knn_search(self, comparison_embedding: list, embeddings: dict, k: int):
+    def knn_search(self, comparison_embedding: list, embeddings: dict, k: int, metric: str = 'euclidean'):
 
-        """ Calls the euclidian distance function and combares all embeddings to the comparison_embedding then returns sorted dictionary of top K results. """
+        """ Ranks all embeddings against the comparison_embedding in one batched matrix operation and returns the top K (video_url, distance) pairs, closest first. """
 
-        distances = {}
-        for video_url, video_embedding in embeddings.items():
-            distances[video_url] = self._euclidean_distance(comparison_embedding, video_embedding)
-        return sorted(distances.items(), key=lambda x: x[1])[:k]
+        return VectorSearchEngine.from_embeddings(embeddings, metric=metric).search(comparison_embedding, k)
 
     def query_generation(self, video_id: str):
 
         """ Uses TwelveLabs Pegasus model to generate a comprehensive YouTube query based on the video provided. """
 
         try:
-            youtube_search_query = self.twelvelabs_client.analyze(video_id=video_id, prompt='Generate a youtube search query for this video. Focus on the content and subtopics of the video, not the title. The query should be short and concise words to find the most relevant videos.')
+            youtube_search_query = self.twelvelabs_client.analyze(video_id=video_id, prompt=youtube_query_prompt)
             return youtube_search_query.data
         except Exception as e:
             raise Exception(f"Error generating youtube search query: {str(e)}")
@@ -236,54 +322,104 @@ class VideoSearchAgent:
         return search_urls
 
         
-    def generate_new_video_embeddings(self, video_url: str):
-
-        """ Uses TwelveLabs Marengo Model to generate video embedding for the first 20 seconds of the video. """
+    def generate_video_segment_embeddings(self, video_url: str, start_offset_sec: float = 0, end_offset_sec: float = 20):
 
-        embedding = np.array([])
+        """ Uses TwelveLabs Marengo Model to generate per segment video embeddings (with their time ranges) for the first 20 seconds of the video. """
 
         task = self.twelvelabs_client.embed.task.create(
             model_name="Marengo-retrieval-2.7",
             video_url=video_url,
-            video_start_offset_sec=0,
-            video_end_offset_sec=20
+            video_start_offset_sec=start_offset_sec,
+            video_end_offset_sec=end_offset_sec
         )
 
         status = task.wait_for_done(sleep_interval=2)
 
         video_embedding = task.retrieve(embedding_option=['visual-text'])
 
-        for segment in video_embedding.video_embedding.segments:
-            embedding = np.concatenate([embedding, segment.embeddings_float])
+        return [
+            {
+                'start_offset_sec': segment.start_offset_sec,
+                'end_offset_sec': segment.end_offset_sec,
+                'embedding': np.asarray(segment.embeddings_float, dtype=np.float32)
+            }
+            for segment in video_embedding.video_embedding.segments
+        ]
 
-        return embedding
-        
+    def generate_new_video_embeddings(self, video_url: str):
 
-    def fetch_related_videos(self, video_id: str):
+        """ Uses TwelveLabs Marengo Model to generate video embedding for the first 20 seconds of the video. """
+
+        segments = self.generate_video_segment_embeddings(video_url)
 
-        """ Fetches original video from S3 Bucket then generates embedding of videos queried on YouTube to then compare with euclidian distance based K-Nearest Neighbor. """
+        if not segments:
+            return np.array([])
 
-        # Fetch original video from S3 Bucket.
-        presigned_urls = DBHandler().fetch_s3_presigned_urls()
+        return np.concatenate([segment['embedding'] for segment in segments])
         
-        # Fetch embedding stored in Marengo Model
+
+    def embed_videos(self, video_urls: list, deadline_seconds: float | None = None):
+
+        """ Embeds many videos concurrently with Marengo and returns whatever finished before the deadline (see MarengoBatchEmbedder.embed_videos). """
+
+        if deadline_seconds is None:
+            deadline_seconds = float(os.getenv('EMBEDDING_BATCH_DEADLINE_SECONDS', '120'))
+
+        return asyncio.run(self.batch_embedder.embed_videos(video_urls, deadline_seconds=deadline_seconds))
+
+    def _query_segments(self, video_id: str) -> list:
+
+        """ Fetches the video's clip level segment embeddings stored in the Marengo index. """
+
         video_object = self.twelvelabs_client.index.video.retrieve(index_id=os.getenv('TWELVE_LABS_INDEX_ID'), id=video_id, embedding_option=['visual-text'])
-        video_duration = video_object.system_metadata.duration
-        video_embedding_segments = video_object.embedding.video_embedding.segments
-        
-        combined_embedding = np.array([])
-        for segment in video_embedding_segments:
-            combined_embedding = np.concatenate([combined_embedding, segment.embeddings_float]) 
-        
-        # Generate embeddings of other YouTube videos.
-        other_video_embeddings = {}
-        for video_url in presigned_urls:
-            video_embedding = self.generate_new_video_embeddings(video_url)
-            other_video_embeddings[video_url] = video_embedding
-
-        # Conduct K-Nearest Neighbor Search with Euclidian Distance
-        knn_results = self.knn_search(combined_embedding, other_video_embeddings, 5)
-        
-        return knn_results
+
+        return [
+            {
+                'start_offset_sec': segment.start_offset_sec,
+                'end_offset_sec': segment.end_offset_sec,
+                'embedding': np.asarray(segment.embeddings_float, dtype=np.float32)
+            }
+            for segment in video_object.embedding.video_embedding.segments
+            if segment.embedding_scope != 'video'
+        ]
+
+    async def _youtube_candidates(self, video_id: str) -> dict:
+
+        # External candidates are best effort, a YouTube or Marengo failure should not fail the lecture results.
+        try:
+            return await self.youtube_pipeline.fetch_candidates(video_id)
+        except Exception as e:
+            logger.error(f"Error fetching YouTube candidates: {str(e)}")
+            return {}
+
+    async def fetch_related_videos(self, video_id: str, k: int = 5, include_youtube: bool = True):
+
+        """
+
+        Ranks S3 lectures and YouTube candidates by how well their segments match the original video's segments.
+
+        The S3 index sync, the query video's embedding lookup and the YouTube pipeline (query generation, search, candidate
+        embedding) run concurrently. Returns [video_url, distance, matches, source] for the k closest videos, where distance is
+        1 - the aggregated cosine similarity, matches lists the time ranges that matched and source is 's3' or 'youtube'.
+
+        """
+
+        # Embed only lectures that are new or changed since the last sync, everything else is read from the index.
+        sync = asyncio.to_thread(embedding_index.sync_if_stale, self.embed_videos)
+        youtube = self._youtube_candidates(video_id) if include_youtube else asyncio.sleep(0, result={})
+
+        _, query_segments, candidates = await asyncio.gather(sync, asyncio.to_thread(self._query_segments, video_id), youtube)
+
+        # Segment level nearest neighbour search, aggregated per lecture.
+        related_videos = [
+            (embedding_index.presigned_url(video['s3_key']), 1 - video['score'], video['matches'], 's3')
+            for video in await asyncio.to_thread(embedding_index.search_segments, query_segments, k)
+        ]
+
+        for video_url, segments in candidates.items():
+            match = score_segment_matches(query_segments, segments)
+            related_videos.append((video_url, 1 - match['score'], match['matches'], 'youtube'))
+
+        return sorted(related_videos, key=lambda video: video[1])[:k]
 
 __all__ = ['LectureBuilderAgent', 'EvaluationAgent', 'VideoSearchAgent']
\ No newline at end of file
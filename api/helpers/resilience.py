@@ -0,0 +1,296 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+
+from dotenv import load_dotenv
+
+from .metrics import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# AWS error codes worth retrying. Everything else in the 4xx range (validation, access denied, ...) fails immediately.
+RETRYABLE_ERROR_CODES = {
+    'ThrottlingException', 'TooManyRequestsException', 'ServiceUnavailableException', 'InternalServerException',
+    'ModelNotReadyException', 'ModelTimeoutException', 'RequestTimeout', 'RequestTimeoutException'
+}
+
+# Exceptions raised by HTTP clients and SDKs when a connection fails or times out, matched by name so no SDK has to be imported here.
+RETRYABLE_EXCEPTION_NAMES = {
+    'APIConnectionError', 'APITimeoutError', 'ConnectError', 'ConnectTimeout', 'ReadTimeout', 'ReadTimeoutError', 'RemoteProtocolError',
+    'EndpointConnectionError', 'ConnectTimeoutError', 'ConnectionClosedError'
+}
+
+class CircuitOpenError(Exception):
+    pass
+
+def status_code(error: Exception) -> int | None:
+
+    """ Returns the HTTP status of a TwelveLabs, Gemini or botocore error, if it has one. """
+
+    for attribute in ('status_code', 'code'):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+
+    response = getattr(error, 'response', None)
+
+    if isinstance(response, dict):
+        return response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+
+    return getattr(response, 'status_code', None)
+
+def is_retryable(error: Exception) -> bool:
+
+    """ Throttling, 5xx responses, timeouts and connection errors are retried. """
+
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+
+    response = getattr(error, 'response', None)
+
+    if isinstance(response, dict) and response.get('Error', {}).get('Code') in RETRYABLE_ERROR_CODES:
+        return True
+
+    code = status_code(error)
+
+    if code is not None:
+        return code == 429 or code >= 500
+
+    return any(cls.__name__ in RETRYABLE_EXCEPTION_NAMES for cls in type(error).__mro__)
+
+class CircuitBreaker:
+
+    """
+
+    Fails calls fast while a provider is degraded.
+
+    After failure_threshold consecutive retryable failures the breaker opens and rejects calls for recovery_seconds. It then
+    lets a single trial call through (half open): success closes it again, failure reopens it. A trial that ends without
+    saying anything about the provider (a rejected request, a cancelled stream) only releases the slot for the next one.
+
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, failure_threshold: int = 5, recovery_seconds: float = 30):
+
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+
+        with self._lock:
+
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_seconds:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+
+            return False
+
+    def record_success(self):
+
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+
+        with self._lock:
+
+            self.failures += 1
+            self._trial_in_flight = False
+
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+provider_call_attempts = metrics.counter('provider_call_attempts_total', 'Provider API call attempts by outcome (success, retried, failed, timeout, rejected, cancelled).', ('provider', 'outcome'))
+
+class ResilientCaller:
+
+    """
+
+    Runs blocking provider SDK calls on a worker thread with a deadline, retries and a circuit breaker.
+
+    - Every call has an overall deadline_seconds. Each attempt gets whatever is left of it.
+    - Throttling, 5xx, timeouts and connection errors are retried up to max_attempts times with full jitter exponential
+      backoff, as long as the deadline allows.
+    - Other errors (bad requests, validation, auth) are raised immediately and do not count against the breaker.
+
+    A timed out attempt stops being awaited, but its worker thread finishes the SDK call in the background.
+
+    """
+
+    def __init__(self, provider: str, deadline_seconds: float = 180, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 20.0, breaker: CircuitBreaker | None = None):
+
+        self.provider = provider
+        self.deadline_seconds = deadline_seconds
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+
+    @classmethod
+    def from_env(cls, provider: str):
+
+        prefix = provider.upper()
+
+        return cls(
+            provider=provider,
+            deadline_seconds=float(os.getenv(f'{prefix}_DEADLINE_SECONDS', os.getenv('PROVIDER_DEADLINE_SECONDS', '180'))),
+            max_attempts=int(os.getenv('PROVIDER_MAX_ATTEMPTS', '3')),
+            base_delay=float(os.getenv('PROVIDER_RETRY_BASE_DELAY_SECONDS', '1')),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv('CIRCUIT_BREAKER_FAILURE_THRESHOLD', '5')),
+                recovery_seconds=float(os.getenv('CIRCUIT_BREAKER_RECOVERY_SECONDS', '30'))
+            )
+        )
+
+    def record(self, error: Exception | None = None):
+
+        """
+
+        Updates the breaker with the outcome of a call. Only retryable errors mean the provider is degraded, and only a
+        successful call means it recovered. Other errors (bad requests, validation, auth) just release a half open trial.
+
+        """
+
+        if error is None:
+            self.breaker.record_success()
+        elif is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_trial()
+
+    def check(self):
+
+        """ Raises CircuitOpenError if the breaker is rejecting calls. """
+
+        if not self.breaker.allow():
+            provider_call_attempts.inc(provider=self.provider, outcome='rejected')
+            raise CircuitOpenError(f"{self.provider} is unavailable, circuit breaker is open")
+
+    async def call(self, function, *args, **kwargs):
+
+        deadline = time.monotonic() + self.deadline_seconds
+        attempt = 0
+
+        while True:
+
+            self.check()
+            attempt += 1
+
+            try:
+
+                result = await asyncio.wait_for(asyncio.to_thread(function, *args, **kwargs), timeout=max(deadline - time.monotonic(), 0))
+
+            except Exception as e:
+
+                self.record(e)
+
+                if not is_retryable(e):
+                    provider_call_attempts.inc(provider=self.provider, outcome='failed')
+                    raise
+
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                timed_out = isinstance(e, asyncio.TimeoutError) and time.monotonic() >= deadline
+
+                if timed_out or attempt >= self.max_attempts or time.monotonic() + delay >= deadline:
+                    provider_call_attempts.inc(provider=self.provider, outcome='timeout' if timed_out else 'failed')
+                    if timed_out:
+                        raise TimeoutError(f"{self.provider} call did not finish within {self.deadline_seconds} seconds")
+                    raise
+
+                logger.warning(f"Retrying {self.provider} call in {delay:.1f}s after attempt {attempt} failed: {str(e)}")
+                provider_call_attempts.inc(provider=self.provider, outcome='retried')
+
+                await asyncio.sleep(delay)
+                continue
+
+            self.record()
+            provider_call_attempts.inc(provider=self.provider, outcome='success')
+
+            return result
+
+    async def stream(self, chunks):
+
+        """
+
+        Yields from an async iterator of streamed output under the breaker and the deadline.
+
+        Streams are not retried, since part of the output may already have been sent to the client. A stream the consumer
+        stops early (e.g. the client disconnected) is counted as cancelled and only releases a half open trial.
+
+        """
+
+        self.check()
+
+        deadline = time.monotonic() + self.deadline_seconds
+        iterator = aiter(chunks)
+        completed = False
+        error = None
+
+        try:
+
+            while True:
+
+                try:
+                    chunk = await asyncio.wait_for(anext(iterator), timeout=max(deadline - time.monotonic(), 0))
+                except StopAsyncIteration:
+                    completed = True
+                    break
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"{self.provider} stream did not finish within {self.deadline_seconds} seconds")
+
+                yield chunk
+
+        except Exception as e:
+
+            error = e
+            raise
+
+        finally:
+
+            if completed or error is not None:
+                self.record(error)
+                provider_call_attempts.inc(provider=self.provider, outcome='success' if completed else 'timeout' if isinstance(error, TimeoutError) else 'failed')
+            else:
+                # Closed by the consumer (GeneratorExit) or cancelled, which says nothing about the provider.
+                self.breaker.release_trial()
+                provider_call_attempts.inc(provider=self.provider, outcome='cancelled')
+
+            if hasattr(iterator, 'aclose'):
+                await iterator.aclose()
+
+provider_callers = {provider: ResilientCaller.from_env(provider) for provider in ('twelvelabs', 'google', 'aws')}
+
+metrics.gauge('provider_circuit_state', 'Circuit breaker state per provider: 0 closed, 1 half open, 2 open.', ('provider',), callback=lambda: {
+    (provider,): caller.breaker.state for provider, caller in provider_callers.items()
+})
+
+__all__ = ['CircuitBreaker', 'CircuitOpenError', 'ResilientCaller', 'provider_callers', 'is_retryable']
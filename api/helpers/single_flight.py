@@ -0,0 +1,70 @@
+import json
+import asyncio
+
+from .metrics import metrics
+
+class SingleFlight:
+
+    """
+
+    Coalesces identical in-flight calls so concurrent duplicates share one execution.
+
+    The first caller for a key starts the work; every caller that arrives while it is still running awaits the same task.
+    The shared task is shielded, so one caller disconnecting does not cancel the work for the others.
+
+    """
+
+    def __init__(self):
+
+        self._in_flight = {}
+
+        self.calls = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(route: str, provider: str, video_id: str, body=None) -> str:
+
+        """ Builds a key from the route, provider, video ID and a normalized (sorted, JSON encoded) request body. """
+
+        return json.dumps([route, provider, video_id, body], sort_keys=True, default=str)
+
+    async def do(self, key: str, coroutine_factory):
+
+        """ Awaits the in-flight call for this key, or starts coroutine_factory() if there is none. """
+
+        task = self._in_flight.get(key)
+
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        self.calls += 1
+
+        task = asyncio.ensure_future(coroutine_factory())
+        self._in_flight[key] = task
+
+        def release(finished_task):
+            if self._in_flight.get(key) is finished_task:
+                del self._in_flight[key]
+
+        task.add_done_callback(release)
+
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._in_flight)
+        }
+
+single_flight = SingleFlight()
+
+metrics.counter('single_flight_calls_total', 'Generation calls by whether they started new work or joined an in-flight call.', ('result',), callback=lambda: {
+    ('executed',): single_flight.calls,
+    ('coalesced',): single_flight.coalesced
+})
+metrics.gauge('single_flight_in_flight', 'Distinct generation calls currently in flight.', callback=lambda: len(single_flight._in_flight))
+
+__all__ = ['SingleFlight', 'single_flight']
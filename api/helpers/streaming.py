@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+_STREAM_END = object()
+
+async def iterate_in_thread(iterator_factory):
+
+    """
+
+    Runs a blocking iterator (e.g. an SDK streaming response) on a worker thread and yields its items on the event loop.
+
+    Items are handed over through an awaited queue, so consumers wake as soon as each item arrives instead of polling.
+    If the consumer stops early the worker thread stops pulling from the iterator after its current item.
+
+    """
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def put(item, error=None):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            # Event loop already closed, nobody is listening anymore.
+            stop.set()
+
+    def produce():
+        try:
+            for item in iterator_factory():
+                if stop.is_set():
+                    return
+                put(item)
+        except BaseException as e:
+            put(_STREAM_END, e)
+            return
+        put(_STREAM_END)
+
+    loop.run_in_executor(None, produce)
+
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _STREAM_END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+__all__ = ['iterate_in_thread']
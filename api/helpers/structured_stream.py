@@ -0,0 +1,272 @@
+import re
+import typing
+
+import pydantic
+from pydantic_core import from_json
+
+# Characters that can change the scanner state. Everything between them is skipped in one step.
+_STRUCTURAL = re.compile(r'["\\{}\[\],]')
+
+class PartialJSONParser:
+
+    """
+
+    Parses a model's JSON output incrementally as the text streams in, for every provider.
+
+    For schemas made of a single list field (chapters, pacing recommendations, key takeaways, ...) feed() returns every list
+    element as soon as its closing character arrives, validated against the element type. Element boundaries are found by a
+    small scanner that only looks at each new character once, so a whole response costs O(length) however finely it is
+    chunked, and each element is parsed exactly once. finish() validates the whole response against the schema.
+
+    Only feed() and partial() accept incomplete JSON. finish() parses strictly, so a truncated response is rejected instead
+    of being returned, and cached, without its last elements.
+
+    Markdown code fences, any preamble before the first brace and anything after the last brace are ignored.
+
+    """
+
+    def __init__(self, data_schema: type[pydantic.BaseModel]):
+
+        self.data_schema = data_schema
+        self.list_field, item_type = self._list_field(data_schema)
+        self._item_adapter = pydantic.TypeAdapter(item_type) if item_type is not None else None
+
+        self._chunks = []
+        self._text = ''
+        self.emitted = 0
+
+        # Scanner state. Offsets are into the whole text, of which only the part from _window_start on is kept in _window.
+        self._window = ''
+        self._window_start = 0
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = None
+        self._list_depth = None
+        self._list_closed = False
+        self._element_start = None
+        self._after_separator = None
+
+    @staticmethod
+    def _list_field(data_schema) -> tuple:
+
+        """ Returns (field name, element type) if the schema is a single list field, (None, None) otherwise. """
+
+        fields = data_schema.model_fields
+
+        if len(fields) != 1:
+            return None, None
+
+        name, field = next(iter(fields.items()))
+
+        if typing.get_origin(field.annotation) is not list:
+            return None, None
+
+        return name, (typing.get_args(field.annotation) or (typing.Any,))[0]
+
+    @property
+    def text(self) -> str:
+
+        """ The output received so far. Chunks are joined on first access, so feeding many small chunks does not copy the text each time. """
+
+        if self._chunks:
+            self._text += ''.join(self._chunks)
+            self._chunks = []
+
+        return self._text
+
+    @text.setter
+    def text(self, text: str):
+
+        self._chunks = []
+        self._text = text
+
+        self._window = text
+        self._window_start = 0
+
+    def _json_text(self) -> str:
+
+        start = self.text.find('{')
+
+        if start == -1:
+            return ''
+
+        return self.text[start:].replace('```', '')
+
+    def partial(self):
+
+        """ Returns the output parsed so far, with incomplete trailing values dropped, or None if nothing parses yet. """
+
+        json_text = self._json_text()
+
+        if not json_text:
+            return None
+
+        try:
+            return from_json(json_text, allow_partial=True)
+        except ValueError:
+            return None
+
+    def _scan(self) -> list:
+
+        """ Advances the scanner over the new text and returns (start, end) offsets of the list elements it completed. """
+
+        window, base = self._window, self._window_start
+
+        if self._position == 0:
+
+            start = window.find('{')
+
+            if start == -1:
+                return []
+
+            self._position = base + start
+
+        completed = []
+
+        def close_literal(end: int):
+            # Numbers, booleans and null have no closing character. They end at the next separator.
+            if self._after_separator is not None and window[self._after_separator - base:end - base].strip():
+                completed.append((self._after_separator, end))
+
+        for match in _STRUCTURAL.finditer(window, self._position - base):
+
+            character, index = match.group(), base + match.start()
+
+            if self._in_string:
+
+                if index == self._escaped:
+                    pass
+                elif character == '\\':
+                    # The next character is escaped. It may only arrive with the next chunk.
+                    self._escaped = index + 1
+                elif character == '"':
+                    self._in_string = False
+                    if self._depth == self._list_depth and self._element_start is not None:
+                        completed.append((self._element_start, index + 1))
+                        self._element_start = None
+
+                continue
+
+            if self._list_depth is not None and self._depth == self._list_depth and self._element_start is None and character in '"{[':
+                self._element_start = index
+                self._after_separator = None
+
+            if character == '"':
+                self._in_string = True
+
+            elif character in '{[':
+
+                self._depth += 1
+
+                if character == '[' and self._list_depth is None and self._depth == 2:
+                    self._list_depth = 2
+                    self._after_separator = index + 1
+
+            elif character in '}]':
+
+                if self._depth == self._list_depth and character == ']':
+                    close_literal(index)
+                    self._list_closed = True
+                    self._list_depth = -1
+
+                self._depth -= 1
+
+                if self._depth == self._list_depth and self._element_start is not None:
+                    completed.append((self._element_start, index + 1))
+                    self._element_start = None
+
+            elif character == ',' and self._depth == self._list_depth:
+                close_literal(index)
+                self._after_separator = index + 1
+
+        self._position = base + len(window)
+
+        return completed
+
+    def _trim_window(self):
+
+        """ Drops scanned text that no element in progress starts in. """
+
+        if self._position == 0:
+            return
+
+        keep = min(offset for offset in (self._position, self._element_start, self._after_separator) if offset is not None)
+
+        self._window = self._window[keep - self._window_start:]
+        self._window_start = keep
+
+    def _validated(self, element) -> tuple:
+
+        try:
+            return True, self._item_adapter.dump_python(self._item_adapter.validate_python(element), mode='json')
+        except pydantic.ValidationError:
+            # Invalid elements are skipped here and reported by finish().
+            return False, None
+
+    def feed(self, text: str) -> list:
+
+        """ Adds the next chunk of text and returns [(index, element)] for list elements completed by it. """
+
+        self._chunks.append(text)
+
+        if self.list_field is None or self._list_closed:
+            return []
+
+        self._window += text
+        elements = []
+
+        for start, end in self._scan():
+
+            try:
+                valid, element = self._validated(from_json(self._window[start - self._window_start:end - self._window_start]))
+            except ValueError:
+                valid = False
+
+            if valid:
+                elements.append((self.emitted, element))
+
+            self.emitted += 1
+
+        self._trim_window()
+
+        return elements
+
+    def finish(self) -> dict:
+
+        """ Validates the complete output against the schema. Raises pydantic.ValidationError if it is not complete JSON or does not match. """
+
+        json_text = self._json_text()
+
+        return self.data_schema.model_validate_json(json_text[:json_text.rfind('}') + 1]).model_dump()
+
+    def remaining(self, result: dict) -> list:
+
+        """ Returns [(index, element)] for elements of a finished result that feed() has not returned yet, e.g. when it came from the cache. """
+
+        if self.list_field is None:
+            return []
+
+        elements = []
+
+        for element in (result.get(self.list_field) or [])[self.emitted:]:
+
+            valid, element = self._validated(element)
+
+            if valid:
+                elements.append((self.emitted, element))
+
+            self.emitted += 1
+
+        return elements
+
+def parse_structured_output(text: str, data_schema: type[pydantic.BaseModel]) -> dict:
+
+    """ Parses a complete model response with the same rules as the streaming parser. Raises pydantic.ValidationError if it does not match. """
+
+    parser = PartialJSONParser(data_schema)
+    parser.text = text
+
+    return parser.finish()
+
+__all__ = ['PartialJSONParser', 'parse_structured_output']
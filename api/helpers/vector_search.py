@@ -0,0 +1,138 @@
+import numpy as np
+
+METRICS = ('euclidean', 'cosine')
+
+class VectorSearchEngine:
+
+    """
+
+    Exact top-k nearest neighbour search over a float32 matrix of embeddings.
+
+    Candidates are stored row-wise in one contiguous matrix, so a query is a single matrix-vector product plus a partial
+    selection (argpartition) of the k best rows instead of a Python loop and a full sort.
+
+    Embeddings can have different lengths (Marengo returns one vector per segment, concatenated per video). Shorter rows are
+    zero padded and, as before, every comparison only uses the prefix both vectors share.
+
+    """
+
+    def __init__(self, metric: str = 'euclidean', dtype=np.float32):
+
+        if metric not in METRICS:
+            raise ValueError(f"Unsupported metric {metric}, expected one of {METRICS}")
+
+        self.metric = metric
+        self.dtype = dtype
+
+        self.ids = []
+        self._matrix = np.zeros((0, 0), dtype=dtype)
+        self._lengths = np.zeros(0, dtype=np.int64)
+        self._squared_norms = np.zeros(0, dtype=dtype)
+
+    @classmethod
+    def from_embeddings(cls, embeddings: dict, metric: str = 'euclidean') -> 'VectorSearchEngine':
+
+        """ Builds an engine from {id: embedding}. """
+
+        engine = cls(metric=metric)
+        engine.add_many(embeddings.items())
+
+        return engine
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, item_id, embedding):
+        self.add_many([(item_id, embedding)])
+
+    def add_many(self, items):
+
+        """ Appends (id, embedding) pairs. The matrix is rebuilt once per call, not once per item. """
+
+        items = list(items)
+
+        if not items:
+            return
+
+        vectors = [np.asarray(embedding, dtype=self.dtype).ravel() for _, embedding in items]
+        lengths = np.array([len(vector) for vector in vectors], dtype=np.int64)
+
+        width = max(self._matrix.shape[1], int(lengths.max()))
+
+        matrix = np.zeros((len(self.ids) + len(vectors), width), dtype=self.dtype)
+        matrix[:len(self.ids), :self._matrix.shape[1]] = self._matrix
+
+        for row, vector in enumerate(vectors, start=len(self.ids)):
+            matrix[row, :len(vector)] = vector
+
+        self._matrix = matrix
+        self._lengths = np.concatenate([self._lengths, lengths])
+        self._squared_norms = np.einsum('ij,ij->i', matrix, matrix)
+
+        self.ids.extend(item_id for item_id, _ in items)
+
+    def _distances(self, queries: np.ndarray) -> np.ndarray:
+
+        """ Returns a (queries x candidates) distance matrix. Lower is closer for both metrics (cosine returns 1 - similarity). """
+
+        width = min(queries.shape[1], self._matrix.shape[1])
+
+        queries = queries[:, :width]
+        candidates = self._matrix[:, :width]
+
+        if width == self._matrix.shape[1]:
+            candidate_norms = self._squared_norms
+        else:
+            candidate_norms = np.einsum('ij,ij->i', candidates, candidates)
+
+        # Squared norm of each query prefix, indexed by the shared length with each candidate.
+        query_prefix_norms = np.zeros((queries.shape[0], width + 1), dtype=np.float64)
+        np.cumsum(np.square(queries, dtype=np.float64), axis=1, out=query_prefix_norms[:, 1:])
+        query_norms = query_prefix_norms[:, np.minimum(self._lengths, width)]
+
+        dot_products = queries @ candidates.T
+
+        if self.metric == 'euclidean':
+            squared = query_norms + candidate_norms[np.newaxis, :] - 2 * dot_products
+            return np.sqrt(np.maximum(squared, 0))
+
+        denominator = np.sqrt(query_norms) * np.sqrt(candidate_norms)[np.newaxis, :]
+        similarity = np.divide(dot_products, denominator, out=np.zeros_like(denominator), where=denominator > 0)
+
+        return 1 - similarity
+
+    def search_batch(self, queries, k: int) -> list:
+
+        """ Returns the k closest (id, distance) pairs for each query, closest first. """
+
+        if len(self.ids) == 0 or k <= 0:
+            return [[] for _ in queries]
+
+        queries = np.atleast_2d(np.asarray(queries, dtype=self.dtype))
+        distances = self._distances(queries)
+
+        k = min(k, len(self.ids))
+
+        if k < len(self.ids):
+            candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(len(self.ids)), distances.shape)
+
+        candidate_distances = np.take_along_axis(distances, candidates, axis=1)
+        order = np.argsort(candidate_distances, axis=1, kind='stable')
+
+        top_indices = np.take_along_axis(candidates, order, axis=1)
+        top_distances = np.take_along_axis(candidate_distances, order, axis=1)
+
+        return [
+            [(self.ids[index], float(distance)) for index, distance in zip(row_indices, row_distances)]
+            for row_indices, row_distances in zip(top_indices, top_distances)
+        ]
+
+    def search(self, query, k: int) -> list:
+
+        """ Returns the k closest (id, distance) pairs to a single query, closest first. """
+
+        return self.search_batch([query], k)[0]
+
+__all__ = ['VectorSearchEngine']
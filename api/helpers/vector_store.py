@@ -0,0 +1,302 @@
+import os
+import json
+import fcntl
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+QUANTIZATIONS = ('float16', 'int8')
+
+class QuantizedView:
+
+    """ Read-only int8 view over the store that dequantizes only the rows being read. """
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray):
+        self.codes = codes
+        self.scales = scales
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def shape(self) -> tuple:
+        return self.codes.shape
+
+    def __getitem__(self, rows) -> np.ndarray:
+
+        codes = self.codes[rows].astype(np.float32)
+        scales = self.scales[rows]
+
+        return codes * (scales[..., np.newaxis] if np.ndim(scales) else scales)
+
+class MmapVectorStore:
+
+    """
+
+    Append-only, memory-mapped store for fixed dimension embedding vectors.
+
+    Vectors live in one contiguous float32 file (plus optional float16 and per-row scaled int8 copies) next to an id -> row
+    index. Reads are memory-mapped, so they are zero-copy and every worker process shares the same page-cached copy.
+
+    Appends are serialized across processes with a file lock and the index is replaced atomically, so readers only ever see
+    fully written rows. Overwritten or deleted ids leave dead rows behind until compact() rewrites the files.
+
+    compact() renumbers rows and bumps generation. Callers that keep row numbers (e.g. an ANN index over view()) must drop
+    them when generation changes, since another process may have compacted the store.
+
+    """
+
+    def __init__(self, directory: str, quantizations: tuple = QUANTIZATIONS):
+
+        for quantization in quantizations:
+            if quantization not in QUANTIZATIONS:
+                raise ValueError(f"Unsupported quantization {quantization}, expected one of {QUANTIZATIONS}")
+
+        self.directory = directory
+        self.quantizations = tuple(quantizations)
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.dimension = None
+        self.count = 0
+        self.ids = {}
+        self.generation = 0
+
+        self._index_mtime = None
+        self._views = {}
+        self._lock = threading.RLock()
+
+        self.refresh()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _file_lock(self):
+
+        with self._lock, open(self._path('lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def refresh(self):
+
+        """ Re-reads the index if another process changed it. """
+
+        path = self._path('index.json')
+
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return
+
+        with self._lock:
+
+            if mtime == self._index_mtime:
+                return
+
+            with open(path) as f:
+                index = json.load(f)
+
+            self.dimension = index['dimension']
+            self.count = index['count']
+            self.ids = index['ids']
+            self.generation = index.get('generation', 0)
+
+            self._index_mtime = mtime
+            self._views = {}
+
+    def _write_index(self):
+
+        path = self._path('index.json')
+
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'dimension': self.dimension, 'count': self.count, 'ids': self.ids, 'generation': self.generation}, f)
+
+        os.replace(path + '.tmp', path)
+
+        self._index_mtime = os.stat(path).st_mtime_ns
+        self._views = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, vector_id: str) -> bool:
+        return vector_id in self.ids
+
+    @staticmethod
+    def _quantize_int8(vectors: np.ndarray) -> tuple:
+
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+
+        return np.round(vectors / scales[:, np.newaxis]).astype(np.int8), scales.astype(np.float32)
+
+    def _encodings(self, vectors: np.ndarray) -> dict:
+
+        """ Returns {file name: array} for every file a row is written to. """
+
+        encodings = {'vectors.float32': vectors}
+
+        if 'float16' in self.quantizations:
+            encodings['vectors.float16'] = vectors.astype(np.float16)
+
+        if 'int8' in self.quantizations:
+            encodings['vectors.int8'], encodings['scales.float32'] = self._quantize_int8(vectors)
+
+        return encodings
+
+    def _row_bytes(self, name: str) -> int:
+        return np.dtype(name.split('.')[-1]).itemsize * (1 if name.startswith('scales') else self.dimension)
+
+    def append(self, items) -> list:
+
+        """ Appends (id, vector) pairs and returns their rows. Appending an existing id points it at the new row. """
+
+        items = list(items)
+
+        if not items:
+            return []
+
+        vectors = np.stack([np.asarray(vector, dtype=np.float32).ravel() for _, vector in items])
+
+        with self._file_lock():
+
+            self.refresh()
+
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(f"Expected vectors of dimension {self.dimension}, got {vectors.shape[1]}")
+
+            for name, encoded in self._encodings(vectors).items():
+                with open(self._path(name), 'ab') as f:
+                    # Drop anything past the last indexed row, e.g. left by a writer that crashed before updating the index.
+                    f.truncate(self.count * self._row_bytes(name))
+                    f.write(np.ascontiguousarray(encoded).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            rows = list(range(self.count, self.count + len(items)))
+
+            for (vector_id, _), row in zip(items, rows):
+                self.ids[vector_id] = row
+
+            self.count += len(items)
+            self._write_index()
+
+        return rows
+
+    def delete(self, vector_ids):
+
+        """ Removes ids from the index. Their rows stay on disk until compact(). """
+
+        with self._file_lock():
+
+            self.refresh()
+
+            for vector_id in vector_ids:
+                self.ids.pop(vector_id, None)
+
+            self._write_index()
+
+    @property
+    def dead_rows(self) -> int:
+        return self.count - len(self.ids)
+
+    def compact(self):
+
+        """ Rewrites every file with only the live rows. Readers holding old views keep reading the old files until they refresh. """
+
+        with self._file_lock():
+
+            self.refresh()
+
+            if self.dimension is None:
+                return
+
+            live = sorted(self.ids.items(), key=lambda item: item[1])
+            rows = np.array([row for _, row in live], dtype=np.int64)
+
+            for name in self._encodings(np.zeros((0, self.dimension), dtype=np.float32)):
+                dtype = np.dtype(name.split('.')[-1])
+                shape = (self.count,) if name.startswith('scales') else (self.count, self.dimension)
+                data = np.memmap(self._path(name), dtype=dtype, mode='r', shape=shape) if self.count else np.zeros(shape, dtype=dtype)
+
+                with open(self._path(name) + '.tmp', 'wb') as f:
+                    f.write(np.ascontiguousarray(data[rows]).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                del data
+                os.replace(self._path(name) + '.tmp', self._path(name))
+
+            self.ids = {vector_id: position for position, (vector_id, _) in enumerate(live)}
+            self.count = len(live)
+            self.generation += 1
+            self._write_index()
+
+    def view(self, dtype: str = 'float32'):
+
+        """
+
+        Returns a zero-copy view of every row in the requested encoding. float32 and float16 are np.memmap arrays, int8 is a
+        QuantizedView that dequantizes on read.
+
+        """
+
+        self.refresh()
+
+        if dtype != 'float32' and dtype not in self.quantizations:
+            raise ValueError(f"Store was not built with {dtype} vectors")
+
+        with self._lock:
+
+            if dtype not in self._views:
+
+                if self.count == 0:
+                    self._views[dtype] = np.zeros((0, self.dimension or 0), dtype=np.float32)
+                elif dtype == 'int8':
+                    codes = np.memmap(self._path('vectors.int8'), dtype=np.int8, mode='r', shape=(self.count, self.dimension))
+                    scales = np.memmap(self._path('scales.float32'), dtype=np.float32, mode='r', shape=(self.count,))
+                    self._views[dtype] = QuantizedView(codes, scales)
+                else:
+                    self._views[dtype] = np.memmap(self._path(f'vectors.{dtype}'), dtype=dtype, mode='r', shape=(self.count, self.dimension))
+
+            return self._views[dtype]
+
+    def rows(self, vector_ids) -> np.ndarray:
+
+        """ Returns the row of each id, or -1 for ids that are not in the store (e.g. deleted by another process). """
+
+        ids = self.ids
+        return np.array([ids.get(vector_id, -1) for vector_id in vector_ids], dtype=np.int64)
+
+    def lookup(self, vector_ids, dtype: str = 'float32') -> tuple:
+
+        """ Returns (view, rows, generation) read from the same version of the index, so a concurrent compaction cannot mix them. """
+
+        with self._lock:
+            view = self.view(dtype)
+            return view, self.rows(vector_ids), self.generation
+
+    def get(self, vector_id: str, dtype: str = 'float32') -> np.ndarray:
+
+        """ Returns one vector. For float32 and float16 this is a view into the memory map, not a copy. """
+
+        return self.view(dtype)[self.ids[vector_id]]
+
+    def stats(self) -> dict:
+
+        return {
+            'dimension': self.dimension,
+            'vectors': len(self.ids),
+            'dead_rows': self.dead_rows,
+            'bytes': {name: os.path.getsize(self._path(name)) for name in self._encodings(np.zeros((0, self.dimension or 0), dtype=np.float32)) if os.path.exists(self._path(name))}
+        }
+
+__all__ = ['MmapVectorStore', 'QuantizedView']
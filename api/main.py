@@ -1,21 +1,34 @@
 from providers import TwelveLabsHandler, GoogleHandler, AWSHandler
-from helpers import DBHandler, VideoIdRequest, VideoIdRequestSingleProvider, SuccessResponse, DefaultResponse, FetchVideoIdsResponse, get_video_id_from_request, get_video_id_from_request_single_provider
+from helpers import AsyncDBHandler, VideoIdRequest, VideoIdRequestSingleProvider, SuccessResponse, DefaultResponse, FetchVideoIdsResponse, get_video_id_from_request, get_video_id_from_request_single_provider
 from helpers import EvaluationAgent, VideoSearchAgent
+from helpers import GenerateAllRequest, get_generate_all_request, sse_event, ndjson_event
+from helpers import generation_cache, clients, single_flight, metrics, http_request_duration, embedding_index, quiz_analytics, gemini_context_cache
 
+import os
 import asyncio
 import logging
 import uvicorn
 import time
 
+from contextlib import asynccontextmanager
+
 from decimal import Decimal
 from starlette.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, Request, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, Depends, HTTPException, BackgroundTasks, status
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+
+    # Create provider and AWS clients once per process instead of once per request.
+    clients.initialize()
+    yield
+    clients.close()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], 
@@ -24,6 +37,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware('http')
+async def record_request_metrics(request: Request, call_next):
+
+    """
+    Records request latency per route template. For streaming routes this is the time until the response starts, not the full stream.
+    """
+
+    start_time = time.perf_counter()
+    status_code = 500
+
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get('route')
+        http_request_duration.observe(time.perf_counter() - start_time, route=route.path if route else 'unmatched', method=request.method, status=status_code)
+
 # Helper Functions
 
 def convert_decimals_for_json(data) -> any:
@@ -64,17 +95,133 @@ def convert_for_dynamodb(data) -> any:
     
     return recursive_convert(data)
 
+# Artifacts each provider can generate from the video alone. Quiz questions are chained off chapters.
+PROVIDER_ARTIFACTS = {
+    'twelvelabs': ['gist', 'chapters', 'key_takeaways', 'pacing_recommendations', 'engagement', 'summary'],
+    'google': ['gist', 'chapters', 'key_takeaways', 'pacing_recommendations', 'engagement', 'summary', 'transcript'],
+    'aws': ['gist', 'chapters', 'key_takeaways', 'pacing_recommendations', 'engagement', 'summary', 'transcript'],
+}
+
+# Providers whose handler can generate several artifacts in one pass (generate_artifacts). Set GOOGLE_COMBINED_GENERATION=false to
+# fall back to one call per artifact.
+COMBINED_GENERATION_PROVIDERS = {'google'} if os.getenv('GOOGLE_COMBINED_GENERATION', 'true').lower() == 'true' else set()
+
+def get_provider_handler(provider: str, video_id: str):
+
+    """
+    Builds the provider handler for the given provider specific video ID.
+    """
+
+    if provider == 'twelvelabs':
+        return TwelveLabsHandler(twelve_labs_video_id=video_id)
+    elif provider == 'google':
+        return GoogleHandler(gemini_file_id=video_id)
+    elif provider == 'aws':
+        return AWSHandler(s3_key=video_id)
+    else:
+        raise HTTPException(status_code=400, detail="Invalid provider")
+
+async def coalesced_generation(provider: str, video_id: str, artifact: str, *args):
+
+    """
+    Runs generate_<artifact> on the provider, sharing one in-flight call between concurrent identical requests.
+    The key covers the route, provider, video ID and any extra arguments (e.g. the chapters used for quiz questions).
+    """
+
+    key = single_flight.make_key(f'generate_{artifact}', provider, video_id, list(args))
+
+    return await single_flight.do(key, lambda: getattr(get_provider_handler(provider, video_id), f'generate_{artifact}')(*args))
+
+async def generate_provider_artifact(provider: str, video_id: str, artifact: str, *args) -> dict:
+
+    """
+    Runs a single generate_* call for a provider and wraps the result in the same shape the single artifact routes return.
+    Errors are returned as an error payload instead of raised so one failing artifact does not cancel the others.
+    """
+
+    start_time = time.time()
+
+    try:
+
+        data = await coalesced_generation(provider, video_id, artifact, *args)
+
+        if data is None:
+            raise Exception(f"{provider} returned no {artifact}")
+
+        return SuccessResponse(data=data, duration=time.time() - start_time, message=f'{artifact} generated successfully', provider=provider, type=artifact).model_dump()
+
+    except Exception as e:
+
+        logger.error(f"Error generating {artifact} with {provider}: {e}")
+
+        return {
+            'status': 'error',
+            'provider': provider,
+            'type': artifact,
+            'message': str(e),
+            'duration': time.time() - start_time
+        }
+
+async def generate_provider_artifacts(provider: str, video_id: str, artifacts: list) -> list:
+
+    """
+    Generates several artifacts of one provider in a single pass (see GoogleHandler.generate_artifacts) and returns one result per artifact,
+    in the same shape generate_provider_artifact returns.
+    """
+
+    start_time = time.time()
+
+    async def generate():
+        errors = {}
+        data = await get_provider_handler(provider, video_id).generate_artifacts(artifacts, errors=errors)
+        return data, errors
+
+    try:
+
+        key = single_flight.make_key('generate_artifacts', provider, video_id, sorted(artifacts))
+        data, errors = await single_flight.do(key, generate)
+
+    except Exception as e:
+
+        logger.error(f"Error generating {', '.join(artifacts)} with {provider}: {e}")
+        data, errors = {}, {artifact: str(e) for artifact in artifacts}
+
+    results = []
+
+    for artifact in artifacts:
+
+        if data.get(artifact) is None:
+            results.append({'status': 'error', 'provider': provider, 'type': artifact, 'message': errors.get(artifact, f"{provider} returned no {artifact}"), 'duration': time.time() - start_time})
+        else:
+            results.append(SuccessResponse(data=data[artifact], duration=time.time() - start_time, message=f'{artifact} generated successfully', provider=provider, type=artifact).model_dump())
+
+    return results
+
 
 # API Endpoints
 
+def index_uploaded_video(s3_key: str):
+
+    """
+    Adds a newly uploaded lecture to the related videos embedding index. Runs as a background task so the upload response is not held up by Marengo.
+    """
+
+    try:
+        embedding_index.index_object(s3_key, VideoSearchAgent().generate_video_segment_embeddings)
+    except Exception as e:
+        logger.error(str(e))
+
 @app.post('/upload_video')
-async def upload_video(video_params: VideoIdRequest = Depends(get_video_id_from_request)) -> DefaultResponse:
+async def upload_video(background_tasks: BackgroundTasks, video_params: VideoIdRequest = Depends(get_video_id_from_request)) -> DefaultResponse:
     try:
-        db_handler = DBHandler()
-        db_handler.upload_video_ids(twelve_labs_video_id=video_params.twelve_labs_video_id, s3_key=video_params.s3_key, gemini_file_id=video_params.gemini_file_id)
+        db_handler = AsyncDBHandler()
+        await db_handler.upload_video_ids(twelve_labs_video_id=video_params.twelve_labs_video_id, s3_key=video_params.s3_key, gemini_file_id=video_params.gemini_file_id)
     except Exception as e:
         return DefaultResponse(status='error', message=str(e), status_code=500)
 
+    if video_params.s3_key:
+        background_tasks.add_task(index_uploaded_video, video_params.s3_key)
+
     return DefaultResponse(status='success', message='Video uploaded successfully', status_code=200)
 
 @app.get('/fetch_video_ids',
@@ -117,8 +264,8 @@ async def fetch_video_ids(request: Request) -> FetchVideoIdsResponse:
         raise HTTPException(status_code=400, detail="video_id is required")
 
     try:
-        db_handler = DBHandler()
-        gemini_file_id, s3_key = db_handler.fetch_video_ids(video_id)
+        db_handler = AsyncDBHandler()
+        gemini_file_id, s3_key = await db_handler.fetch_video_ids(video_id)
 
         return FetchVideoIdsResponse(
             status='success',
@@ -171,18 +318,11 @@ async def generate_gist(video_params: VideoIdRequestSingleProvider = Depends(get
 
         start_time = time.time()
         
-        if provider == 'twelvelabs':
-            twelvelabs_provider = TwelveLabsHandler(twelve_labs_video_id=video_id)
-            gist_result = await twelvelabs_provider.generate_gist()
-        elif provider == 'google':
-            google_provider = GoogleHandler(gemini_file_id=video_id)
-            gist_result = await google_provider.generate_gist()
-        elif provider == 'aws':
-            aws_provider = AWSHandler(s3_key=video_id)
-            gist_result = await aws_provider.generate_gist()
-        else:
+        if provider not in PROVIDER_ARTIFACTS:
             raise HTTPException(status_code=400, detail="Invalid provider")
 
+        gist_result = await coalesced_generation(provider, video_id, 'gist')
+
         end_time = time.time()
         duration = end_time - start_time
 
@@ -255,18 +395,11 @@ async def generate_chapters(video_params: VideoIdRequestSingleProvider = Depends
 
         start_time = time.time()
         
-        if provider == 'twelvelabs':
-            twelvelabs_provider = TwelveLabsHandler(twelve_labs_video_id=video_id)
-            chapters = await twelvelabs_provider.generate_chapters()
-        elif provider == 'google':
-            google_provider = GoogleHandler(gemini_file_id=video_id)
-            chapters = await google_provider.generate_chapters()
-        elif provider == 'aws':
-            aws_provider = AWSHandler(s3_key=video_id)
-            chapters = await aws_provider.generate_chapters()
-        else:
+        if provider not in PROVIDER_ARTIFACTS:
             raise HTTPException(status_code=400, detail="Invalid provider")
 
+        chapters = await coalesced_generation(provider, video_id, 'chapters')
+
         return SuccessResponse(data=chapters, duration=time.time() - start_time, message='Chapters generated successfully', provider=provider, type='chapters').model_dump()
     
     except Exception as e:
@@ -305,18 +438,11 @@ async def generate_pacing_recommendations(video_params: VideoIdRequestSingleProv
 
         start_time = time.time()
 
-        if provider == 'twelvelabs':
-            twelvelabs_provider = TwelveLabsHandler(twelve_labs_video_id=video_id)
-            pacing_recommendations = await twelvelabs_provider.generate_pacing_recommendations()
-        elif provider == 'google':
-            google_provider = GoogleHandler(gemini_file_id=video_id)
-            pacing_recommendations = await google_provider.generate_pacing_recommendations()
-        elif provider == 'aws':
-            aws_provider = AWSHandler(s3_key=video_id)
-            pacing_recommendations = await aws_provider.generate_pacing_recommendations()
-        else:
+        if provider not in PROVIDER_ARTIFACTS:
             raise HTTPException(status_code=400, detail="Invalid provider")
 
+        pacing_recommendations = await coalesced_generation(provider, video_id, 'pacing_recommendations')
+
         return SuccessResponse(data=pacing_recommendations, duration=time.time() - start_time, message='Pacing recommendations generated successfully', provider=provider, type='pacing_recommendations').model_dump()
     
     except Exception as e:
@@ -352,18 +478,11 @@ async def generate_key_takeaways(video_params: VideoIdRequestSingleProvider = De
 
         start_time = time.time()
 
-        if provider == 'twelvelabs':
-            twelvelabs_provider = TwelveLabsHandler(twelve_labs_video_id=video_id)
-            key_takeaways = await twelvelabs_provider.generate_key_takeaways()
-        elif provider == 'google':
-            google_provider = GoogleHandler(gemini_file_id=video_id)
-            key_takeaways = await google_provider.generate_key_takeaways()
-        elif provider == 'aws':
-            aws_provider = AWSHandler(s3_key=video_id)
-            key_takeaways = await aws_provider.generate_key_takeaways()
-        else:
+        if provider not in PROVIDER_ARTIFACTS:
             raise HTTPException(status_code=400, detail="Invalid provider")
 
+        key_takeaways = await coalesced_generation(provider, video_id, 'key_takeaways')
+
         return SuccessResponse(data=key_takeaways, duration=time.time() - start_time, message='Key takeaways generated successfully', provider=provider, type='key_takeaways').model_dump()
     
     except Exception as e:
@@ -403,18 +522,11 @@ async def generate_quiz_questions(request: Request):
         if not twelve_labs_video_id or not provider or not chapters:
             raise HTTPException(status_code=400, detail="Missing required fields")
         
-        if provider == 'twelvelabs':
-            twelvelabs_provider = TwelveLabsHandler(twelve_labs_video_id=twelve_labs_video_id)
-            quiz_questions = await twelvelabs_provider.generate_quiz_questions(chapters)
-        elif provider == 'google':
-            google_provider = GoogleHandler(gemini_file_id=twelve_labs_video_id)
-            quiz_questions = await google_provider.generate_quiz_questions(chapters)
-        elif provider == 'aws':
-            aws_provider = AWSHandler(s3_key=twelve_labs_video_id)
-            quiz_questions = await aws_provider.generate_quiz_questions(chapters)
-        else:
+        if provider not in PROVIDER_ARTIFACTS:
             raise HTTPException(status_code=400, detail="Invalid provider")
 
+        quiz_questions = await coalesced_generation(provider, twelve_labs_video_id, 'quiz_questions', chapters)
+
         return SuccessResponse(data=quiz_questions, duration=time.time() - start_time, message='Quiz questions generated successfully', provider='twelvelabs', type='quiz_questions').model_dump()
     
     except Exception as e:
@@ -435,18 +547,11 @@ async def generate_engagement(video_params: VideoIdRequestSingleProvider = Depen
 
         start_time = time.time()
         
-        if provider == 'twelvelabs':
-            twelvelabs_provider = TwelveLabsHandler(twelve_labs_video_id=video_id)
-            engagement = await twelvelabs_provider.generate_engagement()
-        elif provider == 'google':
-            google_provider = GoogleHandler(gemini_file_id=video_id)
-            engagement = await google_provider.generate_engagement()
-        elif provider == 'aws':
-            aws_provider = AWSHandler(s3_key=video_id)
-            engagement = await aws_provider.generate_engagement()
-        else:
+        if provider not in PROVIDER_ARTIFACTS:
             raise HTTPException(status_code=400, detail="Invalid provider")
 
+        engagement = await coalesced_generation(provider, video_id, 'engagement')
+
         return SuccessResponse(data=engagement, duration=time.time() - start_time, message='Engagement generated successfully', provider=provider, type='engagement').model_dump()
     
     except Exception as e:
@@ -479,18 +584,11 @@ async def generate_summary(video_params: VideoIdRequestSingleProvider = Depends(
 
         start_time = time.time()
 
-        if provider == 'twelvelabs':
-            twelvelabs_provider = TwelveLabsHandler(twelve_labs_video_id=video_id)
-            summary = await twelvelabs_provider.generate_summary()
-        elif provider == 'google':
-            google_provider = GoogleHandler(gemini_file_id=video_id)
-            summary = await google_provider.generate_summary()
-        elif provider == 'aws':
-            aws_provider = AWSHandler(s3_key=video_id)
-            summary = await aws_provider.generate_summary()
-        else:
+        if provider not in PROVIDER_ARTIFACTS:
             raise HTTPException(status_code=400, detail="Invalid provider")
 
+        summary = await coalesced_generation(provider, video_id, 'summary')
+
         return SuccessResponse(data=summary, duration=time.time() - start_time, message='Summary generated successfully', provider=provider, type='summary').model_dump()
     
     except Exception as e:
@@ -525,14 +623,10 @@ async def generate_transcript(video_params: VideoIdRequestSingleProvider = Depen
 
         start_time = time.time()
 
-        if provider == 'google':
-            google_provider = GoogleHandler(gemini_file_id=video_id)
-            transcript = await google_provider.generate_transcript()
-        elif provider == 'aws':
-            aws_provider = AWSHandler(s3_key=video_id)
-            transcript = await aws_provider.generate_transcript()
-        else:
+        if provider not in ('google', 'aws'):
             raise HTTPException(status_code=400, detail="Invalid provider")
+
+        transcript = await coalesced_generation(provider, video_id, 'transcript')
         
         return SuccessResponse(data=transcript, duration=time.time() - start_time, message='Transcript generated successfully', provider=provider, type='transcript').model_dump()
 
@@ -543,6 +637,227 @@ async def generate_transcript(video_params: VideoIdRequestSingleProvider = Depen
 
         return DefaultResponse(status='error', message=str(e), status_code=500)
     
+@app.get('/generate_all')
+async def generate_all(generate_params: GenerateAllRequest = Depends(get_generate_all_request)):
+
+    """
+
+    Generates every requested artifact for every requested provider concurrently and streams each result as a server-sent event as soon as it finishes.
+
+    Each event has the same shape as the single artifact routes (**status**, **provider**, **type**, **data**, **duration**).
+    Quiz questions are generated as soon as the chapters for that provider are available.
+    Google artifacts come from a single combined pass over the video, so they arrive together.
+    The stream ends with an event of type **complete**.
+
+    """
+
+    provider_video_ids = {
+        'twelvelabs': generate_params.twelve_labs_video_id,
+        'google': generate_params.gemini_file_id,
+        'aws': generate_params.s3_key,
+    }
+
+    for provider in generate_params.providers:
+        if provider not in PROVIDER_ARTIFACTS:
+            raise HTTPException(status_code=400, detail=f"Invalid provider: {provider}")
+
+    if any(not provider_video_ids[provider] for provider in generate_params.providers):
+        gemini_file_id, s3_key = await AsyncDBHandler().fetch_video_ids(generate_params.twelve_labs_video_id)
+        provider_video_ids['google'] = provider_video_ids['google'] or gemini_file_id
+        provider_video_ids['aws'] = provider_video_ids['aws'] or s3_key
+
+    async def event_stream():
+
+        start_time = time.time()
+        pending = set()
+
+        for provider in generate_params.providers:
+
+            if not provider_video_ids[provider]:
+                yield sse_event({'status': 'error', 'provider': provider, 'type': 'all', 'message': f'No video ID found for {provider}'})
+                continue
+
+            artifacts = [artifact for artifact in PROVIDER_ARTIFACTS[provider] if generate_params.artifacts is None or artifact in generate_params.artifacts]
+
+            # Providers with a combined mode get every artifact from one pass over the video.
+            if provider in COMBINED_GENERATION_PROVIDERS and len(artifacts) > 1:
+                pending.add(asyncio.create_task(generate_provider_artifacts(provider, provider_video_ids[provider], artifacts)))
+                continue
+
+            for artifact in artifacts:
+                pending.add(asyncio.create_task(generate_provider_artifact(provider, provider_video_ids[provider], artifact)))
+
+        generate_quiz_questions = generate_params.artifacts is None or 'quiz_questions' in generate_params.artifacts
+
+        try:
+
+            while pending:
+
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+
+                    results = task.result()
+
+                    for result in results if isinstance(results, list) else [results]:
+
+                        yield sse_event(result)
+
+                        if generate_quiz_questions and result['type'] == 'chapters' and result['status'] == 'success':
+                            chapters = result['data'].get('chapters') if isinstance(result['data'], dict) else None
+                            if chapters:
+                                pending.add(asyncio.create_task(generate_provider_artifact(result['provider'], provider_video_ids[result['provider']], 'quiz_questions', chapters)))
+
+            yield sse_event({'status': 'success', 'type': 'complete', 'duration': time.time() - start_time})
+
+        finally:
+
+            # Client disconnected before every artifact finished.
+            for task in pending:
+                task.cancel()
+
+    return StreamingResponse(event_stream(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.get('/stream_lecture_analysis')
+async def stream_lecture_analysis(request: Request):
+
+    """
+
+    Streams TwelveLabs analysis of a lecture as server-sent events while Pegasus generates it.
+
+    - **video_id**: TwelveLabs video ID
+    - **streams**: Optional comma separated subset of summary, key_takeaways, chapters, pacing_recommendations
+
+    Each event has **type**, **status** ('in_progress', 'complete' or 'error') and **content** (the next text chunk).
+
+    """
+
+    video_id = request.query_params.get('video_id')
+    streams = request.query_params.get('streams')
+
+    if not video_id:
+        raise HTTPException(status_code=400, detail="video_id is required")
+
+    stream_types = [stream.strip() for stream in streams.split(',') if stream.strip()] if streams else None
+
+    if stream_types and any(stream not in ('summary', 'key_takeaways', 'chapters', 'pacing_recommendations') for stream in stream_types):
+        raise HTTPException(status_code=400, detail="Invalid stream type")
+
+    twelvelabs_provider = TwelveLabsHandler(twelve_labs_video_id=video_id)
+
+    async def event_stream():
+        async for data in twelvelabs_provider.stream_student_lecture_analysis(stream_types=stream_types):
+            yield sse_event(data)
+
+    # X-Accel-Buffering stops reverse proxies from holding back the first tokens.
+    return StreamingResponse(event_stream(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.get('/stream_generation')
+async def stream_generation(request: Request):
+
+    """
+
+    Streams one artifact from any provider, emitting each list element (e.g. a single chapter) as soon as the model has written it.
+
+    - **provider**: twelvelabs, google or aws
+    - **video_id**: Provider specific video ID
+    - **artifact**: One of the provider's artifacts, e.g. chapters or pacing_recommendations
+    - **format**: 'sse' (server-sent events, default) or 'ndjson' (one JSON object per line)
+
+    Element events have status 'in_progress' with **index** and **data**. The stream ends with a 'complete' event carrying the whole
+    validated artifact, or an 'error' event.
+
+    """
+
+    provider = request.query_params.get('provider')
+    video_id = request.query_params.get('video_id')
+    artifact = request.query_params.get('artifact')
+    stream_format = request.query_params.get('format', 'sse')
+
+    if not provider or not video_id or not artifact:
+        raise HTTPException(status_code=400, detail="provider, video_id and artifact are required")
+
+    if provider not in PROVIDER_ARTIFACTS:
+        raise HTTPException(status_code=400, detail=f"Invalid provider: {provider}")
+
+    if stream_format not in ('sse', 'ndjson'):
+        raise HTTPException(status_code=400, detail=f"Invalid format: {stream_format}")
+
+    handler = get_provider_handler(provider, video_id)
+
+    if artifact not in handler.ARTIFACTS:
+        raise HTTPException(status_code=400, detail=f"{provider} cannot stream {artifact}")
+
+    format_event = sse_event if stream_format == 'sse' else ndjson_event
+
+    async def event_stream():
+        async for data in handler.stream_artifact(artifact):
+            yield format_event(data)
+
+    media_type = 'text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+
+    return StreamingResponse(event_stream(), media_type=media_type, headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.get('/metrics')
+async def get_metrics():
+
+    """ Exposes request, provider, DynamoDB, cache and coalescing metrics in the Prometheus text format. """
+
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
+@app.get('/cache_stats')
+async def cache_stats():
+
+    """ Returns hit/miss counters for the provider generation cache and Gemini context cache, and how many generation calls were saved by request coalescing. """
+
+    return JSONResponse({
+        'status': 'success',
+        'message': 'Cache stats fetched successfully',
+        'data': {
+            'generation_cache': generation_cache.stats(),
+            'single_flight': single_flight.stats(),
+            'gemini_context_cache': gemini_context_cache.stats()
+        }
+    }, status_code=200)
+
+@app.post('/invalidate_cache')
+async def invalidate_cache(request: Request):
+
+    """
+
+    Invalidates cached generations for a video. Optionally narrowed to a single provider and/or artifact.
+
+    - **video_id**: Provider specific video ID the generations were cached under
+    - **provider**: Optional provider name
+    - **artifact**: Optional artifact type (e.g. chapters, summary)
+
+    """
+
+    try:
+
+        data = await request.json()
+        video_id = data.get('video_id')
+
+        if not video_id:
+            return JSONResponse({
+                'status': 'error',
+                'message': 'video_id is required'
+            }, status_code=400)
+
+        removed = await generation_cache.invalidate(video_id, provider=data.get('provider'), artifact=data.get('artifact'))
+
+        return JSONResponse({
+            'status': 'success',
+            'message': f'Invalidated {removed} cached generations'
+        }, status_code=200)
+
+    except Exception as e:
+
+        return JSONResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status_code=500)
+
 @app.post('/publish_course')
 async def publish_course(request: Request):
 
@@ -564,7 +879,7 @@ async def publish_course(request: Request):
                 'message': 'No JSON data received'
             }, status_code=400)
 
-        db_handler = DBHandler()
+        db_handler = AsyncDBHandler()
 
         video_id = data.get('video_id')
         gemini_file_id = data.get('gemini_file_id')
@@ -582,7 +897,7 @@ async def publish_course(request: Request):
 
         
 
-        result = db_handler.upload_course_metadata(video_id=video_id, title=title, chapters=chapters, quiz_questions=quiz_questions, key_takeaways=key_takeaways, pacing_recommendations=pacing_recommendations, summary=summary, engagement=engagement, transcript=transcript, gemini_file_id=gemini_file_id, s3_key=s3_key)
+        result = await db_handler.upload_course_metadata(video_id=video_id, title=title, chapters=chapters, quiz_questions=quiz_questions, key_takeaways=key_takeaways, pacing_recommendations=pacing_recommendations, summary=summary, engagement=engagement, transcript=transcript, gemini_file_id=gemini_file_id, s3_key=s3_key)
 
         return JSONResponse({
             'status': 'success',
@@ -610,8 +925,8 @@ async def get_published_courses(request: Request):
 
     try:
 
-        db_handler = DBHandler()
-        courses = db_handler.get_published_courses()
+        db_handler = AsyncDBHandler()
+        courses = await db_handler.get_published_courses()
 
         courses = convert_decimals_for_json(courses)
 
@@ -633,6 +948,55 @@ async def get_published_courses(request: Request):
             'message': str(e)
         }, status_code=500)
     
+@app.get('/list_courses')
+async def list_courses(request: Request):
+
+    """
+
+    Lists published courses newest first, one page at a time, with only the fields needed to render the catalog.
+
+    - **limit**: Page size (1-100, default 20)
+    - **cursor**: next_cursor from the previous page
+
+    """
+
+    try:
+
+        limit = int(request.query_params.get('limit', 20))
+        cursor = request.query_params.get('cursor')
+
+        if limit < 1 or limit > 100:
+            return JSONResponse({
+                'status': 'error',
+                'message': 'limit must be between 1 and 100'
+            }, status_code=400)
+
+        db_handler = AsyncDBHandler()
+        catalog_page = await db_handler.list_course_catalog(limit=limit, cursor=cursor)
+
+        return JSONResponse({
+            'status': 'success',
+            'message': 'Courses listed successfully',
+            'data': convert_decimals_for_json(catalog_page['courses']),
+            'next_cursor': catalog_page['next_cursor']
+        }, status_code=200)
+
+    except ValueError as e:
+
+        return JSONResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status_code=400)
+
+    except Exception as e:
+
+        logger.error(f"Error in list_courses endpoint: {e}")
+
+        return JSONResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status_code=500)
+
 @app.get('/fetch_course_metadata')
 @app.post('/fetch_course_metadata')
 async def fetch_course_metadata(request: Request):
@@ -646,8 +1010,8 @@ async def fetch_course_metadata(request: Request):
         data = await request.json()
         video_id = data.get('video_id')
 
-        db_handler = DBHandler()
-        course_metadata = db_handler.fetch_course_metadata(video_id=video_id)
+        db_handler = AsyncDBHandler()
+        course_metadata = await db_handler.fetch_course_metadata(video_id=video_id)
 
         course_metadata = convert_decimals_for_json(course_metadata)
 
@@ -689,11 +1053,11 @@ async def save_student_reaction(request: Request):
                 'message': 'video_id and reaction are required'
             }, status_code=400)
 
-        db_handler = DBHandler()
+        db_handler = AsyncDBHandler()
         reaction = convert_for_dynamodb(reaction)
         
         # Save the reaction to the database
-        result = db_handler.save_student_reaction(video_id=video_id, reaction=reaction)
+        result = await db_handler.save_student_reaction(video_id=video_id, reaction=reaction)
 
         return JSONResponse({
             'status': 'success',
@@ -716,8 +1080,8 @@ async def get_student_reactions(twelve_labs_video_id: str = Depends(get_video_id
     """
     try:
         
-        db_handler = DBHandler()
-        reactions = db_handler.get_student_reactions(twelve_labs_video_id)
+        db_handler = AsyncDBHandler()
+        reactions = await db_handler.get_student_reactions(twelve_labs_video_id)
 
         reactions = convert_decimals_for_json(reactions)
         
@@ -752,8 +1116,9 @@ async def save_wrong_answer(request: Request):
                 'message': 'video_id, wrong_answer, and student_name are required'
             }, status_code=400)
         
-        db_handler = DBHandler()
-        result = db_handler.save_wrong_answer(student_name, video_id, wrong_answer)
+        db_handler = AsyncDBHandler()
+        result = await db_handler.save_wrong_answer(student_name, video_id, wrong_answer)
+        quiz_analytics.record_wrong_answers(video_id, student_name, [wrong_answer])
         
         return JSONResponse({
             'status': 'success',
@@ -784,9 +1149,11 @@ async def calculate_quiz_performance_by_student(request: Request):
                 'message': 'video_id and student_name are required'
             }, status_code=400)
         
-        db_handler = DBHandler()
-        video_metadata = db_handler.fetch_course_metadata(video_id)
-        wrong_answers = db_handler.get_student_profile(student_name)[video_id + '_wrong_answers']
+        db_handler = AsyncDBHandler()
+        video_metadata, wrong_answers = await asyncio.gather(
+            db_handler.fetch_course_metadata(video_id),
+            db_handler.get_wrong_answers(student_name, video_id)
+        )
 
         if not wrong_answers:
             return JSONResponse({
@@ -795,12 +1162,13 @@ async def calculate_quiz_performance_by_student(request: Request):
             }, status_code=400)
 
         evaluation_agent = EvaluationAgent(video_metadata)
-        quiz_performance = evaluation_agent.calculate_quiz_performance(wrong_answers)
+        quiz_performance = await evaluation_agent.calculate_quiz_performance_async(wrong_answers)
 
         quiz_performance_for_db = convert_for_dynamodb(quiz_performance)
         quiz_performance_for_response = convert_decimals_for_json(quiz_performance)
 
-        asyncio.create_task(db_handler.save_student_progress_report(student_name, video_id, quiz_performance_for_db))
+        await db_handler.save_student_progress_report(student_name, video_id, quiz_performance_for_db)
+        quiz_analytics.record_attempt(video_id, student_name)
 
         return JSONResponse({
             'status': 'success',
@@ -814,6 +1182,55 @@ async def calculate_quiz_performance_by_student(request: Request):
             'message': str(e)
         }, status_code=500)
     
+@app.post('/stream_quiz_performance')
+async def stream_quiz_performance(request: Request):
+
+    """
+
+    Same report as /calculate_quiz_performance, streamed as server-sent events section by section.
+
+    Events have **type** ('statistics', 'study_recommendations', 'concept_mastery', 'report' or 'error') and **data**. The complete
+    report is saved to the student's progress before the 'report' event is sent. If saving fails, an 'error' event is sent instead.
+
+    """
+
+    data = await request.json()
+
+    video_id = data.get('video_id')
+    student_name = data.get('student_name')
+
+    if not video_id or not student_name:
+        raise HTTPException(status_code=400, detail="video_id and student_name are required")
+
+    db_handler = AsyncDBHandler()
+    video_metadata, wrong_answers = await asyncio.gather(
+        db_handler.fetch_course_metadata(video_id),
+        db_handler.get_wrong_answers(student_name, video_id)
+    )
+
+    if not wrong_answers:
+        raise HTTPException(status_code=400, detail="Student has not answered any questions yet...")
+
+    evaluation_agent = EvaluationAgent(video_metadata)
+
+    async def event_stream():
+
+        try:
+
+            async for section, section_data in evaluation_agent.stream_quiz_performance(wrong_answers):
+
+                if section == 'report':
+                    await db_handler.save_student_progress_report(student_name, video_id, convert_for_dynamodb(section_data))
+                    quiz_analytics.record_attempt(video_id, student_name)
+
+                yield sse_event({'status': 'success', 'type': section, 'data': convert_decimals_for_json(section_data)})
+
+        except Exception as e:
+
+            yield sse_event({'status': 'error', 'type': 'error', 'message': str(e)})
+
+    return StreamingResponse(event_stream(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.post('/get_student_progress_report')
 async def get_student_progress_report(request: Request):
     """
@@ -832,8 +1249,8 @@ async def get_student_progress_report(request: Request):
                 'message': 'student_name and video_id are required'
             }, status_code=400)
         
-        db_handler = DBHandler()
-        progress_report = db_handler.fetch_student_progress_report(student_name, video_id)
+        db_handler = AsyncDBHandler()
+        progress_report = await db_handler.fetch_student_progress_report(student_name, video_id)
 
         # If no progress report exists, return a specific status
         if progress_report is None:
@@ -872,8 +1289,8 @@ async def get_finished_videos(request: Request):
                 'message': 'student_name is required'
             }, status_code=400)
         
-        db_handler = DBHandler()
-        finished_videos = db_handler.fetch_finished_videos(student_name)
+        db_handler = AsyncDBHandler()
+        finished_videos = await db_handler.fetch_finished_videos(student_name)
 
         return JSONResponse({
             'status': 'success',
@@ -897,9 +1314,12 @@ async def generate_course_analysis(request: Request):
         data = await request.json()
         video_id = data.get('video_id')
         
-        db_handler = DBHandler()
-        student_data = db_handler.fetch_student_data_from_course(video_id)
-        video_metadata = db_handler.fetch_course_metadata(video_id)
+        db_handler = AsyncDBHandler()
+        student_data, video_metadata, reactions = await asyncio.gather(
+            db_handler.fetch_student_data_from_course(video_id),
+            db_handler.fetch_course_metadata(video_id),
+            db_handler.get_student_reactions(video_id)
+        )
 
         if not student_data:
             return JSONResponse({
@@ -914,7 +1334,7 @@ async def generate_course_analysis(request: Request):
             }, status_code=400)
         
         lecture_builder_agent = EvaluationAgent(video_metadata)
-        course_analysis = lecture_builder_agent.generate_course_analysis(student_data)
+        course_analysis = await asyncio.to_thread(lecture_builder_agent.generate_course_analysis, student_data, reactions)
 
         # Convert Pydantic model to dictionary
         if hasattr(course_analysis, 'model_dump'):
@@ -941,27 +1361,97 @@ async def generate_course_analysis(request: Request):
             'message': str(e)
         }, status_code=500)
 
+@app.post('/course_quiz_analytics')
+async def course_quiz_analytics(request: Request):
+
+    """
+
+    Class-wide quiz statistics for a course: per-question difficulty and discrimination, per-chapter accuracy and the score histogram.
+
+    Computed from the stored answers without an LLM call, and kept up to date in memory as students save wrong answers.
+
+    """
+
+    try:
+
+        data = await request.json()
+        video_id = data.get('video_id')
+
+        if not video_id:
+            return JSONResponse({
+                'status': 'error',
+                'message': 'video_id is required'
+            }, status_code=400)
+
+        analytics = await quiz_analytics.get(video_id, AsyncDBHandler())
+
+        return JSONResponse({
+            'status': 'success',
+            'message': 'Course quiz analytics calculated successfully',
+            'data': analytics.statistics()
+        }, status_code=200)
+
+    except ValueError as e:
+
+        return JSONResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status_code=400)
+
+    except Exception as e:
+
+        return JSONResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status_code=500)
+
 @app.post('/fetch_student_data_from_course')
 async def fetch_student_data_from_course(request: Request):
     
-    """ Fetches all student data from a course from the database. """
+    """
+
+    Fetches student data for a course from the database.
+
+    Pass **limit** (and **cursor** from the previous response) to page through large classes. Without a limit every student in the course is returned.
+
+    """
     
     try:
 
         data = await request.json()
         video_id = data.get('video_id')
+        limit = data.get('limit')
+
+        if not video_id:
+            return JSONResponse({
+                'status': 'error',
+                'message': 'video_id is required'
+            }, status_code=400)
+
+        db_handler = AsyncDBHandler()
 
-        db_handler = DBHandler()
-        student_data = db_handler.fetch_student_data_from_course(video_id)
+        if limit:
+            student_page = await db_handler.fetch_student_data_page(video_id, limit=int(limit), cursor=data.get('cursor'))
+            student_data, next_cursor = student_page['students'], student_page['next_cursor']
+        else:
+            student_data, next_cursor = await db_handler.fetch_student_data_from_course(video_id), None
 
         student_data = convert_decimals_for_json(student_data)
 
         return JSONResponse({
             'status': 'success',
             'message': 'Student data fetched successfully',
-            'data': student_data
+            'data': student_data,
+            'next_cursor': next_cursor
         }, status_code=200)
 
+    except ValueError as e:
+
+        return JSONResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status_code=400)
+
     except Exception as e:
 
         return JSONResponse({
@@ -981,7 +1471,7 @@ async def fetch_related_videos(request: Request):
         video_id = data.get('video_id')
 
         video_search_agent = VideoSearchAgent()
-        related_videos = video_search_agent.fetch_related_videos(video_id)
+        related_videos = await video_search_agent.fetch_related_videos(video_id)
 
         return JSONResponse({
             'status': 'success',
@@ -5,21 +5,34 @@ from helpers import PacingRecommendationsSchema
 from helpers import QuizQuestionsSchema
 from helpers import EngagementListSchema
 from helpers.reasoning import LectureBuilderAgent
+from helpers import clients, schema_validation_failures, iterate_in_thread, parse_structured_output, provider_callers
 import os
 from dotenv import load_dotenv
 import json
 import asyncio
-import boto3
 import pydantic
-from pydantic_core import from_json
+import logging
 
 load_dotenv(override=True)
 
+logger = logging.getLogger(__name__)
+
 class AWSHandler(LLMProvider):
 
+    # Artifacts generated from the video alone, with the prompt and schema each one uses.
+    ARTIFACTS = {
+        'gist': (gist_prompt, GistSchema),
+        'chapters': (chapter_prompt, ChaptersSchema),
+        'key_takeaways': (key_takeaways_prompt, KeyTakeawaysSchema),
+        'pacing_recommendations': (pacing_recommendations_prompt, PacingRecommendationsSchema),
+        'engagement': (engagement_prompt, EngagementListSchema),
+        'summary': (summary_prompt, SummarySchema),
+        'transcript': (multimodal_transcript_prompt, TranscriptSchema)
+    }
+
     def __init__(self, s3_key: str):
 
-        self.bedrock_client = boto3.client('bedrock-runtime', region_name='us-east-1')
+        self.bedrock_client = clients.bedrock_runtime('us-east-1')
         self.bedrock_model_id = 'amazon.nova-lite-v1:0'
 
         self.reasoning_agent = LectureBuilderAgent()
@@ -27,69 +40,110 @@ class AWSHandler(LLMProvider):
         self.s3_key = s3_key
         self.s3_file_name = 's3://' + os.getenv('S3_BUCKET_NAME') + '/' + self.s3_key
 
-    async def _prompt_llm(self, prompt: str, data_schema: pydantic.BaseModel):
+        self.provider_name = 'aws'
+        self.model_id = self.bedrock_model_id
+        self.video_id = s3_key
 
-        """ Prompts the LLM with the given prompt and returns the response. """
+    async def _prompt_llm(self, prompt: str, data_schema: pydantic.BaseModel, artifact: str):
 
-        try:
+        """ Returns the cached result for this artifact and prompt, prompting the LLM only on a cache miss. """
+
+        return await self._cached_generation(artifact, prompt, lambda: self._invoke_llm(prompt=prompt, data_schema=data_schema))
+
+    def _request_body(self, prompt: str) -> str:
 
-            message_list = [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "video": {
-                                "format": "mp4",
-                                "source": {
-                                    "s3Location": {
-                                        "uri": self.s3_file_name, 
-                                        "bucketOwner": os.getenv('AWS_ACCOUNT_ID')
-                                    }
+        message_list = [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "video": {
+                            "format": "mp4",
+                            "source": {
+                                "s3Location": {
+                                    "uri": self.s3_file_name, 
+                                    "bucketOwner": os.getenv('AWS_ACCOUNT_ID')
                                 }
                             }
-                        },
-                        {
-                            "text": prompt
                         }
-                    ]
-                }
-            ]
-
-            # Note: This is the only way to get the model to return a JSON object.
-            inference_config = {
-                "topP": 1,
-                "topK": 1,
-                "temperature": 0,
+                    },
+                    {
+                        "text": prompt
+                    }
+                ]
             }
+        ]
 
-            native_request = {
-                "messages": message_list,
-                "inferenceConfig": inference_config
-            }
+        # Note: This is the only way to get the model to return a JSON object.
+        inference_config = {
+            "topP": 1,
+            "topK": 1,
+            "temperature": 0,
+        }
+
+        native_request = {
+            "messages": message_list,
+            "inferenceConfig": inference_config
+        }
+
+        return json.dumps(native_request)
+
+    async def _invoke_llm(self, prompt: str, data_schema: pydantic.BaseModel):
 
-            response = await asyncio.to_thread(self.bedrock_client.invoke_model,
+        """
+
+        Prompts the LLM with the given prompt and returns the validated response as a dictionary.
+
+        Responses that do not match the schema are reformatted by the reasoning agent. Returns None if that fails too, and raises
+        if Bedrock could not be prompted.
+
+        """
+
+        try:
+
+            response = await provider_callers['aws'].call(self.bedrock_client.invoke_model,
                 modelId=self.bedrock_model_id,
-                body=json.dumps(native_request)
+                body=self._request_body(prompt)
             )
 
-            original_response = json.loads(response.get('body').read())
-            model_response = original_response['output']['message']['content'][0]['text']
-            model_response = model_response.replace("```json", "").replace("```", "")
-            model_response = data_schema.model_validate_json(from_json(json.dumps(model_response), allow_partial=True))
+            text = json.loads(response.get('body').read())['output']['message']['content'][0]['text']
 
-            return model_response.model_dump()
-        
-        except pydantic.ValidationError as e:
+        except Exception as e:
+
+            raise Exception(f"Error generating {data_schema.__name__} with AWS: {str(e)}")
 
-            agent = LectureBuilderAgent()
-            response = agent.reformat_text(text=original_response, data_schema=data_schema)
+        try:
+            return parse_structured_output(text, data_schema)
+        except pydantic.ValidationError:
+            schema_validation_failures.inc(provider=self.provider_name, schema=data_schema.__name__)
+
+        try:
+
+            response = await asyncio.to_thread(self.reasoning_agent.reformat_text, text=text, data_schema=data_schema)
 
             return response.model_dump()
-           
+
         except Exception as e:
 
-            print(f"Error generating gist: {e}")
-            return response
+            logger.warning(f"Error validating {data_schema.__name__}: {e}")
+            return None
+
+    async def _stream_text(self, prompt: str, data_schema: pydantic.BaseModel):
+
+        """ Yields the model's output text chunk by chunk as Nova generates it. """
+
+        def response_stream():
+            return self.bedrock_client.invoke_model_with_response_stream(modelId=self.bedrock_model_id, body=self._request_body(prompt))['body']
+
+        async for event in provider_callers['aws'].stream(iterate_in_thread(response_stream)):
+
+            if 'chunk' not in event:
+                continue
+
+            text = json.loads(event['chunk']['bytes']).get('contentBlockDelta', {}).get('delta', {}).get('text')
+
+            if text:
+                yield text
 
     async def generate_gist(self):
         
@@ -104,7 +158,7 @@ class AWSHandler(LLMProvider):
 
         """
         try:
-            response = await self._prompt_llm(prompt=gist_prompt, data_schema=GistSchema)
+            response = await self._prompt_llm(prompt=gist_prompt, data_schema=GistSchema, artifact='gist')
             return response
         except Exception as e:
             print(f"Error generating gist: {e}")
@@ -115,7 +169,7 @@ class AWSHandler(LLMProvider):
         """ Generates chapters of the video using AWS Bedrock. """
 
         try:
-            response = await self._prompt_llm(prompt=chapter_prompt, data_schema=ChaptersSchema)
+            response = await self._prompt_llm(prompt=chapter_prompt, data_schema=ChaptersSchema, artifact='chapters')
             return response
         except Exception as e:
             print(f"Error generating chapters: {e}")
@@ -126,7 +180,7 @@ class AWSHandler(LLMProvider):
         """ Generates key takeaways of the video using AWS Bedrock. """
 
         try:
-            response = await self._prompt_llm(prompt=key_takeaways_prompt, data_schema=KeyTakeawaysSchema)
+            response = await self._prompt_llm(prompt=key_takeaways_prompt, data_schema=KeyTakeawaysSchema, artifact='key_takeaways')
             return response
         except Exception as e:
             print(f"Error generating key takeaways: {e}")
@@ -137,7 +191,7 @@ class AWSHandler(LLMProvider):
         """ Generates pacing recommendations of the video using AWS Bedrock. """
 
         try:
-            response = await self._prompt_llm(prompt=pacing_recommendations_prompt, data_schema=PacingRecommendationsSchema)
+            response = await self._prompt_llm(prompt=pacing_recommendations_prompt, data_schema=PacingRecommendationsSchema, artifact='pacing_recommendations')
             return response
         except Exception as e:
             print(f"Error generating pacing recommendations: {e}")
@@ -149,7 +203,7 @@ class AWSHandler(LLMProvider):
 
         try:
             chapters_string = "\n".join([f"{chapter['title']}: {chapter['summary']}" for chapter in chapters])
-            response = await self._prompt_llm(prompt=quiz_questions_prompt.format(chapters=chapters_string), data_schema=QuizQuestionsSchema)
+            response = await self._prompt_llm(prompt=quiz_questions_prompt.format(chapters=chapters_string), data_schema=QuizQuestionsSchema, artifact='quiz_questions')
             return response
         except Exception as e:
             print(f"Error generating quiz questions: {e}")
@@ -165,7 +219,7 @@ class AWSHandler(LLMProvider):
 
         try:
 
-            response = await self._prompt_llm(prompt=engagement_prompt, data_schema=EngagementListSchema)
+            response = await self._prompt_llm(prompt=engagement_prompt, data_schema=EngagementListSchema, artifact='engagement')
 
             return response
         
@@ -184,7 +238,7 @@ class AWSHandler(LLMProvider):
 
         try:
 
-            response = await self._prompt_llm(prompt=summary_prompt, data_schema=SummarySchema)
+            response = await self._prompt_llm(prompt=summary_prompt, data_schema=SummarySchema, artifact='summary')
 
             return response
 
@@ -203,7 +257,7 @@ class AWSHandler(LLMProvider):
 
         try:
             
-            response = await self._prompt_llm(prompt=multimodal_transcript_prompt, data_schema=TranscriptSchema)
+            response = await self._prompt_llm(prompt=multimodal_transcript_prompt, data_schema=TranscriptSchema, artifact='transcript')
             
             return response
         
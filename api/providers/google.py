@@ -1,85 +1,270 @@
 from .llm import LLMProvider
 from helpers import gist_prompt, chapter_prompt, key_takeaways_prompt, pacing_recommendations_prompt, quiz_questions_prompt, engagement_prompt, summary_prompt
 from helpers import GistSchema, ChaptersSchema, KeyTakeawaysSchema, PacingRecommendationsSchema, QuizQuestionsSchema, EngagementListSchema, SummarySchema
-from helpers import TranscriptSchema, multimodal_transcript_prompt
+from helpers import TranscriptSchema, multimodal_transcript_prompt, combined_artifacts_prompt
 from helpers.reasoning import LectureBuilderAgent
+from helpers import clients, schema_validation_failures, generation_cache, provider_generation_duration, gemini_context_cache, iterate_in_thread
+from helpers import provider_callers, is_retryable, CircuitOpenError, parse_structured_output
 import pydantic
 import asyncio
+import json
+import time
+import logging
 
-from google import genai
 from google.genai import types
-import os
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
+logger = logging.getLogger(__name__)
+
 class GoogleHandler(LLMProvider):
 
+    # Artifacts generated from the video alone, with the prompt and schema each one uses when generated on its own.
+    ARTIFACTS = {
+        'gist': (gist_prompt, GistSchema),
+        'chapters': (chapter_prompt, ChaptersSchema),
+        'key_takeaways': (key_takeaways_prompt, KeyTakeawaysSchema),
+        'pacing_recommendations': (pacing_recommendations_prompt, PacingRecommendationsSchema),
+        'engagement': (engagement_prompt, EngagementListSchema),
+        'summary': (summary_prompt, SummarySchema),
+        'transcript': (multimodal_transcript_prompt, TranscriptSchema)
+    }
+
     def __init__(self, gemini_file_id: str):
 
         self.gemini_file_id = gemini_file_id
         self.reasoning_agent = LectureBuilderAgent()
 
-    async def _prompt_llm(self, prompt: str, data_schema: pydantic.BaseModel):
+        self.provider_name = 'google'
+        self.model_id = 'models/gemini-2.5-flash-preview-05-20'
+        self.video_id = gemini_file_id
+
+    async def _prompt_llm(self, prompt: str, data_schema: pydantic.BaseModel, artifact: str):
+
+        """ Returns the cached result for this artifact and prompt, prompting the LLM only on a cache miss. """
+
+        return await self._cached_generation(artifact, prompt, lambda: self._invoke_llm(prompt=prompt, data_schema=data_schema))
+
+    async def _generate_content(self, prompt: str, data_schema: pydantic.BaseModel):
 
         """
 
-        Prompts the LLM with the given prompt and returns the response.
+        Prompts Gemini about the video. The video is referenced through its cached-content handle when there is one, so it is
+        only processed once across prompts, and sent inline otherwise.
 
         """
 
-        try:
-            
-            client = genai.Client(api_key=os.getenv('GOOGLE_API_KEY'))
-             
-            prompt_content = [
-                types.Content(
-                    role='user',
-                    parts=[
-                        types.Part.from_uri(
-                            file_uri=self.gemini_file_id,
-                            mime_type='video/mp4'
-                        )
-                    ]
-                ),
-                types.Content(
-                    role='user',
-                    parts=[
-                        types.Part.from_text(
-                            text=prompt
-                        )
-                    ]
-                )
-            ]
-
-            response = await asyncio.to_thread(client.models.generate_content,
-                model='models/gemini-2.5-flash-preview-05-20',
-                contents=prompt_content,
-                config={
-                    'response_mime_type': 'application/json',
-                    'response_schema': data_schema
-                }
+        client = clients.genai
+
+        config = {
+            'response_mime_type': 'application/json',
+            'response_schema': data_schema
+        }
+
+        prompt_content = [
+            types.Content(
+                role='user',
+                parts=[
+                    types.Part.from_text(
+                        text=prompt
+                    )
+                ]
             )
-       
-            formatted_response : data_schema = response.parsed
-            return formatted_response.model_dump()
-        
+        ]
+
+        caller = provider_callers['google']
+        cached_content = await gemini_context_cache.get_handle(self.model_id, self.gemini_file_id)
+
+        if cached_content is not None:
+
+            try:
+                return await caller.call(client.models.generate_content, model=self.model_id, contents=prompt_content, config={**config, 'cached_content': cached_content})
+            except Exception as e:
+                # Only a rejected handle is worth retrying inline. Timeouts, throttling and an open circuit would fail again.
+                if isinstance(e, CircuitOpenError) or is_retryable(e):
+                    raise
+                logger.warning(f"Error prompting with cached content {cached_content}, sending the video inline: {e}")
+                gemini_context_cache.invalidate(self.model_id, self.gemini_file_id)
+
+        return await caller.call(client.models.generate_content,
+            model=self.model_id,
+            contents=gemini_context_cache.video_contents(self.gemini_file_id) + prompt_content,
+            config=config
+        )
+
+    async def _stream_text(self, prompt: str, data_schema: pydantic.BaseModel):
+
+        """
+
+        Yields Gemini's output text chunk by chunk, referencing the video through its cached-content handle when there is one.
+        Like _generate_content, a rejected handle is retried with the video inline, as long as nothing was yielded yet.
+
+        """
+
+        client = clients.genai
+
+        config = {
+            'response_mime_type': 'application/json',
+            'response_schema': data_schema
+        }
+
+        caller = provider_callers['google']
+        prompt_content = [types.Content(role='user', parts=[types.Part.from_text(text=prompt)])]
+        cached_content = await gemini_context_cache.get_handle(self.model_id, self.gemini_file_id)
+
+        if cached_content is not None:
+
+            started = False
+
+            try:
+
+                async for chunk in caller.stream(iterate_in_thread(lambda: client.models.generate_content_stream(model=self.model_id, contents=prompt_content, config={**config, 'cached_content': cached_content}))):
+                    if chunk.text:
+                        started = True
+                        yield chunk.text
+
+                return
+
+            except Exception as e:
+                if started or isinstance(e, CircuitOpenError) or is_retryable(e):
+                    raise
+                logger.warning(f"Error streaming with cached content {cached_content}, sending the video inline: {e}")
+                gemini_context_cache.invalidate(self.model_id, self.gemini_file_id)
+
+        contents = gemini_context_cache.video_contents(self.gemini_file_id) + prompt_content
+
+        async for chunk in caller.stream(iterate_in_thread(lambda: client.models.generate_content_stream(model=self.model_id, contents=contents, config=config))):
+            if chunk.text:
+                yield chunk.text
+
+    async def _invoke_llm(self, prompt: str, data_schema: pydantic.BaseModel):
+
+        """
+
+        Prompts the LLM with the given prompt and returns the validated response as a dictionary.
+
+        Returns None if the response does not match the schema, and raises if Gemini could not be prompted.
+
+        """
+
+        try:
+            response = await self._generate_content(prompt=prompt, data_schema=data_schema)
+        except Exception as e:
+            raise Exception(f"Error generating {data_schema.__name__} with Google: {str(e)}")
+
+        try:
+
+            if isinstance(response.parsed, pydantic.BaseModel):
+                return response.parsed.model_dump()
+
+            return parse_structured_output(response.text or '', data_schema)
+
         except pydantic.ValidationError as e:
-            
-            """
-            response = await asyncio.to_thread(
-                self.reasoning_agent.reformat_text,
-                text=response.text,
-                data_schema=data_schema
-            )
 
-            return response.model_dump()
-            """
+            schema_validation_failures.inc(provider=self.provider_name, schema=data_schema.__name__)
+            logger.warning(f"Error validating {data_schema.__name__}: {e}")
+            return None
+
+    async def generate_artifacts(self, artifacts: list | None = None, errors: dict | None = None) -> dict:
+
+        """
+
+        Generates several artifacts in a single pass over the video and returns {artifact: result}.
+
+        Gemini is asked for one composite schema built from the per-artifact schemas, so the video is processed once instead of
+        once per artifact. Each part is cached under its own artifact and prompt, so the single artifact routes are served from
+        the cache afterwards. Cached artifacts are not requested again, and parts that are missing or fail validation fall back
+        to their own generate_* call.
+
+        If Gemini times out, throttles or its circuit is open, the cached artifacts are still returned and the others are None,
+        with the reason in errors[artifact] when an errors dict is passed.
+
+        """
+
+        artifacts = [artifact for artifact in (artifacts or self.ARTIFACTS) if artifact in self.ARTIFACTS]
+        results = {}
+
+        for artifact in artifacts:
+            results[artifact] = await generation_cache.get(self.provider_name, self.video_id, artifact, self.ARTIFACTS[artifact][0], self.model_id)
+
+        missing = [artifact for artifact in artifacts if results[artifact] is None]
+
+        failed = {}
+
+        if len(missing) > 1:
+
+            try:
+                combined = await self._generate_combined(missing)
+            except Exception as e:
+                # Retryable errors and an open circuit. The per artifact fallback would fail the same way.
+                logger.warning(f"Error generating {', '.join(missing)} with Google, returning the cached artifacts only: {e}")
+                combined = {}
+                failed = {artifact: str(e) for artifact in missing}
+
+            for artifact, result in combined.items():
+                results[artifact] = result
+                await generation_cache.set(self.provider_name, self.video_id, artifact, self.ARTIFACTS[artifact][0], self.model_id, result)
+
+        if errors is not None:
+            errors.update(failed)
+
+        fallback = [artifact for artifact in artifacts if results[artifact] is None and artifact not in failed]
+
+        if fallback:
+            results.update(zip(fallback, await asyncio.gather(*(getattr(self, f'generate_{artifact}')() for artifact in fallback))))
+
+        return results
+
+    async def _generate_combined(self, artifacts: list) -> dict:
+
+        """ Prompts once for the composite schema and returns the parts that validate against their own schema. """
+
+        composite_schema = pydantic.create_model('CombinedArtifactsSchema', **{artifact: (self.ARTIFACTS[artifact][1], ...) for artifact in artifacts})
+        prompt = combined_artifacts_prompt.format(sections='\n'.join(f"## {artifact}\n{self.ARTIFACTS[artifact][0].strip()}\n" for artifact in artifacts))
+
+        start_time = time.perf_counter()
+        outcome = 'error'
+
+        try:
+
+            response = await self._generate_content(prompt=prompt, data_schema=composite_schema)
+            outcome = 'success'
 
         except Exception as e:
 
-            print(f"Error generating gist: {e}")
-            return response
+            # Per artifact calls would only time out or be rejected as well.
+            if isinstance(e, CircuitOpenError) or is_retryable(e):
+                raise
+
+            logger.warning(f"Error generating combined artifacts, generating them one by one: {e}")
+            return {}
+
+        finally:
+
+            provider_generation_duration.observe(time.perf_counter() - start_time, provider=self.provider_name, artifact='combined', outcome=outcome)
+
+        # Parts are validated one by one, so a part that fails validation does not discard the others.
+        try:
+            response = json.loads(response.text or 'null')
+        except ValueError:
+            response = None
+
+        if not isinstance(response, dict):
+            return {}
+
+        parts = {}
+
+        for artifact in artifacts:
+
+            data_schema = self.ARTIFACTS[artifact][1]
+
+            try:
+                parts[artifact] = data_schema.model_validate(response.get(artifact)).model_dump()
+            except pydantic.ValidationError:
+                schema_validation_failures.inc(provider=self.provider_name, schema=data_schema.__name__)
+
+        return parts
 
     async def generate_gist(self):
         
@@ -94,7 +279,7 @@ class GoogleHandler(LLMProvider):
 
         try:
             
-            response = await self._prompt_llm(prompt=gist_prompt, data_schema=GistSchema)
+            response = await self._prompt_llm(prompt=gist_prompt, data_schema=GistSchema, artifact='gist')
 
             return response
 
@@ -113,7 +298,7 @@ class GoogleHandler(LLMProvider):
 
         try:
 
-            response = await self._prompt_llm(prompt=chapter_prompt, data_schema=ChaptersSchema)
+            response = await self._prompt_llm(prompt=chapter_prompt, data_schema=ChaptersSchema, artifact='chapters')
 
             return response
         
@@ -132,7 +317,7 @@ class GoogleHandler(LLMProvider):
 
         try:
 
-            response = await self._prompt_llm(prompt=key_takeaways_prompt, data_schema=KeyTakeawaysSchema)
+            response = await self._prompt_llm(prompt=key_takeaways_prompt, data_schema=KeyTakeawaysSchema, artifact='key_takeaways')
 
             return response
         
@@ -151,7 +336,7 @@ class GoogleHandler(LLMProvider):
 
         try:
 
-            response = await self._prompt_llm(prompt=pacing_recommendations_prompt, data_schema=PacingRecommendationsSchema)
+            response = await self._prompt_llm(prompt=pacing_recommendations_prompt, data_schema=PacingRecommendationsSchema, artifact='pacing_recommendations')
 
             return response
         
@@ -172,7 +357,7 @@ class GoogleHandler(LLMProvider):
 
             chapters_string = "\n".join([f"{chapter['title']}: {chapter['summary']}" for chapter in chapters])
 
-            response = await self._prompt_llm(prompt=quiz_questions_prompt.format(chapters=chapters_string), data_schema=QuizQuestionsSchema)
+            response = await self._prompt_llm(prompt=quiz_questions_prompt.format(chapters=chapters_string), data_schema=QuizQuestionsSchema, artifact='quiz_questions')
 
             return response
         
@@ -191,7 +376,7 @@ class GoogleHandler(LLMProvider):
 
         try:
 
-            response = await self._prompt_llm(prompt=engagement_prompt, data_schema=EngagementListSchema)
+            response = await self._prompt_llm(prompt=engagement_prompt, data_schema=EngagementListSchema, artifact='engagement')
 
             return response
         
@@ -210,7 +395,7 @@ class GoogleHandler(LLMProvider):
 
         try:
 
-            response = await self._prompt_llm(prompt=summary_prompt, data_schema=SummarySchema)
+            response = await self._prompt_llm(prompt=summary_prompt, data_schema=SummarySchema, artifact='summary')
 
             return response
 
@@ -229,7 +414,7 @@ class GoogleHandler(LLMProvider):
 
         try:
             
-            response = await self._prompt_llm(prompt=multimodal_transcript_prompt, data_schema=TranscriptSchema)
+            response = await self._prompt_llm(prompt=multimodal_transcript_prompt, data_schema=TranscriptSchema, artifact='transcript')
             
             return response
         
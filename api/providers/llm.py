@@ -1,19 +1,121 @@
 from abc import ABC, abstractmethod
+from helpers import generation_cache, provider_generation_duration, schema_validation_failures, PartialJSONParser
+
+import time
+import pydantic
 
 class LLMProvider(ABC):
 
+    # Set by each provider, used to key cached generations.
+    provider_name = None
+    model_id = None
+    video_id = None
+
+    # {artifact: (prompt, data schema)} for the artifacts a provider can stream from the video alone.
+    ARTIFACTS = {}
+
     @abstractmethod
     def __init__(self, *args, **kwargs):
         pass
-    
+
+    async def _cached_generation(self, artifact: str, prompt: str, generate):
+
+        """
+
+        Returns the cached result for (provider, video_id, artifact, prompt, model id) or awaits generate() and caches it.
+
+        Only dictionary results are cached so error objects and None are never served from the cache.
+
+        """
+
+        cached = await generation_cache.get(self.provider_name, self.video_id, artifact, prompt, self.model_id)
+
+        if cached is not None:
+            return cached
+
+        start_time = time.perf_counter()
+        outcome = 'error'
+
+        try:
+            result = await generate()
+            outcome = 'success' if isinstance(result, dict) else 'invalid'
+        finally:
+            provider_generation_duration.observe(time.perf_counter() - start_time, provider=self.provider_name, artifact=artifact, outcome=outcome)
+
+        if isinstance(result, dict):
+            await generation_cache.set(self.provider_name, self.video_id, artifact, prompt, self.model_id, result)
+
+        return result
+
+    @abstractmethod
+    def _stream_text(self, prompt: str, data_schema: pydantic.BaseModel):
+
+        """ Yields the model's output text for data_schema chunk by chunk (an async generator). """
+
+    async def stream_artifact(self, artifact: str):
+
+        """
+
+        Streams one artifact, yielding each list element (e.g. a single chapter) as soon as it can be parsed from the partial
+        response, and then the complete, validated artifact.
+
+        Events have **provider**, **type** (the artifact), **status** ('in_progress', 'complete' or 'error'), and **index** and
+        **data** for each element. The complete artifact is cached like a regular generation, and cached artifacts are replayed
+        from the cache.
+
+        """
+
+        prompt, data_schema = self.ARTIFACTS[artifact]
+        parser = PartialJSONParser(data_schema)
+
+        result = await generation_cache.get(self.provider_name, self.video_id, artifact, prompt, self.model_id)
+
+        if result is None:
+
+            start_time = time.perf_counter()
+            outcome = 'error'
+
+            try:
+
+                async for text in self._stream_text(prompt, data_schema):
+                    for index, element in parser.feed(text):
+                        yield {'provider': self.provider_name, 'type': artifact, 'status': 'in_progress', 'index': index, 'data': element}
+
+                result = parser.finish()
+                outcome = 'success'
+
+            except pydantic.ValidationError as e:
+
+                schema_validation_failures.inc(provider=self.provider_name, schema=data_schema.__name__)
+                outcome = 'invalid'
+
+                yield {'provider': self.provider_name, 'type': artifact, 'status': 'error', 'message': f"Error validating {data_schema.__name__}: {str(e)}"}
+                return
+
+            except Exception as e:
+
+                yield {'provider': self.provider_name, 'type': artifact, 'status': 'error', 'message': str(e)}
+                return
+
+            finally:
+
+                provider_generation_duration.observe(time.perf_counter() - start_time, provider=self.provider_name, artifact=artifact, outcome=outcome)
+
+            await generation_cache.set(self.provider_name, self.video_id, artifact, prompt, self.model_id, result)
+
+        for index, element in parser.remaining(result):
+            yield {'provider': self.provider_name, 'type': artifact, 'status': 'in_progress', 'index': index, 'data': element}
+
+        yield {'provider': self.provider_name, 'type': artifact, 'status': 'complete', 'data': result}
+
     @abstractmethod
     def generate_chapters(self):
         pass
-    
+
     @abstractmethod
     def generate_key_takeaways(self):
         pass
-    
+
     @abstractmethod
     def generate_pacing_recommendations(self):
         pass
@@ -21,11 +123,11 @@ class LLMProvider(ABC):
     @abstractmethod
     def generate_quiz_questions(self):
         pass
-    
+
     @abstractmethod
     def generate_engagement(self):
         pass
-    
+
     @abstractmethod
     def generate_gist(self):
-        pass
\ No newline at end of file
+        pass
@@ -1,25 +1,36 @@
-from twelvelabs import TwelveLabs
-from helpers import prompts, data_schema, LectureBuilderAgent
+from helpers import prompts, data_schema, LectureBuilderAgent, clients, iterate_in_thread, schema_validation_failures, parse_structured_output, provider_callers
 from .llm import LLMProvider
 
 import pydantic
-from pydantic_core import from_json
-import os
-import json
 import asyncio
+import logging
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class TwelveLabsHandler(LLMProvider):
 
+    # Artifacts prompted from the video alone, with the prompt and schema each one uses. Gist and summary use dedicated endpoints.
+    ARTIFACTS = {
+        'chapters': (prompts.chapter_prompt, data_schema.ChaptersSchema),
+        'key_takeaways': (prompts.key_takeaways_prompt, data_schema.KeyTakeawaysSchema),
+        'pacing_recommendations': (prompts.pacing_recommendations_prompt, data_schema.PacingRecommendationsSchema),
+        'engagement': (prompts.engagement_prompt, data_schema.EngagementListSchema)
+    }
+
     def __init__(self, twelve_labs_index_id: str = "", twelve_labs_video_id: str = ""):
 
-        self.twelve_labs_client = TwelveLabs(api_key=os.getenv("TWELVE_LABS_API_KEY"))
+        self.twelve_labs_client = clients.twelve_labs
         self.reasoning_agent = LectureBuilderAgent()
 
         self.twelve_labs_index_id = twelve_labs_index_id
         self.twelve_labs_video_id = twelve_labs_video_id
+
+        self.provider_name = 'twelvelabs'
+        self.model_id = 'pegasus1.2'
+        self.video_id = twelve_labs_video_id
         
         self.indexes = dict()
 
@@ -53,127 +64,127 @@ class TwelveLabsHandler(LLMProvider):
         
         """
         
-        Processes a coroutine and streams the results to the output queue.
+        Streams a Pegasus analysis into the output queue.
+
+        The SDK iterator is blocking, so it runs on a worker thread and each chunk is pushed to the queue as soon as it arrives.
         
         """
         
         try:
 
-            coroutine = self.twelve_labs_client.analyze_stream(video_id=self.twelve_labs_video_id, prompt=prompt)
-
-            for chunk in coroutine:
-
-                print(chunk)
+            async for chunk in provider_callers['twelvelabs'].stream(iterate_in_thread(lambda: self.twelve_labs_client.analyze_stream(video_id=self.twelve_labs_video_id, prompt=prompt))):
 
-                await output_queue.put(json.dumps({
-                    "type": stream_type,
-                    "content": chunk,
+                await output_queue.put({
+                    'type': stream_type,
+                    'content': chunk,
                     'status': 'in_progress'
-                }))
+                })
 
-            await output_queue.put(json.dumps({
+            await output_queue.put({
                 'type': stream_type,
-                'chunk': None,
+                'content': None,
                 'status': 'complete'
-            }))
+            })
 
         except Exception as e:
             
-            await output_queue.put(json.dumps({
+            await output_queue.put({
                 'type': stream_type,
-                'chunk': None,
+                'content': None,
                 'status': 'error',
                 'error': str(e)
-            }))
+            })
         
 
-    async def stream_student_lecture_analysis(self):
+    async def stream_student_lecture_analysis(self, stream_types: list | None = None):
 
         """
         
-        Deconstructs the video into a list of frames and streams the results.
+        Streams summary, key takeaways, chapters and pacing recommendations for the video concurrently.
 
-        Runs them concurrently using asyncio coroutines and returns the coroutines to be iterated over.
+        Each stream runs as its own task and pushes chunks into a shared queue. This generator awaits the queue, so every chunk is yielded
+        the moment it arrives, and finishes once every stream has completed or errored.
         
         """
 
-        try:
+        stream_prompts = {
+            'summary': prompts.summary_prompt,
+            'key_takeaways': prompts.key_takeaways_prompt,
+            'chapters': prompts.chapter_prompt,
+            'pacing_recommendations': prompts.pacing_recommendations_prompt,
+        }
+
+        if stream_types is None:
+            stream_types = list(stream_prompts.keys())
 
-            output_queue = asyncio.Queue()
+        output_queue = asyncio.Queue()
 
-            summary_coroutine = self._process_coroutine(stream_type='summary', prompt=prompts.summary_prompt, output_queue=output_queue)
-            #key_takeaways_coroutine = self._process_coroutine(stream_type='key_takeaways', prompt=prompts.key_takeaways_prompt, output_queue=output_queue)
-            #pacing_recommendations_coroutine = self._process_coroutine(stream_type='pacing_recommendations', prompt=prompts.pacing_recommendations_prompt, output_queue=output_queue)
-            #chapter_coroutine = self._process_coroutine(stream_type='chapter', prompt=self.chapter_prompt, output_queue=output_queue)
+        tasks = [
+            asyncio.create_task(self._process_coroutine(stream_type=stream_type, prompt=stream_prompts[stream_type], output_queue=output_queue), name=stream_type)
+            for stream_type in stream_types
+        ]
 
-            summary_task = asyncio.create_task(summary_coroutine)
-            #key_takeaways_task = asyncio.create_task(key_takeaways_coroutine)
-            #chapter_task = asyncio.create_task(chapter_coroutine)
+        try:
 
-            tasks_to_complete = [summary_task]
             completed_stream_count = 0
-            total_streams = len(tasks_to_complete)
 
-            stream_status = {
-                'summary': False,
-            }
+            while completed_stream_count < len(tasks):
 
-            while completed_stream_count < total_streams:
+                data = await output_queue.get()
 
-                while not output_queue.empty():
+                if data['status'] in ('complete', 'error'):
+                    completed_stream_count += 1
 
-                    item = await output_queue.get()
-                    data = json.loads(item)
+                yield data
 
-                    if data['status'] == 'complete':
+        except Exception as e:
 
-                        stream_status[data['type']] = True
-                        completed_stream_count += 1
+            raise Exception(f"Error deconstructing video: {str(e)}")
 
-                    yield data
+        finally:
 
-                await asyncio.sleep(0.1)
+            for task in tasks:
+                task.cancel()
+        
+    async def _stream_text(self, prompt: str, data_schema: pydantic.BaseModel):
 
-                done_tasks = []
-                for task in tasks_to_complete:
+        """ Yields Pegasus' output text chunk by chunk. """
 
-                    if task.done():
-                        try:
-                            task.result()
-                        except Exception as e:
-                            if 'summary' in task.get_name():
-                                print(f"Error processing summary task: {str(e)}")
-                            elif 'chapter' in task.get_name():
-                                print(f"Error processing chapter task: {str(e)}")
-                        tasks_to_complete.remove(task)
-                        done_tasks.append(task)
+        async for text in provider_callers['twelvelabs'].stream(iterate_in_thread(lambda: self.twelve_labs_client.analyze_stream(video_id=self.twelve_labs_video_id, prompt=prompt))):
+            yield text
 
-                if all(stream_status.values()):
-                    break
+    async def _prompt_llm(self, prompt: str, data_schema: pydantic.BaseModel, artifact: str):
 
-        except Exception as e:
+        """ Returns the cached result for this artifact and prompt, prompting the LLM only on a cache miss. """
 
-            raise Exception(f"Error deconstructing video: {str(e)}")
-        
-    async def _prompt_llm(self, prompt: str, data_schema: pydantic.BaseModel):
+        return await self._cached_generation(artifact, prompt, lambda: self._invoke_llm(prompt=prompt, data_schema=data_schema))
+
+    async def _invoke_llm(self, prompt: str, data_schema: pydantic.BaseModel):
+
+        """ Prompts Pegasus and returns the validated response as a dictionary, or None if it does not match the schema. Raises if Pegasus could not be prompted. """
 
         try:
 
-            response = await asyncio.to_thread(
+            response = await provider_callers['twelvelabs'].call(
                 self.twelve_labs_client.analyze,
                 video_id=self.twelve_labs_video_id,
                 prompt=prompt
             )
 
-            response.data = response.data.replace("```json", "").replace("```", "")
-            formatted_resposne = data_schema.model_validate(from_json(response.data, allow_partial=True))
-
-            return formatted_resposne.model_dump()
-        
         except Exception as e:
 
-            print(f"Error generating {data_schema.__name__}: {str(e)}")
-            return response
+            raise Exception(f"Error generating {data_schema.__name__} with TwelveLabs: {str(e)}")
+
+        try:
+
+            return parse_structured_output(response.data, data_schema)
+
+        except pydantic.ValidationError as e:
+
+            schema_validation_failures.inc(provider=self.provider_name, schema=data_schema.__name__)
+
+            logger.warning(f"Error validating {data_schema.__name__}: {str(e)}")
+            return None
         
     async def generate_summary(self):
 
@@ -183,19 +194,21 @@ class TwelveLabsHandler(LLMProvider):
         
         """
 
-        try:
+        async def summarize():
 
-            summary = await asyncio.to_thread(
+            summary = await provider_callers['twelvelabs'].call(
                 self.twelve_labs_client.summarize,
                 video_id=self.twelve_labs_video_id,
                 type='summary'
             )
 
-            summary = summary.summary
-
             return {
-                'summary': summary
+                'summary': summary.summary
             }
+
+        try:
+
+            return await self._cached_generation('summary', 'summarize:summary', summarize)
         
         except Exception as e:
 
@@ -214,7 +227,7 @@ class TwelveLabsHandler(LLMProvider):
 
         try:
 
-            raw_chapters = await self._prompt_llm(prompt=prompts.chapter_prompt, data_schema=data_schema.ChaptersSchema)
+            raw_chapters = await self._prompt_llm(prompt=prompts.chapter_prompt, data_schema=data_schema.ChaptersSchema, artifact='chapters')
             
             self.chapters = raw_chapters
 
@@ -224,7 +237,7 @@ class TwelveLabsHandler(LLMProvider):
         except Exception as e:
 
             print(f"Error generating chapters: {str(e)}")
-            return raw_chapters
+            return None
         
     async def generate_key_takeaways(self):
 
@@ -236,7 +249,7 @@ class TwelveLabsHandler(LLMProvider):
 
         try:
 
-            raw_key_takeaways = await self._prompt_llm(prompt=prompts.key_takeaways_prompt, data_schema=data_schema.KeyTakeawaysSchema)
+            raw_key_takeaways = await self._prompt_llm(prompt=prompts.key_takeaways_prompt, data_schema=data_schema.KeyTakeawaysSchema, artifact='key_takeaways')
             
             self.key_takeaways = raw_key_takeaways
 
@@ -245,7 +258,7 @@ class TwelveLabsHandler(LLMProvider):
         except Exception as e:
 
             print(f"Error generating key takeaways: {str(e)}")
-            return raw_key_takeaways
+            return None
         
     async def generate_pacing_recommendations(self):
 
@@ -257,7 +270,7 @@ class TwelveLabsHandler(LLMProvider):
 
         try:
 
-            raw_pacing_recommendations = await self._prompt_llm(prompt=prompts.pacing_recommendations_prompt, data_schema=data_schema.PacingRecommendationsSchema)
+            raw_pacing_recommendations = await self._prompt_llm(prompt=prompts.pacing_recommendations_prompt, data_schema=data_schema.PacingRecommendationsSchema, artifact='pacing_recommendations')
             
             self.pacing_recommendations = raw_pacing_recommendations
 
@@ -266,7 +279,7 @@ class TwelveLabsHandler(LLMProvider):
         except Exception as e:
 
             print(f"Error generating pacing recommendations: {str(e)}")
-            return raw_pacing_recommendations
+            return None
         
         
     async def generate_quiz_questions(self, chapters: list):
@@ -289,7 +302,7 @@ class TwelveLabsHandler(LLMProvider):
 
         try:
 
-            raw_quiz_questions = await self._prompt_llm(prompt=quiz_questions_prompt, data_schema=data_schema.QuizQuestionsSchema)
+            raw_quiz_questions = await self._prompt_llm(prompt=quiz_questions_prompt, data_schema=data_schema.QuizQuestionsSchema, artifact='quiz_questions')
             
             self.quiz_questions = raw_quiz_questions
 
@@ -298,7 +311,7 @@ class TwelveLabsHandler(LLMProvider):
         except Exception as e:
 
             print(f"Error generating quiz questions: {str(e)}")
-            return raw_quiz_questions
+            return None
         
     async def generate_engagement(self):
 
@@ -310,7 +323,7 @@ class TwelveLabsHandler(LLMProvider):
         
         try:
 
-            raw_engagement = await self._prompt_llm(prompt=prompts.engagement_prompt, data_schema=data_schema.EngagementListSchema)
+            raw_engagement = await self._prompt_llm(prompt=prompts.engagement_prompt, data_schema=data_schema.EngagementListSchema, artifact='engagement')
             
             self.engagement = raw_engagement
 
@@ -319,7 +332,7 @@ class TwelveLabsHandler(LLMProvider):
         except Exception as e:
 
             print(f"Error generating engagement: {str(e)}")
-            return raw_engagement
+            return None
         
     async def generate_gist(self):
 
@@ -329,22 +342,30 @@ class TwelveLabsHandler(LLMProvider):
         
         """
 
-        try: 
-
-            gist = self.twelve_labs_client.gist(video_id=self.twelve_labs_video_id, types=['topic', 'hashtag', 'title'])
+        async def gist():
 
-            title, hashtags, topics = gist.title, gist.hashtags.root, gist.topics.root
-
-            self.title = title
-            self.hashtags = hashtags
-            self.topics = topics
+            gist = await provider_callers['twelvelabs'].call(
+                self.twelve_labs_client.gist,
+                video_id=self.twelve_labs_video_id,
+                types=['topic', 'hashtag', 'title']
+            )
 
             return {
-                'title': title,
-                'hashtags': hashtags,
-                'topics': topics
+                'title': gist.title,
+                'hashtags': gist.hashtags.root,
+                'topics': gist.topics.root
             }
 
+        try: 
+
+            result = await self._cached_generation('gist', 'gist:topic,hashtag,title', gist)
+
+            self.title = result['title']
+            self.hashtags = result['hashtags']
+            self.topics = result['topics']
+
+            return result
+
         except Exception as e:
 
             raise Exception(f"Error generating gist: {str(e)}")
@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+# The API imports its packages as top level modules (helpers, providers), as when running from api/.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the module level singletons off the network and out of the working tree.
+_scratch = tempfile.mkdtemp(prefix='api-tests-')
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('GENERATION_CACHE_DIR', os.path.join(_scratch, 'generation_cache'))
+os.environ.setdefault('EMBEDDING_STORE_DIR', os.path.join(_scratch, 'embedding_store'))
+os.environ.setdefault('GEMINI_CONTEXT_CACHE', 'false')
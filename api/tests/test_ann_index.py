@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from helpers.ann_index import IVFIndex
+
+def _clustered(n: int, dimension: int = 32, clusters: int = 40, seed: int = 0) -> np.ndarray:
+
+    """ Embedding-like data: points scattered around a few dozen topics. """
+
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension))
+
+    return (centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dimension))).astype(np.float32)
+
+def _exact(vectors: np.ndarray, queries: np.ndarray, k: int, metric: str) -> np.ndarray:
+
+    if metric == 'cosine':
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normalized.T
+    else:
+        scores = -((queries[:, np.newaxis, :] - vectors[np.newaxis, :, :]) ** 2).sum(axis=2)
+
+    return np.argsort(-scores, axis=1, kind='stable')[:, :k]
+
+def _recall(found: np.ndarray, expected: np.ndarray) -> float:
+    return np.mean([len(set(row_found) & set(row_expected)) / len(row_expected) for row_found, row_expected in zip(found, expected)])
+
+@pytest.mark.parametrize('metric', ['cosine', 'euclidean'])
+def test_recall_at_10(metric):
+
+    vectors = _clustered(5000)
+    queries = _clustered(50, seed=1)
+    expected = _exact(vectors, queries, 10, metric)
+
+    index = IVFIndex(metric=metric).build(vectors)
+    recall = {n_probe: _recall(index.search(queries, 10, n_probe=n_probe)[0], expected) for n_probe in (4, 8, 16, 32)}
+
+    assert len(index.centroids) == int(4 * np.sqrt(len(vectors)))
+
+    # The default of 8 probes out of ~280 cells, and recall growing towards exact as more cells are probed.
+    assert recall[8] >= 0.8
+    assert recall[16] >= 0.9
+    assert recall[32] >= 0.98
+    assert recall[4] <= recall[8] <= recall[16] <= recall[32]
+
+@pytest.mark.parametrize('metric', ['cosine', 'euclidean'])
+def test_probing_every_cell_is_exact(metric):
+
+    vectors = _clustered(1000)
+    queries = _clustered(20, seed=1)
+
+    index = IVFIndex(metric=metric, n_lists=16).build(vectors)
+    ids, scores = index.search(queries, 5, n_probe=16)
+
+    np.testing.assert_array_equal(ids, _exact(vectors, queries, 5, metric))
+
+    if metric == 'euclidean':
+        expected = -((queries[:, np.newaxis, :] - vectors[ids]) ** 2).sum(axis=2)
+        np.testing.assert_allclose(scores, expected, rtol=1e-3, atol=1e-3)
+
+def test_reference_and_copy_modes_agree():
+
+    vectors = _clustered(2000)
+    queries = _clustered(10, seed=1)
+    rows = np.arange(0, 2000, 2)
+
+    copied = IVFIndex(n_lists=20, n_probe=4).build(vectors[rows], ids=rows)
+    referenced = IVFIndex(n_lists=20, n_probe=4, copy_vectors=False).build(vectors, ids=rows, rows=rows)
+
+    np.testing.assert_array_equal(copied.search(queries, 5)[0], referenced.search(queries, 5)[0])
+
+def test_added_vectors_are_found_without_retraining():
+
+    vectors = _clustered(1000)
+    index = IVFIndex(n_lists=16, n_probe=16).build(vectors[:900])
+    centroids = index.centroids.copy()
+
+    index.add(vectors[900:], ids=np.arange(900, 1000))
+    ids, scores = index.search(vectors[950:960], 1)
+
+    np.testing.assert_array_equal(index.centroids, centroids)
+    np.testing.assert_array_equal(ids[:, 0], np.arange(950, 960))
+    np.testing.assert_allclose(scores[:, 0], 1, rtol=1e-5)
+    assert len(index) == 1000
+
+def test_fewer_candidates_than_k_are_padded():
+
+    index = IVFIndex(n_lists=1).build(np.eye(3, dtype=np.float32))
+    ids, scores = index.search(np.eye(3, dtype=np.float32)[:1], 5)
+
+    assert ids[0, 0] == 0 and list(ids[0, 3:]) == [-1, -1]
+    assert np.isneginf(scores[0, 3:]).all()
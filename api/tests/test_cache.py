@@ -0,0 +1,87 @@
+import asyncio
+
+from helpers.cache import GenerationCache, FileCacheStore
+
+def _get(cache, artifact='chapters', prompt='prompt', video_id='video'):
+    return asyncio.run(cache.get('google', video_id, artifact, prompt, 'model'))
+
+def _set(cache, value, artifact='chapters', prompt='prompt', video_id='video'):
+    asyncio.run(cache.set('google', video_id, artifact, prompt, 'model', value))
+
+def test_key_changes_with_prompt_and_model():
+
+    key = GenerationCache.make_key('google', 'video', 'chapters', 'prompt', 'model')
+
+    assert key == GenerationCache.make_key('google', 'video', 'chapters', 'prompt', 'model')
+    assert key != GenerationCache.make_key('google', 'video', 'chapters', 'prompt v2', 'model')
+    assert key != GenerationCache.make_key('google', 'video', 'chapters', 'prompt', 'model v2')
+
+def test_memory_tier_evicts_least_recently_used():
+
+    cache = GenerationCache(max_entries=2)
+
+    _set(cache, {'n': 1}, artifact='a')
+    _set(cache, {'n': 2}, artifact='b')
+
+    # Reading a makes b the least recently used entry.
+    assert _get(cache, artifact='a') == {'n': 1}
+
+    _set(cache, {'n': 3}, artifact='c')
+
+    assert _get(cache, artifact='b') is None
+    assert _get(cache, artifact='a') == {'n': 1}
+    assert _get(cache, artifact='c') == {'n': 3}
+    assert cache.stats()['entries'] == 2
+
+def test_expired_entries_are_misses(monkeypatch):
+
+    cache = GenerationCache(ttl_seconds=10)
+    now = [1000.0]
+    monkeypatch.setattr('helpers.cache.time.time', lambda: now[0])
+
+    _set(cache, {'n': 1})
+    now[0] += 9
+    assert _get(cache) == {'n': 1}
+
+    now[0] += 2
+    assert _get(cache) is None
+    assert cache.stats()['entries'] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_persistent_hits_are_promoted(tmp_path):
+
+    store = FileCacheStore(str(tmp_path))
+
+    _set(GenerationCache(store=store), {'n': 1})
+
+    # A fresh process only has the persistent tier.
+    cache = GenerationCache(store=store)
+
+    assert _get(cache) == {'n': 1}
+    assert cache.persistent_hits == 1
+    assert cache.stats()['entries'] == 1
+
+def test_expired_persistent_entries_are_ignored(tmp_path, monkeypatch):
+
+    store = FileCacheStore(str(tmp_path))
+    now = [1000.0]
+    monkeypatch.setattr('helpers.cache.time.time', lambda: now[0])
+
+    _set(GenerationCache(store=store, ttl_seconds=10), {'n': 1})
+    now[0] += 11
+
+    assert _get(GenerationCache(store=store, ttl_seconds=10)) is None
+
+def test_invalidate_by_artifact(tmp_path):
+
+    cache = GenerationCache(store=FileCacheStore(str(tmp_path)))
+
+    _set(cache, {'n': 1}, artifact='chapters')
+    _set(cache, {'n': 2}, artifact='summary')
+    _set(cache, {'n': 3}, artifact='summary', video_id='other')
+
+    assert asyncio.run(cache.invalidate('video', artifact='summary')) == 1
+
+    assert _get(cache, artifact='summary') is None
+    assert _get(cache, artifact='chapters') == {'n': 1}
+    assert _get(cache, artifact='summary', video_id='other') == {'n': 3}
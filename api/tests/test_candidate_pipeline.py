@@ -0,0 +1,107 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from helpers import candidate_pipeline
+from helpers.cache import GenerationCache
+from helpers.candidate_pipeline import StaticSearch, TTLCache, YouTubeCandidatePipeline
+
+class FakeEmbedder:
+
+    """ MarengoBatchEmbedder stand-in that records the URLs it is asked to embed. """
+
+    def __init__(self, failing=(), pending=()):
+        self.batches = []
+        self.failing = set(failing)
+        self.pending = set(pending)
+
+    async def embed_videos(self, video_urls, deadline_seconds=None):
+
+        self.batches.append(list(video_urls))
+
+        return {
+            'results': {url: [{'start_offset_sec': 0.0, 'end_offset_sec': 6.0, 'embedding': np.ones(4, dtype=np.float32)}] for url in video_urls if url not in self.failing | self.pending},
+            'failed': {url: 'task failed' for url in video_urls if url in self.failing},
+            'pending': [url for url in video_urls if url in self.pending]
+        }
+
+@pytest.fixture
+def cache(monkeypatch):
+
+    cache = GenerationCache()
+    monkeypatch.setattr(candidate_pipeline, 'generation_cache', cache)
+
+    return cache
+
+def _pipeline(queries: list, embedder=None, **kwargs) -> YouTubeCandidatePipeline:
+
+    def generate_query(video_id):
+        queries.append(video_id)
+        return f'lecture about {video_id}'
+
+    search = StaticSearch({'lecture about video': [f'https://youtube/{n}' for n in range(8)]})
+
+    return YouTubeCandidatePipeline(generate_query, search, embedder or FakeEmbedder(), max_results=3, **kwargs)
+
+def test_ttl_cache_expires_and_evicts(monkeypatch):
+
+    now = [1000.0]
+    monkeypatch.setattr(candidate_pipeline, 'time', SimpleNamespace(time=lambda: now[0]))
+
+    cache = TTLCache(ttl_seconds=10, max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+
+    now[0] += 9
+    assert cache.get('a') == 1
+
+    # b is now the least recently used entry.
+    cache.set('c', 3)
+    assert (cache.get('b'), cache.get('a'), cache.get('c')) == (None, 1, 3)
+
+    now[0] += 2
+    assert cache.get('a') is None
+    assert cache.get('c') == 3
+
+def test_query_is_generated_once_per_video(cache):
+
+    queries = []
+
+    async def scenario():
+
+        # A new pipeline, e.g. in another worker process sharing the persistent cache, reuses the query too.
+        first = await _pipeline(queries).generate_query('video')
+        second = await _pipeline(queries).generate_query('video')
+
+        return first, second, await cache.get('twelvelabs', 'video', 'youtube_query', candidate_pipeline.youtube_query_prompt, 'pegasus1.2')
+
+    first, second, cached = asyncio.run(scenario())
+
+    assert first == second == 'lecture about video'
+    assert cached == {'query': 'lecture about video'}
+    assert queries == ['video']
+
+def test_cached_embeddings_are_not_embedded_again(cache):
+
+    embedder = FakeEmbedder(failing={'https://youtube/1'}, pending={'https://youtube/2'})
+    pipeline = _pipeline([], embedder)
+
+    first = asyncio.run(pipeline.fetch_candidates('video'))
+    second = asyncio.run(pipeline.fetch_candidates('video'))
+
+    assert sorted(first) == sorted(second) == ['https://youtube/0']
+
+    # Only the URLs that failed or were still pending are submitted again.
+    assert embedder.batches == [['https://youtube/0', 'https://youtube/1', 'https://youtube/2'], ['https://youtube/1', 'https://youtube/2']]
+
+def test_search_results_are_cached_and_capped(cache):
+
+    searches = []
+    search = StaticSearch(default=['https://youtube/a', 'https://youtube/b'])
+    pipeline = YouTubeCandidatePipeline(lambda video_id: 'query', lambda query: searches.append(query) or search(query), FakeEmbedder(), max_results=1)
+
+    assert asyncio.run(pipeline.search('query')) == ['https://youtube/a']
+    assert asyncio.run(pipeline.search('query')) == ['https://youtube/a']
+    assert searches == ['query']
@@ -0,0 +1,87 @@
+import pytest
+
+from helpers.context_builder import ChapterContextBuilder
+
+CHAPTERS = [
+    {'chapter_id': 0, 'title': 'Intro', 'summary': 'What the course covers.', 'start_time': 0, 'end_time': 60},
+    {'chapter_id': 1, 'title': 'Recursion', 'summary': 'Base cases and recursive cases.', 'start_time': 60, 'end_time': 120},
+    {'chapter_id': 2, 'title': 'Memoization', 'summary': 'Caching repeated subproblems.', 'start_time': 120, 'end_time': 180}
+]
+
+QUIZ_QUESTIONS = [
+    {'question': 'What is a base case?', 'chapter_id': 1},
+    {'question': 'Why memoize?', 'chapter_id': 2},
+    {'question': 'What does the course cover?', 'chapter_id': 0}
+]
+
+TIMESTAMPED = '[00:00] welcome to the course. [01:00] recursion calls itself. [02:00] memoization caches results.'
+
+def test_wrong_answers_are_mapped_by_chapter_id_question_or_timestamp():
+
+    wrong_answers = [
+        {'question': 'unlisted', 'chapterId': '2'},
+        {'question': 'unlisted', 'chapter_id': 2},
+        {'question': 'What is a base case?'},
+        {'question': 'unlisted', 'timestamp': '75.5'},
+        {'question': 'unlisted', 'timestamp': 500},
+        {'question': 'unlisted'}
+    ]
+
+    assert ChapterContextBuilder().chapter_mistakes(CHAPTERS, QUIZ_QUESTIONS, wrong_answers) == {2: 2, 1: 2}
+
+def test_slices_follow_inline_timestamps():
+
+    builder = ChapterContextBuilder()
+
+    assert builder.slice_transcript(TIMESTAMPED, 60, 120, 180) == '[01:00] recursion calls itself.'
+    assert builder.slice_transcript(TIMESTAMPED, 120, 180, 180) == '[02:00] memoization caches results.'
+    assert builder.slice_transcript('[1:00:00] late (1:00:30) later', 3610, 3620, 3700) == '[1:00:00] late'
+
+def test_slices_without_timestamps_are_proportional_whole_words():
+
+    builder = ChapterContextBuilder()
+    transcript = ' '.join(f'word{n:02d}' for n in range(20))
+
+    assert builder.slice_transcript(transcript, 0, 50, 100).split() == [f'word{n:02d}' for n in range(10)]
+    assert builder.slice_transcript(transcript, 52, 100, 100).split()[0] == 'word10'
+    assert builder.slice_transcript(transcript, 50, 50, 100) == ''
+    assert builder.slice_transcript(transcript, 0, 10, 0) == transcript
+
+def test_only_relevant_chapters_are_kept_in_full():
+
+    metadata = {'chapters': CHAPTERS, 'quiz_questions': QUIZ_QUESTIONS, 'transcript': {'transcript': TIMESTAMPED}}
+    context = ChapterContextBuilder().build(metadata, [{'question': 'What is a base case?'}])
+
+    assert context['chapters']['relevant_chapters'] == [CHAPTERS[1]]
+    assert context['chapters']['other_chapters'] == [{'chapter_id': 0, 'title': 'Intro'}, {'chapter_id': 2, 'title': 'Memoization'}]
+    assert context['quiz_questions'] == [QUIZ_QUESTIONS[0]]
+    assert context['transcript'] == '[Chapter 1: Recursion (60s - 120s)]\n[01:00] recursion calls itself.'
+
+def test_transcript_slices_stay_within_the_token_budget():
+
+    # The second chapter is far longer than its share of the budget.
+    words = ['[00:00]'] + ['intro'] * 50 + ['[01:00]'] + [f'recursion{n}' for n in range(5000)] + ['[02:00]'] + ['memo'] * 50
+    metadata = {'chapters': CHAPTERS, 'quiz_questions': QUIZ_QUESTIONS, 'transcript': ' '.join(words)}
+    wrong_answers = [{'question': 'What is a base case?'}, {'question': 'Why memoize?'}, {'question': 'Why memoize?'}]
+
+    builder = ChapterContextBuilder(token_budget=1500)
+    context = builder.build(metadata, wrong_answers)
+    total = sum(builder.estimate_tokens(value) for value in context.values())
+
+    assert total <= builder.token_budget + len(CHAPTERS)
+
+    recursion, memoization = context['transcript'].split('\n\n')
+
+    # Memoization has more mistakes and goes first, the short slice it leaves unused goes to the long chapter.
+    assert memoization.startswith('[Chapter 2: Memoization') and memoization.endswith('memo')
+    assert recursion.startswith('[Chapter 1: Recursion') and recursion.endswith(' ...')
+
+    fixed = sum(builder.estimate_tokens(context[part]) for part in ('chapters', 'quiz_questions', 'wrong_answers'))
+    assert builder.estimate_tokens(recursion) > (builder.token_budget - fixed) / 3
+
+def test_no_transcript_when_nothing_maps_to_a_chapter():
+
+    context = ChapterContextBuilder().build({'chapters': CHAPTERS, 'quiz_questions': QUIZ_QUESTIONS, 'transcript': TIMESTAMPED}, [{'question': 'unlisted'}])
+
+    assert (context['chapters']['relevant_chapters'], context['quiz_questions'], context['transcript']) == ([], [], '')
+    assert len(context['chapters']['other_chapters']) == 3
@@ -0,0 +1,140 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from helpers import clients
+from helpers.context_cache import GeminiContextCache, LocalCachedContentStore
+from providers import google
+from providers.google import GoogleHandler
+from helpers import GistSchema
+
+class FakeCaches:
+
+    """ client.caches returning handles that expire ttl_seconds from now, counting calls. """
+
+    def __init__(self, ttl_seconds: float = 3600, fail: bool = False):
+        self.ttl_seconds = ttl_seconds
+        self.fail = fail
+        self.calls = {'create': 0, 'update': 0}
+
+    def _handle(self, name: str):
+        return SimpleNamespace(name=name, expire_time=datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=self.ttl_seconds))
+
+    def create(self, model, config):
+
+        self.calls['create'] += 1
+
+        if self.fail:
+            raise ValueError('model does not support explicit caching')
+
+        return self._handle(f"cachedContents/{config.display_name}-{self.calls['create']}")
+
+    def update(self, name, config):
+        self.calls['update'] += 1
+        return self._handle(name)
+
+def _handle(cache, gemini_file_id='files/lecture'):
+    return asyncio.run(cache.get_handle('model', gemini_file_id))
+
+def test_handles_are_reused_and_refreshed_before_they_expire():
+
+    caches = FakeCaches()
+    cache = GeminiContextCache(caches=caches, refresh_seconds=300)
+
+    assert _handle(cache) == _handle(cache) == 'cachedContents/lecture-1'
+    assert caches.calls == {'create': 1, 'update': 0}
+
+    caches.ttl_seconds = 60
+    cache.invalidate('model', 'files/lecture')
+
+    assert _handle(cache) == 'cachedContents/lecture-2'
+    assert _handle(cache) == 'cachedContents/lecture-2'
+    assert caches.calls == {'create': 2, 'update': 1}
+    assert (cache.counts['hit'], cache.counts['created'], cache.counts['refreshed']) == (1, 2, 1)
+
+def test_failed_creation_backs_off():
+
+    caches = FakeCaches(fail=True)
+    cache = GeminiContextCache(caches=caches, failure_backoff_seconds=600)
+
+    assert _handle(cache) is None
+    assert _handle(cache) is None
+    assert caches.calls['create'] == 1
+
+def test_local_handles_are_never_handed_out():
+
+    store = LocalCachedContentStore()
+    cache = GeminiContextCache(caches=store)
+
+    assert _handle(cache) is None
+    assert _handle(cache) is None
+    assert (cache.counts['created'], cache.counts['hit'], len(store.entries)) == (1, 1, 1)
+
+@pytest.mark.parametrize('fail', [False, True])
+def test_per_video_state_is_bounded(fail):
+
+    cache = GeminiContextCache(caches=FakeCaches(fail=fail), max_entries=4, failure_backoff_seconds=600)
+
+    for n in range(100):
+        _handle(cache, f'files/lecture-{n}')
+
+    assert len(cache._entries) <= 4
+    assert len(cache._locks) <= 2 * 4 + 1
+    assert len(cache._failures) <= 2 * 4 + 1
+
+class FakeModels:
+
+    """ Gemini models API that rejects cached-content handles, recording the requests it gets. """
+
+    def __init__(self):
+        self.requests = []
+
+    def _reject_handles(self, config):
+        if 'cached_content' in config:
+            raise ValueError(f"CachedContent not found: {config['cached_content']}")
+
+    def generate_content(self, model, contents, config):
+        self.requests.append(config)
+        self._reject_handles(config)
+        return SimpleNamespace(parsed=None, text='{"title": "Inline", "hashtags": [], "topics": []}')
+
+    def generate_content_stream(self, model, contents, config):
+        self.requests.append(config)
+        self._reject_handles(config)
+        return iter([SimpleNamespace(text='{"title": '), SimpleNamespace(text='"Inline", "hashtags": [], "topics": []}')])
+
+@pytest.fixture
+def models(monkeypatch):
+
+    models = FakeModels()
+    monkeypatch.setattr(clients, '_genai', SimpleNamespace(models=models))
+
+    return models
+
+def _stream(handler) -> str:
+
+    async def collect():
+        return ''.join([text async for text in handler._stream_text(prompt='gist', data_schema=GistSchema)])
+
+    return asyncio.run(collect())
+
+def test_local_handles_do_not_reach_gemini(models, monkeypatch):
+
+    monkeypatch.setattr(google, 'gemini_context_cache', GeminiContextCache(caches=LocalCachedContentStore()))
+    handler = GoogleHandler('files/lecture')
+
+    assert asyncio.run(handler._invoke_llm(prompt='gist', data_schema=GistSchema))['title'] == 'Inline'
+    assert 'Inline' in _stream(handler)
+    assert all('cached_content' not in config for config in models.requests)
+    assert len(models.requests) == 2
+
+def test_rejected_handle_falls_back_to_inline_when_streaming(models, monkeypatch):
+
+    cache = GeminiContextCache(caches=FakeCaches())
+    monkeypatch.setattr(google, 'gemini_context_cache', cache)
+
+    assert 'Inline' in _stream(GoogleHandler('files/lecture'))
+    assert ['cached_content' in config for config in models.requests] == [True, False]
+    assert cache.stats()['entries'] == 0
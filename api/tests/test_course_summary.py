@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from helpers.course_summary import CourseSummarizer, _distribution
+
+VIDEO_METADATA = {
+    'title': 'Course',
+    'summary': 'A course.',
+    'chapters': [
+        {'chapter_id': 0, 'title': 'Intro', 'start_time': 0, 'end_time': 60},
+        {'chapter_id': 1, 'title': 'Details', 'start_time': 60, 'end_time': 120}
+    ],
+    'quiz_questions': [
+        {'question': 'q0', 'chapter_id': 0},
+        {'question': 'q1', 'chapter_id': 1},
+        {'question': 'q2', 'chapter_id': 1},
+        {'question': 'q3', 'chapter_id': 1}
+    ],
+    'engagement': [{'timestamp': f'00:{n:02d}', 'engagement_level': n % 10, 'emotion': 'calm', 'reason': 'r'} for n in range(30)]
+}
+
+def _student(name: str, missed: list, report: dict | None = None) -> dict:
+
+    student = {'student_name': name, 'course_wrong_answers': [{'question': question} for question in missed]}
+
+    if report is not None:
+        student['course_progress_report'] = report
+
+    return student
+
+def test_miss_rates_count_each_student_once():
+
+    students = [
+        _student('a', ['q0', 'q1', 'q1']),
+        _student('b', ['q1']),
+        _student('c', [], {'concept_mastery': []}),
+        _student('d', [])
+    ]
+
+    summary = CourseSummarizer().summarize('course', VIDEO_METADATA, students)
+
+    assert (summary['students'], summary['students_with_attempts']) == (4, 3)
+    assert summary['most_missed_questions'][0] == {'question': 'q1', 'chapter_id': 1, 'students_missed': 2, 'miss_rate': 0.667}
+
+    chapters = {chapter['chapter_id']: chapter for chapter in summary['chapters']}
+
+    assert (chapters[0]['students_struggling'], chapters[0]['percentage_of_students_struggling']) == (1, 33)
+    assert (chapters[1]['questions'], chapters[1]['students_struggling'], chapters[1]['mean_question_miss_rate']) == (3, 2, 0.222)
+
+    # Scores 0.5, 0.75 and 1.0.
+    assert summary['score_distribution']['count'] == 3
+    assert summary['score_distribution']['mean'] == 0.75
+    assert summary['score_distribution']['histogram'] == {'0-0.2': 0, '0.2-0.4': 0, '0.4-0.6': 1, '0.6-0.8': 1, '0.8-1.0': 1}
+
+def test_distribution_includes_the_upper_bound_in_the_last_bin():
+
+    assert _distribution([], (0, 1)) == {'count': 0}
+    assert _distribution([5.0], (0, 5, 10))['histogram'] == {'0-5': 0, '5-10': 1}
+    assert _distribution([0, 10, 10], (0, 5, 10))['histogram'] == {'0-5': 1, '5-10': 2}
+
+def test_mastery_is_merged_case_insensitively():
+
+    students = [
+        _student('a', [], {'concept_mastery': [{'concept': 'Recursion', 'mastery_level': 30}]}),
+        _student('b', [], {'concept_mastery': [{'concept': 'recursion ', 'mastery_level': '80'}, {'concept': '', 'mastery_level': 10}]})
+    ]
+
+    [concept] = CourseSummarizer().summarize('course', VIDEO_METADATA, students)['concept_mastery']
+
+    assert concept['concept'] == 'Recursion'
+    assert (concept['mastery_level']['count'], concept['mastery_level']['mean']) == (2, 55)
+
+def test_engagement_and_reactions():
+
+    reactions = [{'emoji': '👍', 'timestamp': 10}, {'emoji': '👍', 'timestamp': 70}, {'emoji': '😕', 'timestamp': 75}, {'emoji': '😕', 'timestamp': 500}]
+
+    engagement = CourseSummarizer(max_engagement_moments=3).summarize('course', VIDEO_METADATA, [], reactions)['engagement']
+
+    assert [moment['engagement_level'] for moment in engagement['lowest_engagement_moments']] == [0, 0, 0]
+    assert engagement['reactions_by_emoji'] == {'👍': 2, '😕': 2}
+    assert engagement['reactions_by_chapter'] == {0: 1, 1: 2}
+
+@pytest.mark.parametrize('max_questions, max_concepts', [(3, 2), (10, 10)])
+def test_summary_size_does_not_grow_with_the_class(max_questions, max_concepts):
+
+    summarizer = CourseSummarizer(max_questions=max_questions, max_concepts=max_concepts)
+    quiz_questions = [{'question': f'question {n} ' + 'x' * 500, 'chapter_id': n % 2} for n in range(40)]
+    metadata = dict(VIDEO_METADATA, quiz_questions=quiz_questions)
+
+    def summary_for(class_size: int) -> dict:
+
+        students = [
+            _student(f'student-{n}', [quiz_questions[(n + offset) % 40]['question'] for offset in range(5)], {'concept_mastery': [{'concept': f'concept {n % 50}', 'mastery_level': n % 100}]})
+            for n in range(class_size)
+        ]
+
+        return summarizer.summarize('course', metadata, students, [{'emoji': str(n % 30), 'timestamp': n % 120} for n in range(class_size)])
+
+    small, large = summary_for(50), summary_for(5000)
+
+    assert len(large['most_missed_questions']) == max_questions
+    assert len(large['concept_mastery']) == max_concepts
+    assert len(large['engagement']['reactions_by_emoji']) == max_concepts
+    assert all(len(question['question']) <= summarizer.max_text_chars + 4 for question in large['most_missed_questions'])
+
+    # Only the counts get longer.
+    assert len(json.dumps(large)) < 1.1 * len(json.dumps(small))
@@ -0,0 +1,175 @@
+import threading
+from decimal import Decimal
+
+import boto3
+import pytest
+
+moto = pytest.importorskip('moto')
+
+from helpers import clients
+from helpers.db_handler import DBHandler, encode_cursor, decode_cursor, catalog_cache
+
+@pytest.fixture
+def dynamodb(monkeypatch):
+
+    for name, value in {
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing',
+        'DYNAMODB_CONTENT_TABLE_NAME': 'content',
+        'DYNAMODB_CONTENT_USER_NAME': 'users',
+        'DYNAMODB_CONTENT_EVENTS_NAME': 'events'
+    }.items():
+        monkeypatch.setenv(name, value)
+
+    with moto.mock_aws():
+
+        # Resources are cached per thread, drop any created outside the mock.
+        monkeypatch.setattr(clients, '_local', threading.local())
+        resource = boto3.resource('dynamodb')
+
+        resource.create_table(
+            TableName='content',
+            KeySchema=[{'AttributeName': 'video_id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[
+                {'AttributeName': 'video_id', 'AttributeType': 'S'},
+                {'AttributeName': 'catalog_partition', 'AttributeType': 'S'},
+                {'AttributeName': 'created_at', 'AttributeType': 'N'}
+            ],
+            GlobalSecondaryIndexes=[{
+                'IndexName': 'catalog-index',
+                'KeySchema': [{'AttributeName': 'catalog_partition', 'KeyType': 'HASH'}, {'AttributeName': 'created_at', 'KeyType': 'RANGE'}],
+                'Projection': {'ProjectionType': 'ALL'}
+            }],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        resource.create_table(
+            TableName='users',
+            KeySchema=[{'AttributeName': 'student_name', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'student_name', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        resource.create_table(
+            TableName='events',
+            KeySchema=[{'AttributeName': 'pk', 'KeyType': 'HASH'}, {'AttributeName': 'sk', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'pk', 'AttributeType': 'S'}, {'AttributeName': 'sk', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        catalog_cache.invalidate()
+
+        yield resource
+
+        catalog_cache.invalidate()
+
+def _publish(db_handler, video_id, chapters=1):
+    db_handler.upload_course_metadata(video_id, f'Course {video_id}', [{'chapter_id': n} for n in range(chapters)], [], [], [], 'summary', [], 'transcript', 'file', 'key')
+
+def test_cursor_round_trip():
+
+    key = {'catalog_partition': 'published', 'created_at': Decimal('1700000000'), 'video_id': 'a/b+c'}
+    cursor = encode_cursor(key)
+
+    assert '/' not in cursor and '+' not in cursor
+    assert decode_cursor(cursor) == {'catalog_partition': 'published', 'created_at': 1700000000, 'video_id': 'a/b+c'}
+    assert encode_cursor(None) is None and decode_cursor(None) is None
+
+def test_invalid_cursor_raises_value_error():
+
+    with pytest.raises(ValueError):
+        decode_cursor('not a cursor')
+
+def test_catalog_pages_cover_every_course_once(dynamodb):
+
+    db_handler = DBHandler()
+
+    for n in range(5):
+        _publish(db_handler, f'video-{n}')
+
+    seen, cursor = [], None
+
+    while True:
+        page = db_handler.list_course_catalog(limit=2, cursor=cursor)
+        seen.extend(course['video_id'] for course in page['courses'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert sorted(seen) == [f'video-{n}' for n in range(5)]
+    assert all('transcript' not in course for course in db_handler.list_course_catalog(limit=5)['courses'])
+
+def test_backfill_adds_legacy_courses_to_the_catalog(dynamodb):
+
+    db_handler = DBHandler()
+    table = dynamodb.Table('content')
+
+    # A course published before the catalog index, and an uploaded video that was never published.
+    table.put_item(Item={'video_id': 'legacy', 'title': 'Legacy', 'chapters': [{'chapter_id': 0}, {'chapter_id': 1}], 'quiz_questions': [{'question': 'q'}]})
+    table.put_item(Item={'video_id': 'draft', 'created_at': Decimal('1'), 's3_key': 'key'})
+    _publish(db_handler, 'current', chapters=3)
+
+    assert [course['video_id'] for course in db_handler.list_course_catalog()['courses']] == ['current']
+
+    assert db_handler.backfill_course_catalog() == 2
+
+    courses = {course['video_id']: course for course in db_handler.list_course_catalog()['courses']}
+
+    assert set(courses) == {'legacy', 'current'}
+    assert (courses['legacy']['chapter_count'], courses['legacy']['quiz_question_count'], courses['legacy']['key_takeaway_count']) == (2, 1, 0)
+    assert courses['current']['chapter_count'] == 3
+
+    # Running it again changes nothing.
+    assert db_handler.backfill_course_catalog() == 2
+    assert len(db_handler.list_course_catalog()['courses']) == 2
+
+def test_student_pages_cover_every_student_with_their_events(dynamodb):
+
+    db_handler = DBHandler()
+
+    for n in range(5):
+        db_handler.save_wrong_answer(f'student-{n}', 'course', {'question': f'q{n}'})
+        db_handler.save_wrong_answer(f'student-{n}', 'course', {'question': 'shared'})
+
+    db_handler.save_student_progress_report('student-0', 'course', {'score': 1})
+    db_handler.save_wrong_answer('student-0', 'other course', {'question': 'elsewhere'})
+
+    students, cursor, pages = {}, None, 0
+
+    while True:
+        page = db_handler.fetch_student_data_page('course', limit=2, cursor=cursor)
+        students.update((student['student_name'], student) for student in page['students'])
+        cursor, pages = page['next_cursor'], pages + 1
+        if not cursor:
+            break
+
+    assert pages >= 3
+    assert sorted(students) == [f'student-{n}' for n in range(5)]
+    assert all(sorted(answer['question'] for answer in students[f'student-{n}']['course_wrong_answers']) == sorted([f'q{n}', 'shared']) for n in range(5))
+    assert students['student-0']['course_progress_report'] == {'score': 1}
+    assert 'other course_wrong_answers' not in students['student-0']
+
+def test_unprocessed_keys_are_retried_with_backoff(dynamodb, monkeypatch):
+
+    db_handler = DBHandler()
+    delays, responses = [], [
+        {'Responses': {'users': [{'student_name': 'a'}]}, 'UnprocessedKeys': {'users': {'Keys': [{'student_name': 'b'}]}}},
+        {'Responses': {'users': []}, 'UnprocessedKeys': {'users': {'Keys': [{'student_name': 'b'}]}}},
+        {'Responses': {'users': [{'student_name': 'b'}]}}
+    ]
+
+    monkeypatch.setattr('helpers.db_handler.time.sleep', delays.append)
+    monkeypatch.setattr(db_handler.dynamodb, 'batch_get_item', lambda RequestItems: responses.pop(0), raising=False)
+
+    items = db_handler._batch_get_items({'users': {'Keys': [{'student_name': 'a'}, {'student_name': 'b'}]}}, base_delay=0.1)
+
+    assert [item['student_name'] for item in items] == ['a', 'b']
+    assert len(delays) == 2 and 0 <= delays[0] <= 0.2 and 0 <= delays[1] <= 0.4
+
+def test_unprocessed_keys_give_up_after_max_attempts(dynamodb, monkeypatch):
+
+    db_handler = DBHandler()
+
+    monkeypatch.setattr('helpers.db_handler.time.sleep', lambda delay: None)
+    monkeypatch.setattr(db_handler.dynamodb, 'batch_get_item', lambda RequestItems: {'UnprocessedKeys': RequestItems}, raising=False)
+
+    with pytest.raises(Exception, match='unprocessed keys'):
+        db_handler._batch_get_items({'users': {'Keys': [{'student_name': 'a'}]}}, max_attempts=3)
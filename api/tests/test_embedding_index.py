@@ -0,0 +1,131 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from helpers.embedding_index import EmbeddingIndex, score_segment_matches
+from helpers.vector_store import MmapVectorStore
+
+class CountingIndex(EmbeddingIndex):
+
+    """ Index over a fake bucket whose listing is slow, counting loads and listings. """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.loads = 0
+        self.listings = 0
+
+    def load(self):
+        self.loads += 1
+        time.sleep(0.05)
+        self._loaded = True
+
+    def list_bucket_objects(self) -> dict:
+        self.listings += 1
+        time.sleep(0.2)
+        return {}
+
+def _sync_concurrently(index, requests=8) -> list:
+
+    with ThreadPoolExecutor(requests) as executor:
+        return list(executor.map(lambda _: index.sync_if_stale(lambda video_urls: None), range(requests)))
+
+def test_concurrent_stale_requests_share_one_sync():
+
+    index = CountingIndex(sync_interval_seconds=300)
+    index._loaded = True
+
+    results = _sync_concurrently(index)
+
+    assert index.listings == 1
+    assert sum(result is not None for result in results) == 1
+
+    # Fresh again, no further listing.
+    assert _sync_concurrently(index) == [None] * 8
+    assert index.listings == 1
+
+def test_first_requests_wait_for_a_single_load_and_sync():
+
+    index = CountingIndex(sync_interval_seconds=300)
+
+    _sync_concurrently(index)
+
+    assert (index.loads, index.listings) == (1, 1)
+    assert index._loaded
+
+def test_failed_sync_is_retried_by_the_next_request():
+
+    index = CountingIndex(sync_interval_seconds=300)
+    index._loaded = True
+
+    def failing_listing():
+        raise RuntimeError('bucket unavailable')
+
+    index.list_bucket_objects = failing_listing
+
+    try:
+        index.sync_if_stale(lambda video_urls: None)
+    except RuntimeError:
+        pass
+
+    index.list_bucket_objects = lambda: {}
+
+    assert index.sync_if_stale(lambda video_urls: None) == {'embedded': 0, 'removed': 0, 'failed': 0, 'pending': 0}
+    assert not index._sync_lock.locked()
+
+def _segments(vectors, length: float = 10.0) -> list:
+    return [{'start_offset_sec': n * length, 'end_offset_sec': (n + 1) * length, 'embedding': vector} for n, vector in enumerate(vectors)]
+
+def test_segment_search_matches_exact_scores():
+
+    rng = np.random.default_rng(0)
+    library = {f'lecture-{n}': _segments(rng.normal(size=(6, 16)).astype(np.float32)) for n in range(20)}
+
+    index = EmbeddingIndex(ann_min_segments=4096)
+    index._loaded = True
+
+    for s3_key, segments in library.items():
+        index._set_video(s3_key, {'etag': 'e1', 'segments': segments})
+
+    # The query shares two segments with lecture-3.
+    query = _segments(np.stack([library['lecture-3'][4]['embedding'], library['lecture-3'][1]['embedding'], rng.normal(size=16).astype(np.float32)]))
+    results = index.search_segments(query, k=5, segments_per_query=120)
+
+    assert results[0]['s3_key'] == 'lecture-3'
+    assert (results[0]['matches'][0]['similarity'], results[0]['matches'][1]['similarity']) == (pytest.approx(1.0), pytest.approx(1.0))
+    assert {(match['query_start_offset_sec'], match['start_offset_sec']) for match in results[0]['matches'][:2]} == {(0.0, 40.0), (10.0, 10.0)}
+
+    # Below ann_min_segments the index is a single cell, so every score is exact.
+    for result in results:
+        assert result['score'] == pytest.approx(score_segment_matches(query, library[result['s3_key']])['score'], abs=1e-5)
+
+def test_workers_sharing_a_store_survive_each_others_compaction(tmp_path):
+
+    rng = np.random.default_rng(1)
+    vectors = {s3_key: rng.normal(size=(8, 16)).astype(np.float32) for s3_key in ('x', 'y', 'z')}
+
+    # Two workers over the same store directory, with a multi-cell index so new lectures are appended to it.
+    a, b = (EmbeddingIndex(ann_min_segments=8, vector_store=MmapVectorStore(str(tmp_path))) for _ in range(2))
+
+    for index in (a, b):
+        index._loaded = True
+        index._set_video('x', {'etag': 'e1', 'segments': _segments(vectors['x'])})
+        index._set_video('y', {'etag': 'e1', 'segments': _segments(vectors['y'])})
+        assert index.search_segments(_segments(vectors['y'][:1]), k=1)[0]['s3_key'] == 'y'
+
+    # A re-indexes x for a new ETag, which releases the e1 vectors B still holds, and compacts the store.
+    a._set_video('x', {'etag': 'e2', 'segments': _segments(vectors['x'][::-1].copy())})
+    a.compact_store()
+
+    b._set_video('z', {'etag': 'e1', 'segments': _segments(vectors['z'])})
+
+    for s3_key in ('y', 'z'):
+        result = b.search_segments(_segments(vectors[s3_key][2:3]), k=1)[0]
+        assert result['s3_key'] == s3_key and result['matches'][0]['similarity'] == pytest.approx(1.0, abs=1e-5)
+
+    # B's stale copy of x is left out until its next sync picks up e2.
+    assert 'x' not in b._segment_keys
+
+    assert a.search_segments(_segments(vectors['x'][:1]), k=1)[0]['matches'][0]['start_offset_sec'] == 70.0
@@ -0,0 +1,111 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from helpers import clients
+from helpers.embedding_pipeline import MarengoBatchEmbedder
+
+class FakeEmbedTasks:
+
+    """ Marengo embed.task API. A video's URL decides its fate: 'failed' fails, 'pending' never finishes, anything else is ready after a few polls. """
+
+    def __init__(self, polls_until_ready: int = 2):
+
+        self.polls_until_ready = polls_until_ready
+        self.polls = {}
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def create(self, model_name, video_url, video_start_offset_sec, video_end_offset_sec):
+
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+        return SimpleNamespace(id=video_url)
+
+    def _finish(self):
+        with self._lock:
+            self.active -= 1
+
+    def status(self, task_id):
+
+        with self._lock:
+            self.polls[task_id] = self.polls.get(task_id, 0) + 1
+            polls = self.polls[task_id]
+
+        if 'failed' in task_id:
+            self._finish()
+            return SimpleNamespace(status='failed')
+
+        if 'pending' in task_id or polls < self.polls_until_ready:
+            return SimpleNamespace(status='processing')
+
+        return SimpleNamespace(status='ready')
+
+    def retrieve(self, task_id, embedding_option):
+
+        self._finish()
+        segment = SimpleNamespace(start_offset_sec=0.0, end_offset_sec=6.0, embeddings_float=[float(len(task_id)), 1.0])
+
+        return SimpleNamespace(video_embedding=SimpleNamespace(segments=[segment]))
+
+@pytest.fixture
+def tasks(monkeypatch):
+
+    tasks = FakeEmbedTasks()
+    monkeypatch.setattr(clients, '_twelve_labs', SimpleNamespace(embed=SimpleNamespace(task=tasks)))
+
+    return tasks
+
+def _embedder(**kwargs) -> MarengoBatchEmbedder:
+    return MarengoBatchEmbedder(initial_poll_interval=0.01, max_poll_interval=0.02, **kwargs)
+
+def test_batch_is_partitioned_when_the_deadline_expires(tasks):
+
+    urls = ['https://videos/ready-1', 'https://videos/failed', 'https://videos/pending-1', 'https://videos/ready-2', 'https://videos/pending-2', 'https://videos/ready-1']
+
+    start = time.monotonic()
+    batch = asyncio.run(_embedder().embed_videos(urls, deadline_seconds=0.5))
+
+    assert time.monotonic() - start < 2
+    assert sorted(batch['results']) == ['https://videos/ready-1', 'https://videos/ready-2']
+    assert list(batch['failed']) == ['https://videos/failed'] and 'failed' in batch['failed']['https://videos/failed']
+    assert sorted(batch['pending']) == ['https://videos/pending-1', 'https://videos/pending-2']
+
+    [segment] = batch['results']['https://videos/ready-1']
+
+    assert (segment['start_offset_sec'], segment['end_offset_sec']) == (0.0, 6.0)
+    assert segment['embedding'].dtype == np.float32
+
+def test_pending_tasks_stop_polling_after_the_deadline(tasks):
+
+    async def scenario():
+
+        batch = await _embedder().embed_videos(['https://videos/pending'], deadline_seconds=0.1)
+        polls = tasks.polls['https://videos/pending']
+        await asyncio.sleep(0.2)
+
+        return batch, polls
+
+    batch, polls = asyncio.run(scenario())
+
+    assert batch == {'results': {}, 'failed': {}, 'pending': ['https://videos/pending']}
+    assert tasks.polls['https://videos/pending'] == polls
+
+def test_in_flight_tasks_are_bounded(tasks):
+
+    urls = [f'https://videos/ready-{n}' for n in range(20)]
+    batch = asyncio.run(_embedder(max_in_flight=3).embed_videos(urls))
+
+    assert sorted(batch['results']) == sorted(urls)
+    assert (batch['failed'], batch['pending']) == ({}, [])
+    assert tasks.max_active == 3
+
+def test_empty_batch():
+    assert asyncio.run(_embedder().embed_videos([])) == {'results': {}, 'failed': {}, 'pending': []}
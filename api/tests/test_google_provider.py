@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+import main
+from helpers import CircuitOpenError
+from helpers.cache import GenerationCache
+from providers import google
+from providers.google import GoogleHandler
+
+@pytest.fixture
+def handler(monkeypatch):
+
+    monkeypatch.setattr(google, 'generation_cache', GenerationCache())
+
+    handler = GoogleHandler('files/lecture')
+
+    async def cached_artifact(artifact, value):
+        await google.generation_cache.set('google', handler.video_id, artifact, GoogleHandler.ARTIFACTS[artifact][0], handler.model_id, value)
+
+    asyncio.run(cached_artifact('gist', {'title': 'Cached'}))
+
+    return handler
+
+def _fail_one_by_one(handler, monkeypatch):
+
+    async def generate_one():
+        raise AssertionError('per artifact fallback should not run')
+
+    for artifact in GoogleHandler.ARTIFACTS:
+        monkeypatch.setattr(handler, f'generate_{artifact}', generate_one)
+
+def test_cached_artifacts_survive_an_open_circuit(handler, monkeypatch):
+
+    async def unavailable(artifacts):
+        raise CircuitOpenError('google is unavailable, circuit breaker is open')
+
+    monkeypatch.setattr(handler, '_generate_combined', unavailable)
+    _fail_one_by_one(handler, monkeypatch)
+
+    errors = {}
+    results = asyncio.run(handler.generate_artifacts(['gist', 'chapters', 'summary'], errors=errors))
+
+    assert results == {'gist': {'title': 'Cached'}, 'chapters': None, 'summary': None}
+    assert set(errors) == {'chapters', 'summary'} and 'circuit breaker is open' in errors['chapters']
+
+def test_only_missing_artifacts_are_reported_as_failed(handler, monkeypatch):
+
+    async def unavailable(artifacts):
+        raise CircuitOpenError('google is unavailable, circuit breaker is open')
+
+    monkeypatch.setattr(handler, '_generate_combined', unavailable)
+    monkeypatch.setattr(main, 'get_provider_handler', lambda provider, video_id: handler)
+
+    results = {result['type']: result for result in asyncio.run(main.generate_provider_artifacts('google', 'files/lecture', ['gist', 'chapters', 'summary']))}
+
+    assert results['gist']['data'] == {'title': 'Cached'}
+    assert results['gist']['status'] != 'error'
+    assert [results[artifact]['status'] for artifact in ('chapters', 'summary')] == ['error', 'error']
+    assert 'circuit breaker is open' in results['chapters']['message']
+
+def test_parts_missing_from_the_combined_response_fall_back(handler, monkeypatch):
+
+    async def combined(artifacts):
+        return {'chapters': {'chapters': []}}
+
+    async def generate_summary():
+        return {'summary': 'one by one'}
+
+    monkeypatch.setattr(handler, '_generate_combined', combined)
+    monkeypatch.setattr(handler, 'generate_summary', generate_summary)
+
+    errors = {}
+    results = asyncio.run(handler.generate_artifacts(['gist', 'chapters', 'summary'], errors=errors))
+
+    assert results == {'gist': {'title': 'Cached'}, 'chapters': {'chapters': []}, 'summary': {'summary': 'one by one'}}
+    assert errors == {}
@@ -0,0 +1,195 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from helpers.quiz_analytics import QuizAnalytics, QuizAnalyticsRegistry
+
+def _course(n_questions: int, n_chapters: int = 2) -> tuple:
+
+    quiz_questions = [{'question': f'q{n}', 'chapter_id': n % n_chapters} for n in range(n_questions)]
+    chapters = [{'chapter_id': n, 'title': f'Chapter {n}'} for n in range(n_chapters)]
+
+    return quiz_questions, chapters
+
+def _analytics(missed: np.ndarray, initial_capacity: int = 64) -> QuizAnalytics:
+
+    quiz_questions, chapters = _course(missed.shape[1])
+    analytics = QuizAnalytics(quiz_questions, chapters, initial_capacity=initial_capacity)
+
+    for row, student_missed in enumerate(missed):
+        analytics.record_attempt(f'student-{row}')
+        analytics.record_wrong_answers(f'student-{row}', [{'question': f'q{column}'} for column in np.flatnonzero(student_missed)])
+
+    return analytics
+
+def _reference(correct: np.ndarray) -> tuple:
+
+    """ The textbook item statistics, one question at a time. """
+
+    n_students, n_questions = correct.shape
+    totals = correct.sum(axis=1)
+    group_size = max(1, int(round(0.27 * n_students)))
+    order = np.argsort(totals, kind='stable')
+
+    difficulty, discrimination, point_biserial = [], [], []
+
+    for column in range(n_questions):
+
+        item = correct[:, column]
+        rest = totals - item
+
+        difficulty.append(item.mean())
+        discrimination.append(item[order[-group_size:]].mean() - item[order[:group_size]].mean())
+        point_biserial.append(np.corrcoef(item, rest)[0, 1] if item.std() > 0 and rest.std() > 0 else 0.0)
+
+    return np.array(difficulty), np.array(discrimination), np.array(point_biserial)
+
+def test_item_statistics_match_the_reference():
+
+    rng = np.random.default_rng(0)
+    ability = rng.normal(size=(300, 1))
+    hardness = np.linspace(-2, 2, 12)
+    missed = rng.random((300, 12)) > 1 / (1 + np.exp(hardness - ability))
+    missed[:, 0] = False
+
+    statistics = _analytics(missed).statistics()
+    difficulty, discrimination, point_biserial = _reference((~missed).astype(float))
+
+    questions = statistics['questions']
+
+    np.testing.assert_allclose([question['difficulty'] for question in questions], difficulty, atol=1e-4)
+    np.testing.assert_allclose([question['miss_rate'] for question in questions], 1 - difficulty, atol=1e-4)
+    np.testing.assert_allclose([question['discrimination_index'] for question in questions], discrimination, atol=1e-4)
+    np.testing.assert_allclose([question['point_biserial'] for question in questions], point_biserial, atol=1e-3)
+
+    # Everyone answered q0 correctly, so it neither discriminates nor correlates.
+    assert (questions[0]['difficulty'], questions[0]['discrimination_index'], questions[0]['point_biserial']) == (1.0, 0.0, 0.0)
+
+    # Harder questions have lower difficulty (p-values), and the items all discriminate positively.
+    assert questions[1]['difficulty'] > questions[-1]['difficulty']
+    assert all(question['discrimination_index'] > 0 for question in questions[1:])
+
+def test_chapters_histogram_and_scores():
+
+    missed = np.array([
+        [False, False, False, False],
+        [True, False, False, False],
+        [True, True, False, False],
+        [True, True, True, True]
+    ])
+
+    statistics = _analytics(missed).statistics()
+
+    assert statistics['score_histogram'] == {'correct_answers': [0, 1, 2, 3, 4], 'students': [1, 0, 1, 1, 1]}
+    assert (statistics['mean_score'], statistics['median_score']) == (0.5625, 0.625)
+
+    # Chapter 0 has q0 and q2, chapter 1 has q1 and q3.
+    chapters = {chapter['chapter_id']: chapter for chapter in statistics['chapters']}
+
+    assert (chapters[0]['accuracy'], chapters[0]['students_struggling'], chapters[0]['percentage_of_students_struggling']) == (0.5, 3, 75.0)
+    assert (chapters[1]['accuracy'], chapters[1]['students_struggling']) == (0.625, 2)
+
+def test_questions_without_a_listed_chapter_get_one():
+
+    analytics = QuizAnalytics([{'question': 'q0', 'chapter_id': 0}, {'question': 'q1', 'chapter_id': 7}], [{'chapter_id': 0, 'title': 'Intro'}])
+
+    assert analytics.chapters == [{'chapter_id': 0, 'title': 'Intro'}, {'chapter_id': 7, 'title': None}]
+
+def test_matrix_grows_past_its_initial_capacity():
+
+    missed = np.random.default_rng(1).random((100, 5)) < 0.3
+
+    grown = _analytics(missed, initial_capacity=2)
+    preallocated = _analytics(missed, initial_capacity=128)
+
+    assert grown._missed.shape[0] >= 100
+    assert grown.statistics() == preallocated.statistics()
+
+def test_statistics_are_recomputed_after_new_answers():
+
+    analytics = _analytics(np.zeros((2, 3), dtype=bool))
+
+    assert analytics.statistics()['questions'][1]['miss_rate'] == 0.0
+
+    assert analytics.record_wrong_answers('student-0', [{'question': 'q1'}, {'question': 'not in this quiz'}]) == 1
+    assert analytics.statistics()['questions'][1]['miss_rate'] == 0.5
+
+    analytics.record_attempt('student-2')
+    assert analytics.statistics()['students_with_attempts'] == 3
+
+def test_students_without_attempts_are_left_out():
+
+    quiz_questions, chapters = _course(2)
+    student_data = [
+        {'student_name': 'a', 'course_wrong_answers': [{'question': 'q0'}]},
+        {'student_name': 'b', 'course_progress_report': {'score': 1}},
+        {'student_name': 'c'}
+    ]
+
+    statistics = QuizAnalytics.from_course('course', {'quiz_questions': quiz_questions, 'chapters': chapters}, student_data).statistics()
+
+    assert (statistics['students'], statistics['students_with_attempts']) == (2, 2)
+    assert statistics['questions'][0]['miss_rate'] == 0.5
+
+class SlowDBHandler:
+
+    """ Returns one course after the test releases it, counting loads. """
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.loads = 0
+
+    async def fetch_student_data_from_course(self, video_id):
+        self.loads += 1
+        await self.release.wait()
+        return [{'student_name': 'a', f'{video_id}_wrong_answers': [{'question': 'q0'}]}]
+
+    async def fetch_course_metadata(self, video_id):
+        quiz_questions, chapters = _course(2)
+        return {'quiz_questions': quiz_questions, 'chapters': chapters}
+
+def test_registry_replays_answers_recorded_while_loading():
+
+    async def scenario():
+
+        registry, db_handler = QuizAnalyticsRegistry(), SlowDBHandler()
+
+        first = asyncio.ensure_future(registry.get('course', db_handler))
+        second = asyncio.ensure_future(registry.get('course', db_handler))
+
+        while not db_handler.loads:
+            await asyncio.sleep(0)
+
+        # Saved after the load read DynamoDB but before it finished.
+        registry.record_wrong_answers('course', 'b', [{'question': 'q1'}])
+        db_handler.release.set()
+
+        analytics = await first
+
+        assert await second is analytics
+        assert db_handler.loads == 1
+
+        registry.record_attempt('course', 'c')
+
+        return (await registry.get('course', db_handler)).statistics()
+
+    statistics = asyncio.run(scenario())
+
+    assert statistics['students_with_attempts'] == 3
+    assert [question['miss_rate'] for question in statistics['questions']] == [pytest.approx(1 / 3, abs=1e-4), pytest.approx(1 / 3, abs=1e-4)]
+
+def test_registry_reloads_after_ttl_and_evicts_least_recent():
+
+    async def scenario():
+
+        registry, db_handler = QuizAnalyticsRegistry(ttl_seconds=0, max_courses=1), SlowDBHandler()
+        db_handler.release.set()
+
+        await registry.get('course', db_handler)
+        await registry.get('course', db_handler)
+        await registry.get('other', db_handler)
+
+        return db_handler.loads, list(registry._courses)
+
+    assert asyncio.run(scenario()) == (3, ['other'])
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+testclient = pytest.importorskip('fastapi.testclient')
+
+import main
+
+class FakeDBHandler:
+
+    """ AsyncDBHandler stand-in recording saved progress reports in order with the events sent so far. """
+
+    log = []
+    fail_saves = False
+
+    async def fetch_course_metadata(self, video_id):
+        return {'video_id': video_id}
+
+    async def get_wrong_answers(self, student_name, video_id):
+        return [{'question': 'q0'}]
+
+    async def save_student_progress_report(self, student_name, video_id, report):
+
+        if self.fail_saves:
+            raise Exception('Error saving progress report: throttled')
+
+        self.log.append(('saved', report['score']))
+
+class FakeEvaluationAgent:
+
+    def __init__(self, video_metadata):
+        pass
+
+    async def calculate_quiz_performance_async(self, wrong_answers):
+        return {'score': 1}
+
+    async def stream_quiz_performance(self, wrong_answers):
+        yield 'statistics', {'score': 1}
+        yield 'report', {'score': 1}
+
+@pytest.fixture
+def client(monkeypatch):
+
+    FakeDBHandler.log = []
+    FakeDBHandler.fail_saves = False
+
+    monkeypatch.setattr(main, 'AsyncDBHandler', FakeDBHandler)
+    monkeypatch.setattr(main, 'EvaluationAgent', FakeEvaluationAgent)
+
+    # Logged as the server produces each event, since the test client may read the stream ahead.
+    sse_event = main.sse_event
+    monkeypatch.setattr(main, 'sse_event', lambda event: FakeDBHandler.log.append(('event', event['type'])) or sse_event(event))
+
+    return testclient.TestClient(main.app)
+
+def _events(client) -> list:
+
+    response = client.post('/stream_quiz_performance', json={'video_id': 'video', 'student_name': 'student'})
+
+    assert [json.loads(line[len('data: '):])['type'] for line in response.text.splitlines() if line.startswith('data: ')] == [entry for kind, entry in FakeDBHandler.log if kind == 'event']
+
+    return FakeDBHandler.log
+
+def test_report_is_saved_before_the_report_event(client):
+    assert _events(client) == [('event', 'statistics'), ('saved', 1), ('event', 'report')]
+
+def test_failed_save_is_reported_instead_of_the_report(client):
+
+    FakeDBHandler.fail_saves = True
+
+    assert _events(client) == [('event', 'statistics'), ('event', 'error')]
+
+def test_calculated_report_is_saved_before_responding(client):
+
+    response = client.post('/calculate_quiz_performance', json={'video_id': 'video', 'student_name': 'student'})
+
+    assert response.status_code == 200
+    assert FakeDBHandler.log == [('saved', 1)]
+
+    FakeDBHandler.fail_saves = True
+
+    assert client.post('/calculate_quiz_performance', json={'video_id': 'video', 'student_name': 'student'}).status_code == 500
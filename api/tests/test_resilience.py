@@ -0,0 +1,191 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from helpers import resilience
+from helpers.resilience import CircuitBreaker, CircuitOpenError, ResilientCaller, provider_call_attempts
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+
+    # Only the breaker's clock. Patching time.monotonic itself would stop the event loop's.
+    clock = Clock()
+    monkeypatch.setattr(resilience, 'time', SimpleNamespace(monotonic=clock))
+
+    return clock
+
+def _half_open(breaker, clock) -> CircuitBreaker:
+
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    clock.now += breaker.recovery_seconds
+
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+
+    return breaker
+
+def test_breaker_opens_after_consecutive_failures_and_recovers(clock):
+
+    breaker = CircuitBreaker(failure_threshold=3, recovery_seconds=30)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    clock.now += 29
+    assert not breaker.allow()
+
+    # One trial call at a time while half open.
+    clock.now += 1
+    assert breaker.allow() and not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+def test_failed_trial_reopens_the_breaker(clock):
+
+    breaker = _half_open(CircuitBreaker(failure_threshold=2, recovery_seconds=30), clock)
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+def test_released_trial_lets_the_next_one_through_without_closing(clock):
+
+    breaker = _half_open(CircuitBreaker(failure_threshold=2, recovery_seconds=30), clock)
+    breaker.release_trial()
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow() and not breaker.allow()
+
+def _attempts(provider: str) -> dict:
+    return {key[1]: value for key, value in provider_call_attempts._values.items() if key[0] == provider}
+
+def _call(caller, function):
+    return asyncio.run(caller.call(function))
+
+def test_non_retryable_errors_do_not_close_a_half_open_breaker(clock):
+
+    caller = ResilientCaller('test-rejected', breaker=CircuitBreaker(failure_threshold=2, recovery_seconds=30))
+    _half_open(caller.breaker, clock)
+    caller.breaker.release_trial()
+
+    def bad_request():
+        raise ValueError('invalid argument')
+
+    with pytest.raises(ValueError):
+        _call(caller, bad_request)
+
+    assert caller.breaker.state == CircuitBreaker.HALF_OPEN
+    assert _call(caller, lambda: 'ok') == 'ok'
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+def test_retryable_errors_are_retried_and_counted(monkeypatch):
+
+    caller = ResilientCaller('test-retried', max_attempts=3, base_delay=0, breaker=CircuitBreaker(failure_threshold=3))
+    attempts = []
+
+    def flaky():
+        attempts.append(None)
+        if len(attempts) < 3:
+            raise ConnectionError('connection reset')
+        return 'ok'
+
+    assert _call(caller, flaky) == 'ok'
+    assert _attempts('test-retried') == {'retried': 2, 'success': 1}
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+    def down():
+        raise ConnectionError('connection refused')
+
+    with pytest.raises(ConnectionError):
+        _call(caller, down)
+
+    with pytest.raises(CircuitOpenError):
+        _call(caller, lambda: 'ok')
+
+    assert _attempts('test-retried')['rejected'] == 1
+
+async def _chunks(n: int, error: Exception | None = None):
+
+    for chunk in range(n):
+        yield chunk
+
+    if error is not None:
+        raise error
+
+def test_stream_outcomes(clock):
+
+    caller = ResilientCaller('test-stream', breaker=CircuitBreaker(failure_threshold=1, recovery_seconds=30))
+
+    async def consume(chunks, stop_after: int | None = None) -> list:
+
+        stream, received = caller.stream(chunks), []
+
+        try:
+            async for chunk in stream:
+                received.append(chunk)
+                if len(received) == stop_after:
+                    break
+        finally:
+            await stream.aclose()
+
+        return received
+
+    _half_open(caller.breaker, clock)
+    caller.breaker.release_trial()
+
+    # The client disconnects mid stream. The trial is released but proves nothing.
+    assert asyncio.run(consume(_chunks(5), stop_after=2)) == [0, 1]
+    assert caller.breaker.state == CircuitBreaker.HALF_OPEN
+
+    # A stream that runs to the end closes the breaker.
+    assert asyncio.run(consume(_chunks(3))) == [0, 1, 2]
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+    # A stream failing with a retryable error opens it.
+    with pytest.raises(ConnectionError):
+        asyncio.run(consume(_chunks(2, ConnectionError('connection reset'))))
+
+    assert caller.breaker.state == CircuitBreaker.OPEN
+    assert _attempts('test-stream') == {'cancelled': 1, 'success': 1, 'failed': 1}
+
+def test_cancelled_stream_releases_the_trial(clock):
+
+    caller = ResilientCaller('test-stream-cancelled', breaker=CircuitBreaker(failure_threshold=1, recovery_seconds=30))
+    _half_open(caller.breaker, clock)
+    caller.breaker.release_trial()
+
+    async def slow():
+        yield 0
+        await asyncio.sleep(10)
+        yield 1
+
+    async def consume():
+        async for _ in caller.stream(slow()):
+            pass
+
+    async def cancel():
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+
+    assert caller.breaker.state == CircuitBreaker.HALF_OPEN
+    assert caller.breaker.allow()
+    assert _attempts('test-stream-cancelled') == {'cancelled': 1}
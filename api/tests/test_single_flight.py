@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from helpers.single_flight import SingleFlight
+
+class Generation:
+
+    """ Coroutine factory that blocks until released, counting how often it runs. """
+
+    def __init__(self, result='artifact', error: Exception | None = None):
+        self.result = result
+        self.error = error
+        self.runs = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+
+        self.runs += 1
+        await self.release.wait()
+
+        if self.error is not None:
+            raise self.error
+
+        return self.result
+
+async def _started(generation):
+    while not generation.runs:
+        await asyncio.sleep(0)
+
+def test_concurrent_callers_share_one_execution():
+
+    async def scenario():
+
+        single_flight, generation = SingleFlight(), Generation()
+
+        callers = [asyncio.ensure_future(single_flight.do('key', generation)) for _ in range(3)]
+        await _started(generation)
+        generation.release.set()
+
+        return await asyncio.gather(*callers), generation.runs, single_flight.stats()
+
+    results, runs, stats = asyncio.run(scenario())
+
+    assert results == ['artifact'] * 3
+    assert runs == 1
+    assert stats == {'calls': 1, 'coalesced': 2, 'in_flight': 0}
+
+def test_a_cancelled_caller_does_not_cancel_the_shared_work():
+
+    async def scenario():
+
+        single_flight, generation = SingleFlight(), Generation()
+
+        first = asyncio.ensure_future(single_flight.do('key', generation))
+        second = asyncio.ensure_future(single_flight.do('key', generation))
+        await _started(generation)
+
+        # The client that started the generation disconnects.
+        first.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+        generation.release.set()
+
+        return await second, generation.runs
+
+    assert asyncio.run(scenario()) == ('artifact', 1)
+
+def test_the_key_is_released_after_an_error():
+
+    async def scenario():
+
+        single_flight, failing = SingleFlight(), Generation(error=ConnectionError('provider unavailable'))
+
+        callers = [asyncio.ensure_future(single_flight.do('key', failing)) for _ in range(2)]
+        await _started(failing)
+        failing.release.set()
+
+        errors = await asyncio.gather(*callers, return_exceptions=True)
+        in_flight = single_flight.stats()['in_flight']
+
+        # The next request starts a new attempt instead of getting the old failure.
+        retry = Generation(result='retried')
+        retry.release.set()
+
+        return errors, in_flight, await single_flight.do('key', retry), retry.runs
+
+    errors, in_flight, result, runs = asyncio.run(scenario())
+
+    assert [type(error) for error in errors] == [ConnectionError, ConnectionError]
+    assert (in_flight, result, runs) == (0, 'retried', 1)
+
+def test_keys_ignore_body_key_order():
+
+    key = SingleFlight.make_key('generate', 'google', 'video', {'artifacts': ['chapters'], 'options': {'a': 1, 'b': 2}})
+
+    assert key == SingleFlight.make_key('generate', 'google', 'video', {'options': {'b': 2, 'a': 1}, 'artifacts': ['chapters']})
+    assert key != SingleFlight.make_key('generate', 'aws', 'video', {'artifacts': ['chapters'], 'options': {'a': 1, 'b': 2}})
+    assert key != SingleFlight.make_key('generate', 'google', 'video', {'artifacts': ['chapters', 'gist'], 'options': {'a': 1, 'b': 2}})
@@ -0,0 +1,75 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from helpers.streaming import iterate_in_thread
+
+def _collect(iterator_factory) -> list:
+
+    async def collect():
+        return [item async for item in iterate_in_thread(iterator_factory)]
+
+    return asyncio.run(collect())
+
+def test_items_arrive_in_order_from_a_worker_thread():
+
+    threads = set()
+
+    def produce():
+        for n in range(100):
+            threads.add(threading.get_ident())
+            yield n
+
+    assert _collect(produce) == list(range(100))
+    assert threading.get_ident() not in threads
+
+def test_producer_errors_are_raised_in_the_consumer():
+
+    def produce():
+        yield 'first'
+        raise ConnectionError('stream reset')
+
+    received = []
+
+    async def collect():
+        async for item in iterate_in_thread(produce):
+            received.append(item)
+
+    with pytest.raises(ConnectionError, match='stream reset'):
+        asyncio.run(collect())
+
+    assert received == ['first']
+
+def test_worker_stops_pulling_after_the_consumer_stops():
+
+    pulled, closed = [], threading.Event()
+
+    def produce():
+        try:
+            for n in range(1000):
+                pulled.append(n)
+                time.sleep(0.005)
+                yield n
+        finally:
+            closed.set()
+
+    async def take(count: int) -> list:
+
+        stream, received = iterate_in_thread(produce), []
+
+        async for item in stream:
+            received.append(item)
+            if len(received) == count:
+                break
+
+        await stream.aclose()
+
+        return received
+
+    assert asyncio.run(take(3)) == [0, 1, 2]
+
+    # The worker finishes the item it is on, then closes the source instead of draining it.
+    assert closed.wait(2)
+    assert len(pulled) < 20
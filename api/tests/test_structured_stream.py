@@ -0,0 +1,97 @@
+import json
+import random
+
+import pydantic
+import pytest
+
+from helpers import structured_stream
+from helpers.data_schema import ChaptersSchema, KeyTakeawaysSchema
+from helpers.structured_stream import PartialJSONParser, parse_structured_output
+
+class NumbersSchema(pydantic.BaseModel):
+    values: list[float]
+
+def _chunks(text: str, rng: random.Random) -> list:
+
+    cuts = sorted(rng.sample(range(1, len(text)), rng.randint(1, min(60, len(text) - 1))))
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+def _stream(parser, chunks) -> list:
+    return [pair for chunk in chunks for pair in parser.feed(chunk)]
+
+@pytest.mark.parametrize('schema, text', [
+    (ChaptersSchema, '```json\n' + json.dumps({'chapters': [{'title': 'Chapter {0} [x]', 'summary': 'Say "hi" \\ café\nend', 'start_time': 0.0, 'end_time': 1.5, 'chapter_id': 0}] * 5}, indent=2) + '\n```\nDone.'),
+    (KeyTakeawaysSchema, 'Here you go: ' + json.dumps({'key_takeaways': [f'takeaway "{n}", with \\ and }}]' for n in range(30)]})),
+    (NumbersSchema, '{"values": [1, -2.5e3, 3 , 0.125,4]}')
+])
+def test_random_chunking_matches_a_whole_parse(schema, text):
+
+    expected = parse_structured_output(text, schema)
+    field = next(iter(schema.model_fields))
+
+    for seed in range(50):
+
+        parser = PartialJSONParser(schema)
+        streamed = _stream(parser, _chunks(text, random.Random(seed)))
+
+        assert streamed == list(enumerate(expected[field]))
+        assert parser.finish() == expected
+
+def test_escapes_split_across_every_position():
+
+    text = json.dumps({'key_takeaways': ['a \\" quote', 'tab\t', 'end "}"', 'café \\u00e9']})
+    expected = json.loads(text)['key_takeaways']
+
+    for split in range(1, len(text)):
+
+        parser = PartialJSONParser(KeyTakeawaysSchema)
+
+        assert [element for _, element in _stream(parser, [text[:split], text[split:]])] == expected
+
+def test_truncated_output_is_rejected():
+
+    with pytest.raises(pydantic.ValidationError):
+        parse_structured_output('{"key_takeaways":["a","b","c is trunc', KeyTakeawaysSchema)
+
+    text = json.dumps({'key_takeaways': ['a', 'b', 'c']})
+
+    for end in range(len(text) - 1):
+
+        parser = PartialJSONParser(KeyTakeawaysSchema)
+        _stream(parser, [text[:end]])
+
+        with pytest.raises(pydantic.ValidationError):
+            parser.finish()
+
+    # partial() still returns what parses so far, for progress while streaming.
+    parser = PartialJSONParser(KeyTakeawaysSchema)
+    parser.text = '{"key_takeaways":["a","b","c is trunc'
+
+    assert parser.partial() == {'key_takeaways': ['a', 'b']}
+
+def test_fences_preamble_and_trailing_text_are_ignored():
+
+    assert parse_structured_output('Sure!\n```json\n{"key_takeaways": ["a"]}\n```\nLet me know if you need more.', KeyTakeawaysSchema) == {'key_takeaways': ['a']}
+
+    with pytest.raises(pydantic.ValidationError):
+        parse_structured_output('no JSON here', KeyTakeawaysSchema)
+
+def test_each_element_is_parsed_once_and_the_scanned_text_is_dropped(monkeypatch):
+
+    parses = []
+    monkeypatch.setattr(structured_stream, 'from_json', lambda text, **kwargs: parses.append(text) or json.loads(text))
+
+    data = {'key_takeaways': [f'takeaway {n} ' + 'x' * (n % 50) for n in range(2000)]}
+    text = json.dumps(data)
+    parser = PartialJSONParser(KeyTakeawaysSchema)
+    window = 0
+
+    # One character at a time, the worst case for a parser that rescans or copies the text on every chunk.
+    for character in text:
+        parser.feed(character)
+        window = max(window, len(parser._window))
+
+    assert len(parses) == 2000
+    assert window <= max(len(json.dumps(element)) for element in data['key_takeaways']) + 2
+    assert parser.text == text
+    assert parser.finish() == data
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from helpers.vector_search import VectorSearchEngine
+
+def _brute_force(query, embeddings: dict, metric: str) -> list:
+
+    """ The original per-candidate loop: compare over the shared prefix and sort everything. """
+
+    distances = []
+
+    for item_id, embedding in embeddings.items():
+
+        width = min(len(query), len(embedding))
+        q, e = np.asarray(query[:width], dtype=np.float64), np.asarray(embedding[:width], dtype=np.float64)
+
+        if metric == 'euclidean':
+            distance = np.linalg.norm(q - e)
+        else:
+            denominator = np.linalg.norm(q) * np.linalg.norm(e)
+            distance = 1 - (q @ e / denominator if denominator > 0 else 0)
+
+        distances.append((item_id, distance))
+
+    return sorted(distances, key=lambda pair: pair[1])
+
+@pytest.mark.parametrize('metric', ['euclidean', 'cosine'])
+def test_matches_brute_force_with_ragged_embeddings(metric):
+
+    rng = np.random.default_rng(0)
+    embeddings = {f'video-{n}': rng.normal(size=rng.choice([8, 12, 16])).tolist() for n in range(200)}
+    engine = VectorSearchEngine.from_embeddings(embeddings, metric=metric)
+
+    for query_length in (8, 12, 20):
+
+        query = rng.normal(size=query_length).tolist()
+        expected = _brute_force(query, embeddings, metric)[:10]
+        actual = engine.search(query, 10)
+
+        assert [item_id for item_id, _ in actual] == [item_id for item_id, _ in expected]
+        np.testing.assert_allclose([distance for _, distance in actual], [distance for _, distance in expected], rtol=1e-4, atol=1e-4)
+
+def test_batch_search_matches_single_queries():
+
+    rng = np.random.default_rng(1)
+    engine = VectorSearchEngine.from_embeddings({n: rng.normal(size=16) for n in range(50)})
+    queries = rng.normal(size=(5, 16))
+
+    for batch_result, query in zip(engine.search_batch(queries, 3), queries):
+
+        single_result = engine.search(query, 3)
+
+        assert [item_id for item_id, _ in batch_result] == [item_id for item_id, _ in single_result]
+        np.testing.assert_allclose([distance for _, distance in batch_result], [distance for _, distance in single_result], rtol=1e-5)
+
+def test_k_larger_than_candidates_and_empty_engine():
+
+    engine = VectorSearchEngine()
+
+    assert engine.search([1.0, 0.0], 3) == []
+
+    engine.add('a', [1.0, 0.0])
+    engine.add('b', [0.0, 1.0])
+
+    assert [item_id for item_id, _ in engine.search([1.0, 0.1], 5)] == ['a', 'b']
+    assert engine.search([1.0, 0.0], 0) == []
+
+def test_unsupported_metric():
+
+    with pytest.raises(ValueError):
+        VectorSearchEngine(metric='manhattan')
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from helpers.vector_store import MmapVectorStore
+
+def _vectors(n: int, dimension: int = 8, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(n, dimension)).astype(np.float32)
+
+def test_compaction_keeps_live_vectors_and_bumps_generation(tmp_path):
+
+    store = MmapVectorStore(str(tmp_path))
+    vectors = _vectors(6)
+    store.append([(f'v{n}', vector) for n, vector in enumerate(vectors)])
+    store.delete(['v1', 'v4'])
+
+    assert (len(store), store.dead_rows, store.generation) == (4, 2, 0)
+
+    store.compact()
+
+    assert (len(store), store.dead_rows, store.generation) == (4, 0, 1)
+    assert store.view().shape == (4, 8)
+
+    for n in (0, 2, 3, 5):
+        np.testing.assert_array_equal(store.get(f'v{n}'), vectors[n])
+
+    np.testing.assert_allclose(store.get('v5', 'float16'), vectors[5], rtol=1e-2, atol=1e-2)
+    np.testing.assert_allclose(store.get('v5', 'int8'), vectors[5], atol=np.abs(vectors[5]).max() / 100)
+
+def test_other_processes_see_compaction(tmp_path):
+
+    writer, reader = MmapVectorStore(str(tmp_path)), MmapVectorStore(str(tmp_path))
+    vectors = _vectors(4)
+    writer.append([(f'v{n}', vector) for n, vector in enumerate(vectors)])
+
+    old_view, old_rows, old_generation = reader.lookup(['v2', 'v3'])
+
+    writer.delete(['v0'])
+    writer.compact()
+
+    view, rows, generation = reader.lookup(['v2', 'v3'])
+
+    assert generation == old_generation + 1
+    assert list(rows) == [1, 2] and list(old_rows) == [2, 3]
+
+    # Views taken before the compaction keep reading the old files.
+    np.testing.assert_array_equal(old_view[old_rows], vectors[2:])
+    np.testing.assert_array_equal(view[rows], vectors[2:])
+
+def test_rows_reports_missing_ids(tmp_path):
+
+    store = MmapVectorStore(str(tmp_path))
+    store.append([('a', np.ones(8, dtype=np.float32)), ('b', np.zeros(8, dtype=np.float32))])
+    store.delete(['a'])
+
+    assert list(store.rows(['a', 'b', 'never added'])) == [-1, 1, -1]
+
+    with pytest.raises(KeyError):
+        store.get('a')
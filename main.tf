@@ -4,7 +4,7 @@
 # Description: This script will create the necessary resources to support the TwelveLabs Education POC.
 # Includes: 
 # - AWS S3 Bucket: Storing video lecture and other multimodal content.
-# - 2 DynamoDB Tables: One for storing user data and one for storing course metadata.
+# - DynamoDB Tables: user data, course metadata, student events, lecture embeddings and an optional generation cache.
 
 # Instructions:
 # 1. Ensure you have Terraform installed (https://learn.hashicorp.com/tutorials/terraform/install-cli).
@@ -59,6 +59,29 @@ resource "aws_dynamodb_table" "education_video_poc" {
     name = "video_id"
     type = "S"
   }
+
+  attribute {
+    name = "catalog_partition"
+    type = "S"
+  }
+
+  attribute {
+    name = "created_at"
+    type = "N"
+  }
+
+  # Sorted index of published courses used by the paginated course catalog.
+  # Only the list fields are projected so catalog pages stay small.
+  # The index is sparse: only items with catalog_partition are listed. Courses
+  # published before it existed are added by running once, from api/:
+  #   python -c "from helpers import DBHandler; print(DBHandler().backfill_course_catalog())"
+  global_secondary_index {
+    name               = "catalog-index"
+    hash_key           = "catalog_partition"
+    range_key          = "created_at"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["title", "summary", "chapter_count", "quiz_question_count", "key_takeaway_count"]
+  }
 }
 
 # ------------------------------------------------------------------------------
@@ -80,3 +103,86 @@ resource "aws_dynamodb_table" "education_user_poc" {
     type = "S"
   }
 }
+
+# ------------------------------------------------------------------------------
+# Resource: DynamoDB Table for Cached Provider Generations (optional)
+# ------------------------------------------------------------------------------
+# Persistent tier of the generation cache. Set DYNAMODB_CACHE_TABLE_NAME to this
+# table's name to share cached generations across API workers; otherwise a local
+# file store is used. Expired entries are removed by DynamoDB TTL.
+# ------------------------------------------------------------------------------
+resource "aws_dynamodb_table" "education_generation_cache_poc" {
+  name           = "twelvelabs-education-generation-cache-poc"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "video_id"
+  range_key      = "cache_key"
+
+  attribute {
+    name = "video_id"
+    type = "S"
+  }
+
+  attribute {
+    name = "cache_key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+}
+
+# ------------------------------------------------------------------------------
+# Resource: DynamoDB Table for Student Events
+# ------------------------------------------------------------------------------
+# Append-only event store for student reactions and wrong answers. Each event is
+# a single item so writes stay constant cost no matter how many events exist.
+# - pk: 'video#<video_id>' for reactions, 'student#<student_name>' for wrong answers
+# - sk: '<event type>#[<video_id>#]<epoch millis>#<uuid>' so events are time ordered
+# The same table holds the per-course student index ('course#<video_id>',
+# 'student#<student_name>') used to read one course's students without a scan.
+# Set DYNAMODB_CONTENT_EVENTS_NAME to this table's name.
+# ------------------------------------------------------------------------------
+resource "aws_dynamodb_table" "education_events_poc" {
+  name           = "twelvelabs-education-events-poc"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "pk"
+  range_key      = "sk"
+
+  attribute {
+    name = "pk"
+    type = "S"
+  }
+
+  attribute {
+    name = "sk"
+    type = "S"
+  }
+}
+
+# ------------------------------------------------------------------------------
+# Resource: DynamoDB Table for Lecture Embeddings
+# ------------------------------------------------------------------------------
+# Persistent Marengo embedding index for the lectures in the S3 bucket, used by
+# related video search. Objects are only re-embedded when their ETag changes.
+# - 'manifest' / '<s3_key>': ETag and segment count of each indexed object
+# - 'video#<s3_key>' / 'segment#<position>': one embedding segment and its time range
+# Set DYNAMODB_EMBEDDINGS_TABLE_NAME to this table's name.
+# ------------------------------------------------------------------------------
+resource "aws_dynamodb_table" "education_embeddings_poc" {
+  name           = "twelvelabs-education-embeddings-poc"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "pk"
+  range_key      = "sk"
+
+  attribute {
+    name = "pk"
+    type = "S"
+  }
+
+  attribute {
+    name = "sk"
+    type = "S"
+  }
+}